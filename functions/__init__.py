@@ -1,4 +1,18 @@
-from functions.data2json import create_upload_file
+from functions.data2json import (
+    create_upload_file,
+    upload_progress,
+)
+
+from functions.dataset import (
+    get_dataset,
+    delete_dataset,
+    dataset_versions,
+    undo_dataset,
+    get_job,
+    get_profile,
+)
+
+from functions.metrics import get_metrics
 
 from functions.eda import (
     head,
@@ -29,6 +43,10 @@ from functions.processing import (
     astype
 )
 
+from functions.pipeline import (
+    pipeline,
+)
+
 from functions.preprocessing import (
     feature_target_split,
     train_test_split,
@@ -36,6 +54,16 @@ from functions.preprocessing import (
 
 __all__ = [
     "create_upload_file",
+    "upload_progress",
+
+    "get_dataset",
+    "delete_dataset",
+    "dataset_versions",
+    "undo_dataset",
+    "get_job",
+    "get_profile",
+
+    "get_metrics",
 
     "head", 
     "tail", 
@@ -62,6 +90,8 @@ __all__ = [
     "set_column",
     "astype",
 
+    "pipeline",
+
     "feature_target_split",
     "train_test_split",
 ]
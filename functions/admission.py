@@ -0,0 +1,140 @@
+"""실행 전에 결과에 필요한 메모리를 추정해서 워커의 연산 메모리 예산(COMPUTE_BUDGET) 안에서만 실행
+
+- 예산보다 큰 연산              : 413(입력을 줄이거나 먼저 필터링)
+- 다른 연산이 예산을 쓰고 있음  : 자리가 날 때까지 ADMISSION_WAIT초 기다렸다가 그래도 없으면 503 + Retry-After
+                                  (?job=true 작업은 제한 없이 기다림)
+- 디스크에 있는 데이터셋의 groupby: 예산에 맞지 않으면 청크 단위로 집계(functions/chunked.py)
+"""
+import os, time, threading, contextlib
+import pandas as pd
+# import modin.pandas as pd
+from fastapi import HTTPException
+
+from . import jobs, cancel
+
+# 워커 1개에서 동시에 실행하는 연산의 결과와 중간 결과에 사용할 메모리(bytes, 워커마다 따로 적용)
+COMPUTE_BUDGET = int(os.getenv("COMPUTE_BUDGET", 2 * 2**30))
+# 예산에 여유가 없을 때 기다리는 최대 시간(초)
+ADMISSION_WAIT = float(os.getenv("ADMISSION_WAIT", 10))
+# 503 응답의 Retry-After(초)
+RETRY_AFTER    = 5
+# 행 크기를 추정할 때 사용할 행 수(object 컬럼은 전체를 계산하면 느림)
+SAMPLE_ROWS    = 1000
+
+_reserved = 0
+_cond     = threading.Condition()
+_stats    = {"admitted": 0, "queued": 0, "rejected": 0}
+
+
+def _mb(nbytes: int) -> str:
+    return f"{nbytes / 2**20:,.0f}MB"
+
+
+def _row_bytes(df: pd.DataFrame) -> float:
+    """행 1개의 메모리(bytes, 앞 SAMPLE_ROWS 행의 평균)"""
+    if not len(df): return 0.0
+    sample = df.head(SAMPLE_ROWS)
+    return float(sample.memory_usage(index=False, deep=True).sum()) / len(sample)
+
+
+def _key_counts(df: pd.DataFrame, cols: list, use_index: bool) -> pd.Series:
+    # 조인 키 값별 행 수(결측치도 하나의 키, merge와 같음)
+    if isinstance(cols, str): cols = [cols]
+    keys = df.index.to_frame(index=False) if use_index else df[cols].reset_index(drop=True)
+    counts = keys.groupby(list(keys.columns), dropna=False, sort=False).size()
+    return counts.rename_axis([None] * counts.index.nlevels)
+
+
+def merge_rows(left: pd.DataFrame, right: pd.DataFrame, how: str, on=None, left_on=None, right_on=None,
+               left_index: bool = False, right_index: bool = False) -> int:
+    """DataFrame.merge 결과의 행 수(키 값별 행 수로 계산, 결과를 만들지 않음)"""
+    if how == "cross": return len(left) * len(right)
+    if on is None and left_on is None and right_on is None and not (left_index or right_index):
+        on = [i for i in left.columns if i in right.columns]
+    try:
+        lc = _key_counts(left,  on or left_on,  left_index)
+        rc = _key_counts(right, on or right_on, right_index)
+        both = pd.concat([lc.rename("l"), rc.rename("r")], axis=1, join="inner")
+    except (KeyError, ValueError, TypeError):
+        # 키를 맞출 수 없으면(타입이 다른 키 등) 행 수가 늘어나지 않는 조인으로 추정
+        return max(len(left), len(right))
+    rows = int((both["l"] * both["r"]).sum())
+    if how in ("left",  "outer"): rows += len(left)  - int(both["l"].sum())
+    if how in ("right", "outer"): rows += len(right) - int(both["r"].sum())
+    return rows
+
+
+def merge_bytes(left: pd.DataFrame, right: pd.DataFrame, how: str, **keys) -> int:
+    """merge 결과의 메모리(행 수 × 양쪽 행 크기 + 행마다 인덱서 2개)"""
+    return int(merge_rows(left, right, how, **keys) * (_row_bytes(left) + _row_bytes(right) + 16))
+
+
+def concat_bytes(left: pd.DataFrame, right: pd.DataFrame, axis: int, join: str) -> int:
+    """pd.concat 결과의 메모리"""
+    lb, rb = _row_bytes(left), _row_bytes(right)
+    if axis == 0:
+        same = join == "inner" or list(left.columns) == list(right.columns)
+        return int((len(left) + len(right)) * (max(lb, rb) if same else lb + rb))
+    try:
+        rows = len(left.index.union(right.index)) if join == "outer" else min(len(left), len(right))
+    except (TypeError, ValueError):
+        rows = len(left) + len(right)
+    return int(rows * (lb + rb))
+
+
+def transpose_bytes(df: pd.DataFrame) -> int:
+    """transpose 결과의 메모리(dtype이 섞여 있으면 모든 값이 파이썬 객체가 된다)"""
+    if df.dtypes.nunique() <= 1 and all(i != object for i in df.dtypes):
+        return int(len(df) * _row_bytes(df))
+    return int(df.size * 40)
+
+
+def groupby_bytes(df: pd.DataFrame, by: list) -> int:
+    """groupby 집계의 메모리(행마다 그룹 번호, 정렬 인덱서 + 그룹 수가 행 수와 같을 때의 결과)"""
+    return int(len(df) * (8 * (len(by) + 1) + _row_bytes(df)))
+
+
+def fits(nbytes: int) -> bool:
+    """지금 기다리지 않고 실행할 수 있는지"""
+    with _cond:
+        return _reserved + nbytes <= COMPUTE_BUDGET
+
+
+@contextlib.contextmanager
+def reserve(name: str, nbytes: int):
+    """연산 전에 nbytes를 예약하고 끝나면 반납(예산이 부족하면 기다리거나 413, 503)"""
+    global _reserved
+    if nbytes > COMPUTE_BUDGET:
+        with _cond: _stats["rejected"] += 1
+        raise HTTPException(
+            status_code = 413,
+            detail      = f'"{name}" needs about {_mb(nbytes)} of memory, more than the limit {_mb(COMPUTE_BUDGET)}. filter or reduce the input first.',
+        )
+    deadline = None if jobs.current() is not None else time.monotonic() + ADMISSION_WAIT
+    with _cond:
+        if _reserved + nbytes > COMPUTE_BUDGET: _stats["queued"] += 1
+        while _reserved + nbytes > COMPUTE_BUDGET:
+            if deadline is not None and time.monotonic() >= deadline:
+                _stats["rejected"] += 1
+                raise HTTPException(
+                    status_code = 503,
+                    detail      = f'"{name}" needs about {_mb(nbytes)} of memory and the server is busy. try again later or use "job=true".',
+                    headers     = {"Retry-After": str(RETRY_AFTER)},
+                )
+            # 짧게 나눠서 기다려야 제한 시간 초과(internal_func.Cancelled)로 중단된 기능이 예약하지 않고 바로 끝난다.
+            _cond.wait(0.5 if deadline is None else max(0.0, min(0.5, deadline - time.monotonic())))
+            cancel.checkpoint()
+        _reserved += nbytes
+        _stats["admitted"] += 1
+    try:
+        yield
+    finally:
+        with _cond:
+            _reserved -= nbytes
+            _cond.notify_all()
+
+
+def stats() -> dict:
+    """예약된 메모리와 예산, 실행/대기/거절 횟수"""
+    with _cond:
+        return {**_stats, "reserved": _reserved, "budget": COMPUTE_BUDGET}
@@ -0,0 +1,56 @@
+"""연산 중단(internal_func._Task.abort)
+
+실행 중인 스레드에 예외를 비동기로 보내면(PyThreadState_SetAsyncExc) pandas, pyarrow, openpyxl의 finally,
+잠금, C 확장 정리 중에도 발생해서 다시 사용하는 연산 스레드에 반쯤 바뀐 상태가 남을 수 있다.
+그래서 중단은 협조적으로 한다.
+
+- 제한 시간을 넘기거나 연결이 끊기면 요청에는 바로 504(499)로 응답하고, 스레드는 계속 실행된다.
+- 연산은 상태가 일관된 곳(청크 사이, 파이프라인 단계 사이, 예산 대기 중, 결과 직렬화/등록 전)에서
+  checkpoint()를 호출하고, 중단됐으면 Aborted가 발생해서 나머지 연산을 건너뛴다.
+- 중단된 연산이 끝날 때까지 연산 스레드와 예약한 예산(functions/admission.py)은 사용 중으로 남는다.
+"""
+import threading, contextlib, contextvars
+
+
+class Aborted(BaseException):
+    """중단된 연산(pandas 내부의 except Exception에 잡히지 않도록 BaseException)"""
+
+
+class Token:
+    """연산 1개의 중단 여부(이벤트 루프에서 abort(), 연산 스레드에서 checkpoint())"""
+    __slots__ = ("_event",)
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def abort(self):
+        self._event.set()
+
+    @property
+    def aborted(self) -> bool:
+        return self._event.is_set()
+
+
+# 실행 중인 연산의 Token(compute()가 연산마다 복사한 context 안에서만)
+_current = contextvars.ContextVar("cancel", default=None)
+
+
+@contextlib.contextmanager
+def scope(token: Token):
+    """with 블록 안의 checkpoint()가 token을 확인"""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def aborted() -> bool:
+    """실행 중인 연산이 중단됐는지(연산 밖이면 False)"""
+    token = _current.get()
+    return token is not None and token.aborted
+
+
+def checkpoint():
+    """실행 중인 연산이 중단됐으면 Aborted를 raise"""
+    if aborted(): raise Aborted()
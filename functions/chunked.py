@@ -0,0 +1,155 @@
+"""디스크에 있는 큰 데이터셋의 groupby 집계를 청크 단위로 실행
+
+메모리 사용량은 데이터셋 크기가 아니라 GROUPBY_CHUNKSIZE와 그룹 수에 비례한다.
+- sum, count, min, max: 청크별 결과를 같은 함수로 다시 집계
+- mean              : 청크별 합계와 개수를 합친 다음 나눔
+- std               : 평균을 먼저 구한 다음(1번째 읽기) 청크별 편차 제곱합을 합침(2번째 읽기)
+- median            : 합칠 수 있는 중간 결과가 없으므로 그룹 키의 해시로 행을 나눠 디스크에 쓴 다음(spill)
+                      파티션별로 계산(한 그룹의 행은 모두 같은 파티션)
+"""
+import os, math, tempfile
+import pandas as pd
+# import modin.pandas as pd
+import pyarrow as pa
+
+from . import store, jobs, admission, cancel
+
+# 한 번에 읽을 행 수(데이터셋이 이보다 크고 디스크에만 있으면 청크 단위로 집계)
+GROUPBY_CHUNKSIZE = int(os.getenv("GROUPBY_CHUNKSIZE", 500000))
+
+# 청크별 결과를 합치는 함수
+MERGE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+def source(item) -> pa.Table or None:
+    """item의 dataset_id가 디스크에만 있고 GROUPBY_CHUNKSIZE 행보다 크거나
+    전체를 읽어서 집계할 메모리가 예산(functions/admission.py)에 맞지 않으면 Arrow 테이블(memory map), 아니면 None
+    """
+    dataset_id = item.query_params.get("dataset_id")
+    table = store.scan(dataset_id) if dataset_id else None
+    if table is None: return None
+    # DataFrame으로 변환(Arrow 크기) + groupby 중간 결과
+    if table.num_rows > GROUPBY_CHUNKSIZE or not admission.fits(2 * table.nbytes + 16 * table.num_rows): return table
+    return None
+
+
+def supported(table: pa.Table, by: list, observed: bool) -> bool:
+    """청크별 결과를 합칠 수 있는지(observed=False인 범주형 키는 청크마다 카테고리가 달라질 수 있어서 제외)"""
+    return observed or not any(pa.types.is_dictionary(table.schema.field(i).type) for i in by)
+
+
+def _numeric(table: pa.Table, values: list) -> list:
+    # 전체를 읽었을 때 숫자 dtype인 컬럼(mean, std, median 대상. 결측치가 있는 bool은 object)
+    result = []
+    for field in table.schema:
+        if field.name not in values: continue
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type) or \
+           (pa.types.is_boolean(field.type) and not table.column(field.name).null_count):
+            result.append(field.name)
+    return result
+
+
+def _chunks(table: pa.Table, columns: list, start: float = 0.0, end: float = 1.0):
+    """GROUPBY_CHUNKSIZE 행씩 변환한 DataFrame(작업으로 실행 중이면 진행률 start~end 기록)"""
+    table = table.select(columns)
+    # 결측치가 있는 정수/bool 컬럼은 전체를 읽었을 때와 같은 dtype으로(청크에 결측치가 없어도)
+    wider = {
+        field.name: "float64" if pa.types.is_integer(field.type) else "object"
+        for field in table.schema
+        if (pa.types.is_integer(field.type) or pa.types.is_boolean(field.type)) and table.column(field.name).null_count
+    }
+    for i in range(0, table.num_rows, GROUPBY_CHUNKSIZE):
+        # 중단된 요청(제한 시간 초과 등)은 청크 사이에서 멈춘다.
+        cancel.checkpoint()
+        chunk = table.slice(i, GROUPBY_CHUNKSIZE).to_pandas(split_blocks=True)
+        yield chunk.astype(wider) if wider else chunk
+        jobs.progress(start + (end - start) * min(i + GROUPBY_CHUNKSIZE, table.num_rows) / table.num_rows)
+
+
+def _merge(state: pd.DataFrame or None, part: pd.DataFrame, by: list, func: str) -> pd.DataFrame:
+    """키 컬럼이 있는 중간 결과 두 개를 합침(그룹 순서는 처음 나온 순서)"""
+    if state is None: return part
+    return pd.concat([state, part], ignore_index=True).groupby(by, sort=False, dropna=False).agg(func).reset_index()
+
+
+def _aggregate(table: pa.Table, by: list, values: list, kwargs: dict, aggs: dict, start: float = 0.0, end: float = 1.0) -> dict:
+    """aggs(이름 => (청크 groupby 함수, 합치는 함수))별로 청크 결과를 합친 DataFrame(키 컬럼 포함)"""
+    states = dict.fromkeys(aggs)
+    for chunk in _chunks(table, by + values, start, end):
+        g = chunk.groupby(by, **kwargs)[values]
+        for name, (partial, merge) in aggs.items():
+            states[name] = _merge(states[name], partial(g).reset_index(), by, merge)
+    return states
+
+
+def _spill_median(table: pa.Table, by: list, values: list, kwargs: dict) -> pd.DataFrame:
+    # 파티션 1개가 청크 1개 정도의 크기가 되도록 나눈다.
+    partitions = max(1, math.ceil(table.num_rows / GROUPBY_CHUNKSIZE))
+    order, results = None, []
+    with tempfile.TemporaryDirectory(dir=store.DATA_DIR) as tmp:
+        for n, chunk in enumerate(_chunks(table, by + values, 0.0, 0.5)):
+            # sort=False 일 때 사용할 그룹의 처음 나온 순서
+            keys  = chunk[by].drop_duplicates()
+            order = keys if order is None else pd.concat([order, keys], ignore_index=True).drop_duplicates()
+            hashes = pd.util.hash_pandas_object(chunk[by], index=False).to_numpy() % partitions
+            for p in pd.unique(hashes):
+                chunk[hashes == p].to_pickle(os.path.join(tmp, f"{p}-{n}.pkl"), compression=None)
+
+        files = sorted(os.listdir(tmp))
+        for p in range(partitions):
+            cancel.checkpoint()
+            parts = [pd.read_pickle(os.path.join(tmp, i), compression=None) for i in files if i.startswith(f"{p}-")]
+            if parts:
+                results.append(pd.concat(parts, ignore_index=True).groupby(by, **kwargs)[values].median().reset_index())
+            jobs.progress(0.5 + 0.5 * (p + 1) / partitions)
+
+    result = pd.concat(results, ignore_index=True)
+    return order.reset_index(drop=True).merge(result, on=by, how="inner", sort=False)
+
+
+def groupby(table: pa.Table, by: list, func: str, sort: bool = True, observed: bool = False, dropna: bool = True) -> pd.DataFrame:
+    """DataFrame.groupby(by).func().reset_index()와 같은 결과를 청크 단위로 계산
+
+    Args:
+    ```
+    table (pa.Table, required): store.scan() 결과(memory map)
+    by    (list,     required): 그룹 키 컬럼
+    func  (str,      required): sum, count, mean, min, max, std, median
+    ```
+    """
+    kwargs = {"sort": False, "observed": observed, "dropna": dropna}
+    values = [i for i in table.column_names if i not in by]
+
+    if func in MERGE:
+        result = _aggregate(table, by, values, kwargs, {func: (lambda g: getattr(g, func)(), MERGE[func])})[func]
+    elif func == "mean":
+        values = _numeric(table, values)
+        states = _aggregate(table, by, values, kwargs, {"sum": (lambda g: g.sum(numeric_only=True), "sum"), "count": (lambda g: g.count(), "sum")})
+        result = states["sum"].set_index(by) / states["count"].set_index(by)
+        result = result.reset_index()
+    elif func == "std":
+        values = _numeric(table, values)
+        states = _aggregate(table, by, values, kwargs, {"sum": (lambda g: g.sum(numeric_only=True), "sum"), "count": (lambda g: g.count(), "sum")}, 0.0, 0.5)
+        count  = states["count"].set_index(by)
+        mean   = (states["sum"].set_index(by) / count).reset_index()
+
+        # 그룹 평균과의 편차 제곱합(키가 결측치인 그룹도 merge에서 같은 키로 매칭)
+        squares = None
+        for chunk in _chunks(table, by + values, 0.5, 1.0):
+            deviation = chunk.merge(mean, on=by, how="left", suffixes=("", "__mean"))
+            deviation = pd.concat(
+                [deviation[by], pd.DataFrame({i: (deviation[i] - deviation[f"{i}__mean"]) ** 2 for i in values})],
+                axis=1,
+            )
+            squares = _merge(squares, deviation.groupby(by, **kwargs)[values].sum(numeric_only=True).reset_index(), by, "sum")
+        result = (squares.set_index(by) / (count - 1).where(count > 1)) ** 0.5
+        result = result.reset_index()
+    elif func == "median":
+        values = _numeric(table, values)
+        result = _spill_median(table, by, values, kwargs)
+    else:
+        raise ValueError(f'"{func}" is invalid function.')
+
+    if sort:
+        result = result.sort_values(by, kind="mergesort", na_position="last")
+    return result.reset_index(drop=True)
@@ -0,0 +1,175 @@
+import os, zlib
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import PlainTextResponse
+
+try:
+    import zstandard
+except ImportError: # zstd는 zstandard가 설치된 경우에만 지원
+    zstandard = None
+
+# 이 크기(bytes)보다 작은 응답은 압축하지 않는다.(압축해도 이득이 거의 없음)
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+# 압축 수준. 연산이 CPU를 많이 쓰기 때문에 압축률보다 속도를 우선(gzip 1~9, zstd 1~22)
+GZIP_LEVEL        = int(os.getenv("GZIP_LEVEL", 4))
+ZSTD_LEVEL        = int(os.getenv("ZSTD_LEVEL", 3))
+# 이 크기(bytes) 이상은 이벤트 루프를 막지 않도록 스레드에서 압축/해제
+COMPRESS_THREAD_SIZE = int(os.getenv("COMPRESS_THREAD_SIZE", 256 * 1024))
+# 압축 해제한 요청 본문의 최대 크기(bytes, 압축 폭탄 방지)
+MAX_BODY_SIZE     = int(os.getenv("MAX_BODY_SIZE", 2**30))
+
+# 서버가 선호하는 순서
+ENCODINGS = (["zstd"] if zstandard else []) + ["gzip"]
+
+
+class _Deflate:
+    """Content-Encoding: deflate 해제
+
+    표준은 zlib 형식(RFC 1950)이지만 헤더 없는 raw deflate를 보내는 클라이언트도 있어서 첫 2바이트로 구분
+    """
+    def __init__(self):
+        self._obj, self._head = None, b""
+
+    def decompress(self, data: bytes) -> bytes:
+        if self._obj is None:
+            self._head += data
+            if len(self._head) < 2: return b""
+            cmf, flg = self._head[0], self._head[1]
+            zlib_header = cmf & 0x0f == 8 and (cmf << 8 | flg) % 31 == 0
+            self._obj, data, self._head = zlib.decompressobj(wbits=15 if zlib_header else -15), self._head, b""
+        return self._obj.decompress(data)
+
+    @property
+    def eof(self) -> bool:
+        return self._obj is not None and self._obj.eof
+
+
+def _decompressor(encoding: str):
+    if encoding in ("gzip", "x-gzip")   : return zlib.decompressobj(wbits=47) # gzip/zlib 헤더 자동 인식
+    if encoding == "deflate"            : return _Deflate()
+    if encoding == "zstd" and zstandard : return zstandard.ZstdDecompressor().decompressobj()
+    return None
+
+
+class _Compressor:
+    """gzip/zstd 스트리밍 압축(청크마다 flush 해서 NDJSON 스트림도 바로 전송)"""
+    def __init__(self, encoding: str):
+        if encoding == "zstd":
+            self._obj   = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self._flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._obj   = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._flush = zlib.Z_SYNC_FLUSH
+
+    def compress(self, data: bytes, more: bool) -> bytes:
+        return self._obj.compress(data) + (self._obj.flush(self._flush) if more else self._obj.flush())
+
+
+def accepted_encoding(accept_encoding: str) -> str or None:
+    """Accept-Encoding 헤더에서 q값이 가장 높은(같으면 서버가 선호하는) 인코딩"""
+    q = {}
+    for part in accept_encoding.split(","):
+        name, *params = [i.strip() for i in part.split(";")]
+        value = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try   : value = float(param[2:])
+                except ValueError: value = 0.0
+        q[name.lower()] = value
+    candidates = [(q.get(i, q.get("*", 0.0)), -n, i) for n, i in enumerate(ENCODINGS)]
+    best = max(candidates)
+    return best[2] if best[0] > 0 else None
+
+
+async def _run(func, data: bytes, *args) -> bytes:
+    if len(data) >= COMPRESS_THREAD_SIZE: return await run_in_threadpool(func, data, *args)
+    return func(data, *args)
+
+
+class CompressionMiddleware:
+    """요청/응답 본문 압축(ASGI 미들웨어)
+
+    - 요청: Content-Encoding: gzip/deflate/zstd 본문을 스트리밍으로 풀어서 전달
+    - 응답: Accept-Encoding에 따라 COMPRESS_MIN_SIZE 이상인 본문을 zstd/gzip으로 압축
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "identity").strip().lower()
+        if content_encoding != "identity":
+            decompressor = _decompressor(content_encoding)
+            if decompressor is None:
+                response = PlainTextResponse(f'Content-Encoding "{content_encoding}" is not supported. It should be in {ENCODINGS}', status_code=415)
+                return await response(scope, receive, send)
+            scope, receive = self._decoded(scope, receive, decompressor)
+
+        encoding = accepted_encoding(headers.get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, self._encoding_send(send, encoding))
+
+    @staticmethod
+    def _decoded(scope, receive, decompressor):
+        # 본문 길이가 바뀌므로 Content-Encoding, Content-Length 헤더 제거
+        scope = dict(scope)
+        scope["headers"] = [(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")]
+        size, received = 0, False
+
+        async def decoded_receive():
+            nonlocal size, received
+            message = await receive()
+            if message["type"] != "http.request": return message
+            received = received or bool(message.get("body"))
+            try:
+                body = await _run(decompressor.decompress, message.get("body", b""))
+            except Exception:
+                raise HTTPException(status_code=400, detail="Request body could not be decompressed.")
+            size += len(body)
+            if size > MAX_BODY_SIZE:
+                raise HTTPException(status_code=413, detail=f"Decompressed request body exceeds {MAX_BODY_SIZE} bytes.")
+            # 마지막 청크까지 받았는데 압축 스트림이 끝나지 않은 본문(중간에 잘린 본문)은 일부만 넘기지 않는다.(zstd eof는 zstandard 0.18부터)
+            if not message.get("more_body", False) and received and not getattr(decompressor, "eof", True):
+                raise HTTPException(status_code=400, detail="Request body could not be decompressed. the compressed stream is truncated.")
+            return {**message, "body": body}
+
+        return scope, decoded_receive
+
+    @staticmethod
+    def _encoding_send(send, encoding):
+        start, compressor = None, None
+
+        async def encoding_send(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                # 본문 첫 청크를 보고 압축 여부를 정한 다음 헤더를 보낸다.
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body, more = message.get("body", b""), message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if "content-encoding" in headers or (len(body) < COMPRESS_MIN_SIZE and not more):
+                    await send(start)
+                    start = None
+                    return await send(message)
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers: del headers["content-length"]
+                body = await _run(compressor.compress, body, more)
+                if not more: headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+            elif compressor is not None:
+                body = await _run(compressor.compress, body, more)
+            await send({**message, "body": body})
+
+        return encoding_send
@@ -1,18 +1,355 @@
-from fastapi import UploadFile
+from typing import Optional
+from fastapi import UploadFile, Query, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from concurrent.futures import ProcessPoolExecutor
+import os, json, shutil, hashlib, tempfile
 import pandas as pd
 # import modin.pandas as pd
+import pyarrow as pa
+import openpyxl
 
+from . import store
 
-async def create_upload_file(file: UploadFile):
+# CSV를 한 번에 읽을 행 수(업로드 중 메모리 사용량은 파일 크기가 아니라 이 값에 비례)
+CSV_CHUNKSIZE = int(os.getenv("CSV_CHUNKSIZE", 100000))
+
+# 여러 시트를 동시에 읽을 때 사용할 최대 프로세스 수
+EXCEL_WORKERS = int(os.getenv("EXCEL_WORKERS", 4))
+
+# 업로드 파일 해시를 계산할 때 한 번에 읽을 크기(bytes)
+HASH_CHUNKSIZE = 2**20
+
+# 업로드 진행 상황 {"bytes_read", "total_bytes", "rows", "done"}을 기록하는 경로(최근 PROGRESS_MAX개)
+# 업로드를 처리하는 워커와 진행 상황을 조회하는 워커가 달라도 같은 파일을 읽는다.
+PROGRESS_DIR = os.path.join(store.DATA_DIR, "uploads")
+PROGRESS_MAX = 100
+
+os.makedirs(PROGRESS_DIR, exist_ok=True)
+
+# 첫 청크에서 정한 dtype에 맞지 않는 값이 나오면 넓은 타입으로 바꾼다.
+WIDER = {"Int64": "float64", "boolean": "object", "float64": "object", "datetime64[ns]": "object"}
+ARROW = {
+    "Int64"         : pa.int64(),
+    "boolean"       : pa.bool_(),
+    "float64"       : pa.float64(),
+    "datetime64[ns]": pa.timestamp("ns"),
+    "object"        : pa.string(),
+}
+
+
+def _fixed_dtypes(chunk: pd.DataFrame) -> dict:
+    """첫 청크에서 추론한 dtype을 이후 청크에 고정할 dtype으로 변환
+
+    int는 뒤에 결측치가 나와도 유지되도록 nullable Int64로 읽는다.
+    (Arrow 파일에는 int64로 저장되고 to_pandas()하면 결측치 유무에 따라 int64/float64, read_csv와 동일)
+    """
+    dtypes = {}
+    for col, dtype in chunk.dtypes.items():
+        if   pd.api.types.is_bool_dtype(dtype)   : dtypes[col] = "boolean"
+        elif pd.api.types.is_integer_dtype(dtype): dtypes[col] = "Int64"
+        elif pd.api.types.is_float_dtype(dtype)  : dtypes[col] = "float64"
+        elif str(dtype) == "datetime64[ns]"      : dtypes[col] = "datetime64[ns]"
+        else                                     : dtypes[col] = "object"
+    return dtypes
+
+
+def _cast(chunk: pd.DataFrame, dtypes: dict) -> bool:
+    """chunk를 dtypes에 맞게 변환. 변환이 안 되는 컬럼은 dtypes를 넓은 타입으로 바꾸고 True 리턴"""
+    widened = False
+    for col, dtype in dtypes.items():
+        while True:
+            try:
+                if dtype == "object": chunk[col] = chunk[col].astype(str).where(chunk[col].notna(), None)
+                else                : chunk[col] = chunk[col].astype(dtype)
+                break
+            except (ValueError, TypeError):
+                dtype = dtypes[col] = WIDER[dtype]
+                widened = True
+    return widened
+
+
+def _write_chunks(chunks, on_chunk=None) -> str:
+    """DataFrame 청크들을 디스크의 Arrow 파일 1개로 저장하고 경로를 리턴(메모리에는 청크 1개만 유지)"""
+    parts  = [] # 타입이 넓어질 때마다 새 파일에 이어서 쓴다.
+    writer = dtypes = None
+    try:
+        for chunk in chunks:
+            if dtypes is None: dtypes = _fixed_dtypes(chunk)
+            if _cast(chunk, dtypes) or writer is None:
+                if writer is not None: writer.close()
+                schema = pa.schema([(str(col), ARROW[dtype]) for col, dtype in dtypes.items()])
+                parts.append(store.new_path())
+                writer = pa.ipc.new_file(parts[-1], schema)
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+            if on_chunk: on_chunk(chunk)
+        writer.close()
+
+        path = parts[-1]
+        if len(parts) > 1:
+            # 앞 파일들을 마지막(가장 넓은) 스키마로 변환해서 하나로 합친다.(배치 단위라 메모리 사용량 일정)
+            path = store.new_path()
+            with pa.ipc.new_file(path, schema) as merged:
+                for part in parts:
+                    reader = pa.ipc.open_file(pa.memory_map(part))
+                    for i in range(reader.num_record_batches):
+                        merged.write_table(pa.Table.from_batches([reader.get_batch(i)]).cast(schema))
+                    os.remove(part)
+    except:
+        for part in parts:
+            if os.path.exists(part): os.remove(part)
+        raise
+    return path
+
+
+def _digest(f) -> str:
+    """파일 내용의 SHA-256(청크 단위로 읽기 때문에 메모리 사용량 일정)"""
+    h = hashlib.sha256()
+    f.seek(0)
+    for chunk in iter(lambda: f.read(HASH_CHUNKSIZE), b""):
+        h.update(chunk)
+    f.seek(0)
+    return h.hexdigest()
+
+
+def _upload_key(digest: str, user_id: Optional[str], sheet: Optional[str] = None) -> str or None:
+    """업로드한 데이터셋을 다시 찾을 키(사용자를 모르면 None, 다시 사용하지 않음)
+
+    같은 파일이라도 시트가 다르면 다른 데이터셋
+    사용자마다 따로 저장하므로 한 사용자가 데이터셋을 삭제해도 같은 파일을 올린 다른 사용자의 데이터셋은 남는다.
+    """
+    if not user_id: return None
+    return f"upload:{user_id}:{digest}:{'' if sheet is None else sheet}"
+
+
+def _lookup(key: Optional[str]) -> str or None:
+    # 이전에 저장한 데이터셋(저장소의 잠금을 기다릴 수 있으므로 스레드에서 실행)
+    return store.lookup(key) if key else None
+
+
+def _save(path: str, key: Optional[str]) -> str:
+    """업로드한 Arrow 파일을 저장소에 등록하고 key로 다시 찾을 수 있도록 기록
+
+    저장소는 다른 워커의 디스크 잠금을 기다릴 수 있으므로 이벤트 루프가 아닌 스레드에서 실행
+    """
+    dataset_id = store.register_file(path)
+    if key: store.alias(key, dataset_id)
+    return dataset_id
+
+
+def _sheet_names(f) -> list:
+    # 큰 통합 문서는 여는 데 오래 걸리므로 스레드에서 실행
+    wb = openpyxl.load_workbook(f, read_only=True)
+    names = wb.sheetnames
+    wb.close()
+    return names
+
+
+async def _handle(dataset_id: str) -> dict:
+    # 저장한 데이터셋의 정보(디스크에 있으면 파일의 스키마를 읽으므로 스레드에서, 그 사이에 삭제됐으면 404)
+    handle = await run_in_threadpool(store.handle, dataset_id)
+    if handle is None:
+        raise HTTPException(status_code=404, detail=f'dataset "{dataset_id}" was removed before the upload finished. upload it again.')
+    return handle
+
+
+def _progress_path(upload_id: str) -> str:
+    # upload_id는 클라이언트가 정한 임의의 문자열이므로 해시를 파일명으로 사용
+    return os.path.join(PROGRESS_DIR, f"{hashlib.sha256(upload_id.encode()).hexdigest()}.json")
+
+
+def _report(upload_id: Optional[str], progress: dict):
+    """진행 상황을 파일에 기록(upload_id가 없으면 무시)"""
+    if upload_id: store.write_file(_progress_path(upload_id), json.dumps(progress))
+
+
+def _progress(upload_id: Optional[str], f) -> dict:
+    f.seek(0, os.SEEK_END)
+    progress = {"bytes_read": 0, "total_bytes": f.tell(), "rows": 0, "done": False}
+    f.seek(0)
+    if upload_id:
+        _report(upload_id, progress)
+        # 오래된 기록부터 삭제
+        try:
+            entries = sorted(os.scandir(PROGRESS_DIR), key=lambda i: i.stat().st_mtime)
+            for entry in entries[:max(0, len(entries) - PROGRESS_MAX)]: os.remove(entry.path)
+        except FileNotFoundError: # 다른 워커가 먼저 삭제
+            pass
+    return progress
+
+
+def _ingest_csv(f, upload_id: Optional[str] = None) -> str:
+    """CSV 파일 객체를 청크 단위로 읽어서 디스크의 Arrow 파일로 저장하고 경로를 리턴"""
+    progress = _progress(upload_id, f)
+
+    def on_chunk(chunk):
+        progress["bytes_read"] = f.tell()
+        progress["rows"]      += len(chunk)
+        _report(upload_id, progress)
+
+    path = _write_chunks(pd.read_csv(f, chunksize=CSV_CHUNKSIZE), on_chunk)
+    progress["done"] = True
+    _report(upload_id, progress)
+    return path
+
+
+def _columns(header: tuple) -> list:
+    """엑셀 헤더 행의 컬럼명(pandas.read_excel과 같은 결과)
+
+    빈 칸은 "Unnamed: 위치", 중복된 이름은 .1, .2 ...를 붙인다.(이미 있는 이름은 건너뜀, 이름이 있는 컬럼부터)
+    """
+    columns = [f"Unnamed: {i}" if v is None else str(v) for i, v in enumerate(header)]
+    unnamed = [i for i, v in enumerate(header) if v is None]
+    counts  = {}
+    for i in [i for i in range(len(columns)) if i not in unnamed] + unnamed:
+        col = name = columns[i]
+        count = counts.get(col, 0)
+        while count > 0:
+            counts[name] = count + 1
+            col = f"{name}.{count}"
+            count = count + 1 if col in columns else counts.get(col, 0)
+        columns[i] = col
+        counts[col] = count + 1
+    return columns
+
+
+def _excel_chunks(f, sheet: Optional[str] = None):
+    """엑셀 시트를 read-only 모드로 한 행씩 읽어서 CSV_CHUNKSIZE 행씩 DataFrame으로 만드는 제너레이터
+
+    pandas.read_excel과 달리 워크북 전체나 다른 시트를 메모리에 올리지 않는다.
+    """
+    wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0] if sheet is None else wb[sheet]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, ())
+        columns = _columns(header)
+
+        buf, blank, empty = [], 0, True
+        for row in rows:
+            # 빈 행은 뒤에 데이터가 있을 때만 추가(시트 끝의 빈 행은 read_excel처럼 제외)
+            if all(v is None for v in row):
+                blank += 1
+                continue
+            buf.extend([(None,) * len(columns)] * blank)
+            buf.append(row[:len(columns)])
+            blank = 0
+            if len(buf) >= CSV_CHUNKSIZE:
+                yield pd.DataFrame(buf, columns=columns)
+                buf, empty = [], False
+        # 헤더만 있는 시트도 컬럼이 있는 빈 DataFrame 1개(read_excel과 같음)
+        if buf or empty:
+            yield pd.DataFrame(buf, columns=columns)
+    finally:
+        wb.close()
+
+
+def _ingest_excel(f, sheet: Optional[str] = None, upload_id: Optional[str] = None) -> str:
+    """엑셀 시트 1개를 디스크의 Arrow 파일로 저장하고 경로를 리턴(f는 파일 객체 또는 경로)"""
+    progress = {"rows": 0, "done": False}
+    _report(upload_id, progress)
+
+    def on_chunk(chunk):
+        progress["rows"] += len(chunk)
+        _report(upload_id, progress)
+
+    path = _write_chunks(_excel_chunks(f, sheet), on_chunk)
+    progress["done"] = True
+    _report(upload_id, progress)
+    return path
+
+
+def _ingest_excel_sheets(f, sheets: list) -> dict:
+    """여러 시트를 프로세스 풀에서 병렬로 저장하고 {시트명: 경로}를 리턴"""
+    # 각 프로세스가 직접 열 수 있도록 업로드 파일을 디스크에 복사
+    with tempfile.NamedTemporaryFile(suffix=".xlsx", dir=store.DATA_DIR, delete=False) as out:
+        f.seek(0)
+        shutil.copyfileobj(f, out)
+        src = out.name
+    try:
+        with ProcessPoolExecutor(max_workers=min(len(sheets), EXCEL_WORKERS)) as pool:
+            return dict(zip(sheets, pool.map(_ingest_excel, [src] * len(sheets), sheets)))
+    finally:
+        os.remove(src)
+
+
+async def create_upload_file(
+    file     : UploadFile,
+    upload_id: Optional[str] = Query(None, max_length=50),
+    sheet    : Optional[str] = Query(None, max_length=200),
+    user_id  : Optional[str] = Header(None),
+):
+    """데이터셋 파일을 업로드해서 서버에 저장하는 함수
+    ```
+    CSV, 엑셀 모두 청크 단위로 읽어서 디스크의 Arrow 파일로 저장(파일 크기와 관계없이 메모리 사용량 일정)
+    파싱은 이벤트 루프를 막지 않도록 스레드(엑셀 시트 여러 개는 프로세스 풀)에서 실행
+    같은 사용자(user-id 헤더)가 내용이 같은 파일(SHA-256)을 다시 업로드하면 파싱하지 않고 이전에 저장한 데이터셋을 리턴
+    upload_id를 지정하면 /uploadfile/progress/{upload_id} 에서 진행 상황을 확인할 수 있다.
+    ```
+    Args:
+    ```
+    file      (UploadFile, required): .csv, .xlsx 파일
+    upload_id (str,        optional): Default None, 진행 상황 확인에 사용할 임의의 id
+    sheet     (str,        optional): Default None, 엑셀 시트명. 쉼표로 구분해서 여러 개, "*"는 전체 시트. None이면 첫 시트
+    user_id   (str,        optional): Default None, 사용자 id(user-id 헤더, 없으면 같은 파일도 새로 저장)
+    ```
+    Returns:
+    ```
+    str: JSON, {"dataset_id", "shape", "columns"}
+               시트를 여러 개 지정한 경우 {시트명: {"dataset_id", "shape", "columns"}}
+    ```
+    """
     EXCEL = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     CSV   = ["application/vnd.ms-excel", "text/csv"]
 
+    # 같은 사용자가 같은 파일을 다시 업로드하면 파싱하지 않고 이전에 저장한 데이터셋을 리턴
+    digest = await run_in_threadpool(_digest, file.file)
+
     if file.content_type == EXCEL:
-        df = pd.read_excel(await file.read())
+        sheets = None if sheet is None else [i.strip() for i in sheet.split(",") if i.strip() != ""]
+        if sheets:
+            names = await run_in_threadpool(_sheet_names, file.file)
+            if sheets == ["*"]: sheets = names
+            error_list = [i for i in sheets if i not in names]
+            if error_list:
+                raise HTTPException(status_code=400, detail=f'"sheet" should be sheet names divided by ",". list not in workbook: {error_list}. It should be in {names}')
+
+        if sheets and len(sheets) > 1:
+            # 이미 저장한 시트는 제외하고 읽는다.
+            ids     = {name: await run_in_threadpool(_lookup, _upload_key(digest, user_id, name)) for name in sheets}
+            missing = [name for name, dataset_id in ids.items() if dataset_id is None]
+            if missing:
+                paths = await run_in_threadpool(_ingest_excel_sheets, file.file, missing)
+                for name, path in paths.items():
+                    ids[name] = await run_in_threadpool(_save, path, _upload_key(digest, user_id, name))
+            await file.close()
+            return json.dumps({name: await _handle(dataset_id) for name, dataset_id in ids.items()})
+
+        key = _upload_key(digest, user_id, sheets[0] if sheets else None)
+        dataset_id = await run_in_threadpool(_lookup, key)
+        reused     = dataset_id is not None
+        if not reused:
+            path       = await run_in_threadpool(_ingest_excel, file.file, sheets[0] if sheets else None, upload_id)
+            dataset_id = await run_in_threadpool(_save, path, key)
 
     elif file.content_type in CSV:
-        df = pd.read_csv(file.file)
+        key = _upload_key(digest, user_id)
+        dataset_id = await run_in_threadpool(_lookup, key)
+        reused     = dataset_id is not None
+        if not reused:
+            path       = await run_in_threadpool(_ingest_csv, file.file, upload_id)
+            dataset_id = await run_in_threadpool(_save, path, key)
 
+    else:
+        raise HTTPException(status_code=400, detail=f'"{file.content_type}" is not supported. upload a .csv or .xlsx file.')
+
+    # 데이터 본문 대신 서버에 저장한 데이터셋의 정보(디스크에 있으면 파일의 스키마를 읽으므로 스레드에서)
+    handle = await _handle(dataset_id)
+
+    if upload_id and reused:
+        # 이전에 저장한 데이터셋을 그대로 사용한 경우
+        progress = _progress(upload_id, file.file)
+        progress.update(bytes_read=progress["total_bytes"], rows=handle["shape"][0], done=True)
+        _report(upload_id, progress)
 
     ############ .csv ##############
     # 판다스
@@ -35,6 +372,21 @@ async def create_upload_file(file: UploadFile):
     # 파일 종료(시스템에 자원 반납)
     await file.close()
 
-    return df.to_json(orient="records") # 판다스의 to_json()과 완전 동일한 함수
+    # 데이터 본문 대신 서버에 저장한 데이터셋의 id를 리턴
+    # 이후 /dataframe/* 기능에 ?dataset_id=... 로 사용(데이터 확인은 /dataframe/head, /dataset/{dataset_id})
+    return json.dumps(handle)
+
 
+async def upload_progress(upload_id: str):
+    """/uploadfile?upload_id=... 로 업로드 중인 파일의 진행 상황을 리턴하는 함수
 
+    Returns:
+    ```
+    str: JSON, {"bytes_read", "total_bytes", "rows", "done"}
+    ```
+    """
+    try:
+        with open(_progress_path(upload_id)) as f:
+            return f.read()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f'upload "{upload_id}" does not exist.')
@@ -0,0 +1,140 @@
+import json
+from typing import Optional
+from fastapi import Request, Query, Header, Response, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from .internal_func import check_error, table_result, isint, stored
+from . import store, jobs, profiler
+
+
+@check_error
+async def get_dataset(item: Request, dataset_id: str) -> tuple:
+    """서버에 저장된 데이터셋 전체를 JSON으로 리턴하는 함수
+    ```
+    /uploadfile, /dataframe/* 에서 받은 dataset_id의 데이터를 내려받을 때 사용
+    Accept 헤더에 application/vnd.apache.arrow.stream 이 있으면 Arrow IPC stream으로 리턴
+    ```
+    Args:
+    ```
+    dataset_id (str, required): 데이터셋 id
+    ```
+    Returns:
+    ```
+    str: JSON
+    ```
+    """
+    df = await stored(dataset_id)
+    if df is None: return False, f'dataset "{dataset_id}" does not exist.'
+    return True, table_result(item, df)
+
+
+@check_error
+async def delete_dataset(dataset_id: str) -> tuple:
+    """서버에 저장된 데이터셋을 삭제하는 함수(더 이상 사용하지 않는 데이터셋의 메모리 반납)
+
+    Args:
+    ```
+    dataset_id (str, required): 데이터셋 id
+    ```
+    Returns:
+    ```
+    str: JSON, {"dataset_id": 삭제된 dataset_id}
+    ```
+    """
+    if not store.remove(dataset_id): return False, f'dataset "{dataset_id}" does not exist.'
+    return True, json.dumps({"dataset_id": dataset_id})
+
+
+@check_error
+async def dataset_versions(dataset_id: str) -> tuple:
+    """데이터셋의 버전 목록을 리턴하는 함수
+    ```
+    dataset_id로 받은 입력에서 만든 결과는 입력의 버전으로 저장된다.(바뀌지 않은 컬럼은 입력과 공유)
+    목록의 dataset_id는 그대로 사용할 수 있으므로 원하는 이전 버전으로 되돌릴 수 있다.
+    ```
+    Args:
+    ```
+    dataset_id (str, required): 데이터셋 id
+    ```
+    Returns:
+    ```
+    str: JSON, [{"dataset_id", "op": 만든 기능, "shared": 부모와 공유하는 컬럼 수}, ...] (dataset_id부터 원본 순서)
+    ```
+    """
+    history = store.versions(dataset_id)
+    if not history: return False, f'dataset "{dataset_id}" does not exist.'
+    return True, json.dumps(history)
+
+
+@check_error
+async def undo_dataset(dataset_id: str, steps: Optional[str] = Query("1", max_length=50)) -> tuple:
+    """steps번 전 버전으로 되돌리는 함수(데이터셋은 변경되지 않으므로 이전 버전의 정보를 리턴)
+
+    Args:
+    ```
+    dataset_id (str, required): 데이터셋 id
+    steps      (str, optional): Default "1", 되돌릴 단계 수
+    ```
+    Returns:
+    ```
+    str: JSON, 이전 버전의 {"dataset_id", "shape", "columns", "schema"}
+    ```
+    """
+    steps = "1" if steps == "" else steps
+    if not isint(steps): return False, f'"steps" should be int. current steps = {steps}'
+    steps = int(steps)
+
+    history = store.versions(dataset_id)
+    if not history: return False, f'dataset "{dataset_id}" does not exist.'
+    if steps < 0 or steps >= len(history):
+        return False, f'"steps" should be 0 or more and less than {len(history)}. (number of versions that still exist)'
+    # 다른 워커가 저장 중인 버전은 저장이 끝날 때까지 기다리므로 스레드에서
+    handle = await run_in_threadpool(store.handle, history[steps]["dataset_id"])
+    if handle is None: return False, f'dataset "{history[steps]["dataset_id"]}" does not exist.'
+    return True, json.dumps(handle)
+
+
+@check_error
+async def get_job(job_id: str) -> tuple:
+    """/dataframe/* 등에 ?job=true 로 요청한 작업의 상태 또는 결과를 리턴하는 함수
+    ```
+    실행 중이면 202, {"job_id", "name", "status": "pending" 또는 "running", "progress": 0~1 또는 null, "elapsed": 초}
+    끝나면 job=true 없이 요청했을 때와 같은 결과(실패한 경우 에러 메시지), 결과는 끝난 뒤 JOB_TTL초 동안 보관
+    ```
+    Args:
+    ```
+    job_id (str, required): 작업 id
+    ```
+    Returns:
+    ```
+    str: JSON 또는 기능의 결과
+    ```
+    """
+    return jobs.result(job_id)
+
+
+@check_error
+async def get_profile(profile_id: str, admin_key: Optional[str] = Header(None)) -> tuple:
+    """?profile=true 로 요청한 프로파일을 folded stack 파일로 리턴하는 함수(관리자만)
+    ```
+    한 줄에 "바깥 함수;...;안쪽 함수 샘플 수", flamegraph.pl 또는 speedscope(https://www.speedscope.app)로 열 수 있다.
+    ```
+    Args:
+    ```
+    profile_id (str, required): 응답의 Profile-Id 헤더
+    admin_key  (str, required): 관리자 키(admin-key 헤더)
+    ```
+    Returns:
+    ```
+    str: text/plain, folded stack
+    ```
+    """
+    profiler.authorize(admin_key)
+    folded = await run_in_threadpool(profiler.load, profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail=f'profile "{profile_id}" does not exist or has expired.')
+    return True, Response(
+        content    = folded,
+        media_type = "text/plain",
+        headers    = {"Content-Disposition": f'attachment; filename="{profile_id}.folded"'},
+    )
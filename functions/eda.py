@@ -8,36 +8,39 @@ import pandas as pd
 from .internal_func import (
     boolean,
     isint,
-    check_error
+    check_error,
+    read_df,
+    frame_result,
+    table_result,
 )
 
 @check_error
 async def head(item: Request, *, line: Optional[str] = Query(5, max_length=50)) -> tuple:
     try:    line = int(line)
     except: line = 5
-    return True, pd.read_json(await item.json()).head(line).to_json(orient="records")
+    return True, table_result(item, (await read_df(item)).head(line))
 
 
 @check_error
 async def tail(item: Request, *, line: Optional[str] = Query(5, max_length=50)) -> tuple:
     try:    line = int(line)
     except: line = 5
-    return True, pd.read_json(await item.json()).tail(int(line)).to_json(orient="records")
+    return True, table_result(item, (await read_df(item)).tail(int(line)))
 
 
 @check_error
 async def shape(item: Request) -> tuple:
-    return True, json.dumps(pd.read_json(await item.json()).shape)
+    return True, json.dumps((await read_df(item)).shape)
 
 
 @check_error
 async def dtype(item: Request) -> tuple:    
-    return True, pd.read_json(await item.json()).dtypes.reset_index(name='Dtype').rename(columns={"index":"Column"}).to_json(orient="records", default_handler=str)
+    return True, table_result(item, (await read_df(item)).dtypes.reset_index(name='Dtype').rename(columns={"index":"Column"}), default_handler=str)
 
 
 @check_error
 async def columns(item: Request) -> tuple:
-    cols = list(pd.read_json(await item.json()).columns)
+    cols = list((await read_df(item)).columns)
     return True, f"{cols}"
 
 
@@ -55,7 +58,7 @@ async def unique(item: Request, col: str) -> tuple:
     """입력이 DataFrame의 JSON일 경우
 
     /file/unique/컬럼명 에서 컬럼명이 DataFrame에 없을 경우 에러메시지를 리턴한다."""
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
     try:
         if col not in df.columns:
             return False, f"{col} is not in columns of DataFrame. It should be in {list(df.columns)}"
@@ -83,9 +86,9 @@ async def isna(item: Request, *, sum: Optional[str] = Query("false", max_length=
     """
     sum = boolean(sum)
     if sum is None: return False, "sum은 true or false를 넣으셔야 합니다."
-    if sum: return True, pd.read_json(await item.json()).isna().sum().reset_index(name='NumOfNaN')\
-            .rename(columns={"index":"Column"}).to_json(orient="records", default_handler=str)
-    else  : return True, pd.read_json(await item.json()).isna().to_json(orient="records")
+    if sum: return True, table_result(item, (await read_df(item)).isna().sum().reset_index(name='NumOfNaN')\
+            .rename(columns={"index":"Column"}), default_handler=str)
+    else  : return True, table_result(item, (await read_df(item)).isna())
 
 
 @check_error
@@ -136,7 +139,7 @@ async def corr(
     except: 
         return False, "req_min should be positive integer"
     
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
     dfcols = list(df.columns)
     if col1 and col1 not in dfcols: return False, f"{col1} is not in columns of DataFrame. It should be in {dfcols}"
     if col2 and col2 not in dfcols: return False, f"{col2} is not in columns of DataFrame. It should be in {dfcols}"
@@ -148,20 +151,20 @@ async def corr(
             min_periods = req_min
         )
     elif col1:
-        return True, df.corr(
+        return True, table_result(item, df.corr(
             method      = method, 
             min_periods = req_min
-        )[col1].reset_index(name=col1).rename(columns={"index":"Column"}).to_json(orient="records", default_handler=str)
+        )[col1].reset_index(name=col1).rename(columns={"index":"Column"}), default_handler=str)
     elif col2:
-        return True, df.corr(
+        return True, table_result(item, df.corr(
             method      = method, 
             min_periods = req_min
-        )[col2].reset_index(name=col2).rename(columns={"index":"Column"}).to_json(orient="records", default_handler=str)
+        )[col2].reset_index(name=col2).rename(columns={"index":"Column"}), default_handler=str)
     else:
-        return True, df.corr(
+        return True, table_result(item, df.corr(
             method      = method, 
             min_periods = req_min
-        ).reset_index().rename(columns={"index":""}).to_json(orient="records")
+        ).reset_index().rename(columns={"index":""}))
 
 
 @check_error
@@ -262,7 +265,7 @@ async def describe(
     # "bool"       # 
 
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
     chk = {str(i) for i in df.dtypes.unique()}
 
     include = []
@@ -285,12 +288,12 @@ async def describe(
     if len(exclude) == 3:
         exclude = None
 
-    return True, df.describe(
+    return True, table_result(item, df.describe(
         percentiles         = percentiles,
         include             = include if include else None,
         exclude             = exclude if exclude else None,
         datetime_is_numeric = True if date2num.lower() == "true" else False
-    ).reset_index().rename(columns={"index":"Info"}).to_json(orient="records")
+    ).reset_index().rename(columns={"index":"Info"}))
 
 
 @check_error
@@ -344,7 +347,7 @@ async def col_condition(
     cond2  = None if cond2  == "" else cond2
     value2 = None if value2 == "" else value2
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
     if cond1 not in ["eq", "gr", "gr_eq", "le", "le_eq"]:
         return False, f'"cond1" should be in ["eq", "gr", "gr_eq", "le", "le_eq"], current {cond1}'
@@ -394,7 +397,7 @@ async def col_condition(
             elif cond1 == "le"   : df = df[df[col] <  value1]
             elif cond1 == "le_eq": df = df[df[col] <= value1]
 
-        return True, df.to_json(orient="records")
+        return True, frame_result(item, df)
     else:
         return False, f"{col} is not in columns of DataFrame. It should be in {dfcols}"
 
@@ -441,7 +444,7 @@ async def loc(
     col_from  = None if col_from == "" else col_from
     col_to    = None if col_to   == "" else col_to
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
     if str(df.index.dtype) == "int64":
         if idx is None:
@@ -492,7 +495,7 @@ async def loc(
     elif cols is None                 : df = df.loc[idx, col_from:col_to]
     else                              : df = df.loc[idx, cols]
 
-    return True, df.to_json(orient="records")
+    return True, frame_result(item, df)
 
 @check_error
 async def iloc(
@@ -536,7 +539,7 @@ async def iloc(
     col_from  = None if col_from == "" else col_from
     col_to    = None if col_to   == "" else col_to
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
     if idx is None:
         if idx_from is not None:
@@ -577,4 +580,4 @@ async def iloc(
     elif cols is None                 : df = df.iloc[idx, col_from:col_to]
     else                              : df = df.iloc[idx, cols]
 
-    return True, df.to_json(orient="records")
+    return True, frame_result(item, df)
@@ -2,6 +2,8 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+from . import store, memo, jobs, logs, metrics, timing, profiler, cancel
+
 FUNCTIONS = {
     "sum"   : lambda x: x.sum,
     "count" : lambda x: x.count,
@@ -28,31 +30,450 @@ def isint(x:str) -> bool:
         return False
 
 
-import psycopg2
+from typing import Optional
+from fastapi import Header, Cookie, Request, Query, HTTPException, Response
+from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from concurrent.futures import ThreadPoolExecutor
+import datetime, time, inspect, traceback, json, io, jwt, asyncio, contextvars, functools, threading
+import pandas as pd
+# import modin.pandas as pd
+import pyarrow as pa
+
+SECRET_KEY=os.getenv("SECRET_KEY")
+
+# 본문 대신 서버에 저장된 데이터셋을 가리킬 때 쓰는 쿼리 파라미터
+# dataset_id: 입력 DataFrame 1개, {key}_id: 본문의 item[key] 대신 사용(left_id, right_id, X_id, y_id)
+ID_PARAMS = ["dataset_id", "left_id", "right_id", "X_id", "y_id"]
+# 본문을 읽을 때 타입 추론 대신 사용할 스키마의 dataset_id: schema_id, {key}_schema_id
+
+# records JSON 대신 주고받을 수 있는 Arrow IPC stream 형식(Content-Type / Accept 헤더)
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# stream=true 일 때 NDJSON 한 번에 직렬화할 행 수
+NDJSON_CHUNKSIZE = int(os.getenv("NDJSON_CHUNKSIZE", 10000))
+
+# 기능 함수(pandas 연산)를 실행할 스레드 수 = 동시에 연산하는 최대 요청 수
+# 이벤트 루프는 요청 수신과 응답 전송만 담당하기 때문에 연산이 오래 걸려도 다른 요청이 멈추지 않는다.
+# 여러 워커(WEB_CONCURRENCY, start.sh)로 실행하면 코어를 워커 수로 나눈 만큼 사용
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or 1)
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", max(2 if WEB_CONCURRENCY > 1 else 4, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+
+_compute_pool  = ThreadPoolExecutor(max_workers=COMPUTE_WORKERS, thread_name_prefix="compute")
+_compute_local = threading.local()
+
+# 기능의 제한 시간(초, 0이면 제한 없음). 기능별로 지정하려면 REQUEST_TIMEOUTS="merge=120,corr=30"
+# 제한 시간을 넘기거나 클라이언트 연결이 끊기면 바로 응답하고 연산은 다음 cancel.checkpoint()에서 중단한다.(?job=true 작업은 JOB_TIMEOUT, 연결과 무관)
+REQUEST_TIMEOUT  = float(os.getenv("REQUEST_TIMEOUT", 60))
+REQUEST_TIMEOUTS = {
+    k.strip(): float(v)
+    for k, v in (i.split("=", 1) for i in os.getenv("REQUEST_TIMEOUTS", "").split(",") if "=" in i)
+}
+JOB_TIMEOUT      = float(os.getenv("JOB_TIMEOUT", 0))
+# 연산 중에 클라이언트 연결이 끊겼는지 확인하는 간격(초)
+DISCONNECT_INTERVAL = 0.5
+
+
+def to_arrow(df: pd.DataFrame) -> bytes:
+    """DataFrame을 Arrow IPC stream으로 변환(records JSON처럼 인덱스는 제외)"""
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # 여러 타입이 섞인 object 컬럼(transpose 결과 등)은 문자열로 변환
+        df = df.copy()
+        for c in df.columns[df.dtypes == object]: df[c] = df[c].astype(str).where(df[c].notna(), None)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class FrameItem:
+    """Request 대신 기능 함수에 DataFrame을 직접 넘길 때 사용(/dataframe/pipeline)
+
+    read_df는 본문을 읽지 않고 df(key가 있으면 frames[key], 없으면 df)를 리턴하고,
+    table_result/frame_result는 직렬화하지 않고 결과 DataFrame을 리턴한다.
+    """
+    def __init__(self, df: pd.DataFrame, **frames):
+        self.df           = df
+        self.frames       = frames
+        self.query_params = {}
+        self.headers      = {}
+
+
+async def stored(dataset_id: str) -> pd.DataFrame or None:
+    """서버에 저장된 DataFrame(없으면 None)
+
+    다른 워커가 저장 중인 데이터셋은 이벤트 루프를 막지 않도록 스레드에서 저장이 끝날 때까지 기다린다.
+    """
+    if store.saving(dataset_id): return await run_in_threadpool(store.get, dataset_id)
+    return store.get(dataset_id)
 
-def save_log(query):
-    db = psycopg2.connect(
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PW"),
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME")
+
+async def read_df(item: Request, key: Optional[str] = None, copy: bool = False) -> pd.DataFrame:
+    """요청에서 입력 DataFrame을 가져오는 함수
+    ```
+    쿼리에 dataset_id(key가 있으면 {key}_id)가 있으면 서버에 저장된 DataFrame을,
+    없으면 기존처럼 본문의 JSON(key가 있으면 item[key])을 읽는다.
+    본문은 records JSON 문자열 또는 records 배열 그대로(이 경우 파싱 1번) 보낼 수 있고,
+    schema_id(key가 있으면 {key}_schema_id)가 있으면 해당 데이터셋의 스키마로 읽는다.
+    저장된 DataFrame은 공유되므로 직접 값을 바꾸는 기능은 copy=True로 사용해야 한다.
+    ```
+    """
+    if isinstance(item, FrameItem):
+        df = item.frames.get(key, item.df)
+        return df.copy() if copy else df
+    df = await _read_df(item, key, copy)
+    # 입력을 읽는 동안 중단된 기능은 연산을 시작하지 않는다.
+    cancel.checkpoint()
+    # 입력 DataFrame의 메모리(/metrics, func_log)
+    metrics.frame("input", df)
+    return df
+
+
+async def _read_df(item: Request, key: Optional[str], copy: bool) -> pd.DataFrame:
+    dataset_id = item.query_params.get(f"{key}_id" if key else "dataset_id")
+    if dataset_id:
+        with timing.span("load"):
+            df = await stored(dataset_id)
+        if df is None:
+            raise HTTPException(status_code=404, detail=f'dataset "{dataset_id}" does not exist. upload it again.')
+        return df.copy() if copy else df
+
+    if item.headers.get("content-type", "").startswith(ARROW_STREAM):
+        if key:
+            raise HTTPException(status_code=415, detail=f'Arrow body can hold only one DataFrame. use "{key}_id" instead of item["{key}"].')
+        body = await item.body()
+        with timing.span("parse"):
+            return pa.ipc.open_stream(body).read_all().to_pandas()
+
+    schema_id = item.query_params.get(f"{key}_schema_id" if key else "schema_id")
+    schema    = None
+    if schema_id:
+        schema = store.schema(schema_id)
+        if schema is None:
+            raise HTTPException(status_code=404, detail=f'dataset "{schema_id}" does not exist. schema_id should be dataset_id.')
+
+    body = await item.body()
+    if key is None and body.lstrip()[:1] == b"[":
+        # records 배열을 그대로 보낸 경우 JSON 문자열로 한 번 더 감싸지 않았으므로 한 번만 파싱
+        data = io.BytesIO(body)
+    else:
+        with timing.span("json"):
+            data = await item.json()
+        data = data[key] if key else data
+    with timing.span("parse"):
+        return parse_json(data, schema)
+
+
+def parse_json(data, schema: Optional[dict] = None) -> pd.DataFrame:
+    """records JSON을 DataFrame으로 변환. schema가 있으면 타입 추론, 날짜 추정 없이 지정된 dtype으로 읽는다."""
+    if schema is None:
+        return pd.read_json(data)
+    df = pd.read_json(
+        data,
+        dtype              = {**schema["dtypes"], **{c: "object" for c in schema["categories"]}},
+        convert_dates      = schema["datetime"],
+        keep_default_dates = False,
     )
-    cursor = db.cursor()
-    cursor.execute(query)
+    for col, categories in schema["categories"].items():
+        if col in df.columns: df[col] = df[col].astype(pd.CategoricalDtype(categories))
+    return df
 
-    cursor.close()
-    db.commit()
-    db.close()
 
-from typing import Optional
-from fastapi import Header, Cookie
-import datetime, inspect, traceback, jwt
+def to_ndjson(df: pd.DataFrame, **kwargs):
+    """DataFrame을 NDJSON(한 줄에 행 1개)으로 NDJSON_CHUNKSIZE 행씩 직렬화하는 제너레이터"""
+    for i in range(0, len(df), NDJSON_CHUNKSIZE):
+        yield df.iloc[i:i + NDJSON_CHUNKSIZE].to_json(orient="records", lines=True, **kwargs).rstrip("\n") + "\n"
+
+
+def table_result(item: Request, df: pd.DataFrame, **kwargs) -> str or Response:
+    """표 형태의 결과를 리턴 값으로 바꾸는 함수
+    ```
+    Accept 헤더에 Arrow IPC stream이 있으면 Arrow로,
+    stream=true 이면 청크 단위로 직렬화하는 NDJSON StreamingResponse로(결과 전체 문자열을 만들지 않음),
+    둘 다 아니면 df.to_json(orient="records", **kwargs)
+    FrameItem이면 DataFrame 그대로(default_handler가 있으면 JSON으로 바꿀 수 없는 값에 적용해서 직렬화한 결과와 같게)
+    ```
+    """
+    if isinstance(item, FrameItem): return _handled(df, kwargs.get("default_handler"))
+    # 중단된 기능의 결과는 직렬화하지 않는다.
+    cancel.checkpoint()
+    metrics.frame("output", df)
+    if boolean(item.query_params.get("stream") or "false") and ARROW_STREAM not in item.headers.get("accept", ""):
+        # 직렬화는 응답을 보내면서(단계 시간에 포함되지 않음)
+        return StreamingResponse(to_ndjson(df, **kwargs), media_type="application/x-ndjson")
+    with timing.span("serialize"):
+        if ARROW_STREAM in item.headers.get("accept", ""):
+            return Response(content=to_arrow(df), media_type=ARROW_STREAM)
+        return df.to_json(orient="records", **kwargs)
+
+
+def _handled(df: pd.DataFrame, handler) -> pd.DataFrame:
+    # to_json(default_handler=handler)처럼 object 컬럼에서 JSON 기본 타입이 아닌 값(dtype 등)에만 handler 적용
+    if handler is None: return df
+    plain = (str, int, float, bool, type(None))
+    cols = [col for col, t in df.dtypes.items() if t == object and not df[col].map(lambda v: isinstance(v, plain)).all()]
+    if not cols: return df
+    df = df.copy(deep=False)
+    for col in cols:
+        df[col] = df[col].map(lambda v: v if isinstance(v, plain) else handler(v))
+    return df
+
+
+def select_columns(df: pd.DataFrame, cols: list) -> pd.DataFrame:
+    """df[cols]와 같지만 컬럼 배열을 복사하지 않는 함수(컬럼명이 중복되면 df[cols])"""
+    if not df.columns.is_unique: return df[cols]
+    return _share(df, {col: df[col] for col in cols}, cols)
+
+
+def with_columns(df: pd.DataFrame, columns: dict) -> pd.DataFrame:
+    """df에 columns(컬럼명 => Series 또는 값)를 추가하거나 바꾼 새 DataFrame을 리턴하는 함수
+    ```
+    df를 복사해서 df[col] = 값 으로 바꾸는 것과 같지만 바뀌지 않은 컬럼은 복사하지 않고 df와 배열을 공유한다.
+    (저장된 DataFrame은 변경하지 않으므로 공유해도 안전하고, 저장소도 바뀐 컬럼만 새로 저장)
+    ```
+    """
+    if not df.columns.is_unique:
+        df = df.copy()
+        for col, value in columns.items(): df[col] = value
+        return df
+    data = {col: df[col] for col in df.columns}
+    data.update(columns)
+    return _share(df, data, list(data))
+
+
+def _share(df: pd.DataFrame, data: dict, cols: list) -> pd.DataFrame:
+    # Series는 인덱스를 맞추지 않고 배열을 그대로 사용(df에서 계산한 Series라 인덱스가 같음)
+    result = pd.DataFrame(
+        {col: value.array if isinstance(value, pd.Series) else value for col, value in data.items()},
+        index   = df.index,
+        columns = cols,
+        copy    = False,
+    )
+    result.columns.name = df.columns.name
+    return result
+
+
+def frame_result(item: Request, df: pd.DataFrame, negotiate: bool = True) -> str or Response:
+    """결과 DataFrame을 리턴 값으로 바꾸는 함수
+    ```
+    입력을 dataset_id로 받은 경우: 결과를 저장소에 등록하고 {"dataset_id", "shape", "columns"}를 리턴
+    입력을 본문으로 받은 경우    : table_result와 동일(Accept 헤더에 따라 Arrow 또는 records JSON)
+    negotiate=False면 Accept 헤더와 관계없이 JSON 문자열(여러 DataFrame을 JSON 하나로 묶어서 리턴할 때 사용)
+    ```
+    """
+    if isinstance(item, FrameItem): return df
+    # 중단된 기능의 결과는 저장소에 등록하지 않는다.
+    cancel.checkpoint()
+    if any(item.query_params.get(i) for i in ID_PARAMS):
+        metrics.frame("output", df)
+        # dataset_id로 받은 입력의 버전으로 등록(바뀌지 않은 컬럼은 입력과 공유)
+        with timing.span("store"):
+            dataset_id = store.register(df, parent=item.query_params.get("dataset_id"), op=_func_name.get())
+            memo.registered(dataset_id)
+            handle = store.handle(dataset_id)
+            if handle is None:
+                raise HTTPException(status_code=404, detail=f'dataset "{dataset_id}" was removed before the result could be returned. run it again.')
+            return json.dumps(handle)
+    if negotiate:
+        return table_result(item, df)
+    metrics.frame("output", df)
+    with timing.span("serialize"):
+        return df.to_json(orient="records")
+
+
+def _run_coroutine(coro):
+    # 스레드마다 이벤트 루프 하나를 만들어 재사용
+    loop = getattr(_compute_local, "loop", None)
+    if loop is None:
+        loop = _compute_local.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coro)
+
+
+class Cancelled(HTTPException):
+    """제한 시간 초과(504), 클라이언트 연결 끊김(499)으로 중단된 기능(func_log의 is_worked 3)"""
+
+
+class _Task:
+    """연산 스레드에서 실행 중인 기능 1개
+
+    스레드는 강제로 멈추지 않고 중단 표시만 한다.(functions/cancel.py)
+    기능은 다음 cancel.checkpoint()(청크, 단계 사이, 결과 직렬화 전 등)에서 cancel.Aborted로 나머지 연산을 건너뛴다.
+    """
+    __slots__ = ("token", "started", "finished")
+
+    def __init__(self):
+        self.token   = cancel.Token()
+        self.started = self.finished = None
+
+    def run(self, coro):
+        self.started = time.perf_counter()
+        try:
+            # 스레드 풀에서 기다리는 동안 중단된 기능은 실행하지 않는다.
+            if self.token.aborted:
+                coro.close()
+                raise cancel.Aborted()
+            with cancel.scope(self.token):
+                return _run_coroutine(coro)
+        finally:
+            self.finished = time.perf_counter()
+
+    def abort(self):
+        self.token.abort()
+
+
+def _timeout(name: str) -> float:
+    if jobs.current() is not None: return JOB_TIMEOUT
+    return REQUEST_TIMEOUTS.get(name, REQUEST_TIMEOUT)
+
+
+async def compute(func, /, *args, **kwargs):
+    """async 기능 함수를 연산 전용 스레드 풀(COMPUTE_WORKERS)에서 실행하고 결과를 리턴
+
+    요청 본문은 이벤트 루프에서 미리 읽어두기 때문에(Request가 캐시)
+    함수 안의 await item.json(), await item.body()는 스레드에서 바로 끝난다.
+    제한 시간(REQUEST_TIMEOUT)을 넘기거나 클라이언트 연결이 끊기면 바로 Cancelled(504, 499)를 raise하고
+    연산 스레드는 다음 cancel.checkpoint()에서 멈춘다.(그 전까지 스레드와 예산은 사용 중)
+    """
+    for value in [*args, *kwargs.values()]:
+        if isinstance(value, Request): await value.body()
+    name    = func.__name__
+    since   = timing.mark()
+    queued  = time.perf_counter()
+    limit   = _timeout(name)
+    # 작업(?job=true)은 요청을 보낸 연결이 이미 끝났으므로 연결 끊김을 확인하지 않는다.
+    item    = _request(args, kwargs) if jobs.current() is None else None
+    task    = _Task()
+    profile = profiler.current()
+    if profile is not None: profile.watch(task)
+    context = contextvars.copy_context()
+    future  = asyncio.get_running_loop().run_in_executor(_compute_pool, context.run, task.run, func(*args, **kwargs))
+    start   = time.monotonic()
+    try:
+        while True:
+            wait = DISCONNECT_INTERVAL if item is not None else None
+            if limit: wait = max(0.0, min(wait or limit, start + limit - time.monotonic()))
+            done, _ = await asyncio.wait({future}, timeout=wait)
+            if done:
+                result = future.result()
+                # 스레드에서 기록한 단계(parse, serialize 등)를 뺀 연산 시간
+                timing.add("queue", task.started - queued)
+                timing.add("compute", task.finished - task.started, since)
+                return result
+            if limit and time.monotonic() - start >= limit:
+                error = Cancelled(status_code=504, detail=f'"{name}" was cancelled because it took more than {limit:g} seconds. use "job=true" for long operations.')
+                break
+            if item is not None and await item.is_disconnected():
+                error = Cancelled(status_code=499, detail=f'"{name}" was cancelled because the client disconnected.')
+                break
+    except asyncio.CancelledError: # 서버 종료 등
+        task.abort()
+        raise
+    task.abort()
+    # 중단된 연산의 cancel.Aborted(또는 늦게 끝난 결과)는 꺼내서 버림
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    raise error
+
+
+def offload(func):
+    """check_error를 사용하지 않는 기능 함수(시각화)를 연산 전용 스레드 풀에서 실행하는 데코레이터(결과 캐시, ?job=true 포함)"""
+    async def run(*args, **kwargs) -> tuple:
+        return True, await memo.call(func, compute, *args, **kwargs)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        item = _request(args, kwargs)
+        if item is not None and boolean(item.query_params.get("job") or "false"):
+            return await jobs.submit(item, func.__name__, run(*args, **kwargs))
+        return (await run(*args, **kwargs))[1]
+    return wrapper
+
+
+# 실행 중인 기능의 이름(frame_result가 버전 정보로 기록)
+_func_name = contextvars.ContextVar("func_name", default=None)
+
+
+def _request(args, kwargs) -> Request or None:
+    return next((v for v in [*args, *kwargs.values()] if isinstance(v, Request)), None)
+
+
+def _body_bytes(value) -> int or None:
+    """응답 본문 크기(bytes, 스트리밍 응답 등 알 수 없으면 None)"""
+    if isinstance(value, StreamingResponse): return None
+    if isinstance(value, Response): return len(value.body)
+    if isinstance(value, str)     : return len(value.encode())
+    if isinstance(value, bytes)   : return len(value)
+    return None
+
+
+def _record(user_id, name: str, is_worked: int, start, usage: dict, args, kwargs, value=None, error: str = None):
+    # /metrics의 기능별 집계(functions/metrics.py), func_log 기록은 백그라운드에서 모아서(functions/logs.py)
+    end = datetime.datetime.now(tz=datetime.timezone.utc)
+    with timing.span("log"):
+        item = _request(args, kwargs)
+        size = item.headers.get("content-length") if item is not None else None
+        memory = metrics.end(name, is_worked, (end - start).total_seconds(), int(size) if isint(size) else None, _body_bytes(value), usage)
+        logs.record(user_id, name, is_worked, start, end, error, memory)
+
+
+async def _logged(func, user_id, /, *args, **kwargs) -> tuple:
+    """기능을 실행하고 결과를 func_log, /metrics에 기록. (성공 여부, 리턴 값)을 리턴"""
+    name = func.__name__
+    start = datetime.datetime.now(tz=datetime.timezone.utc)
+    usage = metrics.begin(name)
+    try:
+        item = _request(args, kwargs)
+        if item is not None:
+            with timing.span("body"):
+                await item.body()
+        if profiler.current() is not None:
+            # 프로파일링은 캐시된 결과 대신 실제로 실행
+            tf, return_value = await compute(func, *args, **kwargs)
+        else:
+            # 같은 입력, 같은 파라미터로 실행한 결과가 있으면 다시 계산하지 않는다.(functions/memo.py)
+            tf, return_value = await memo.call(func, compute, *args, **kwargs)
+        is_worked = 0 if tf else 1
+        _record(user_id, name, is_worked, start, usage, args, kwargs, return_value)
+        return tf, return_value
+    except Cancelled as e:
+        # 제한 시간 초과 또는 클라이언트 연결 끊김으로 중단
+        _record(user_id, name, 3, start, usage, args, kwargs, error=e.detail)
+        raise
+    except HTTPException:
+        # 잘못된 요청(없는 dataset_id 등). FastAPI가 상태 코드와 함께 응답하도록 다시 raise
+        _record(user_id, name, 1, start, usage, args, kwargs)
+        raise
+    except:
+        # Unexpected error
+        error = traceback.format_exc()
+        _record(user_id, name, 2, start, usage, args, kwargs, error, error)
+        return False, error
 
-SECRET_KEY=os.getenv("SECRET_KEY")
 
 def check_error(func):
-    async def wrapper(*args, user_id: Optional[str] = Header(None), token: Optional[str] = Header(None), **kwargs):
+    func_params = inspect.signature(func).parameters
+
+    ## 입력 DataFrame을 받는 기능에는 공통 쿼리 파라미터를 문서에 추가(값은 read_df, table_result에서 item으로 읽음)
+    # dataset_id: 본문 대신 사용할 서버의 데이터셋, schema_id: 본문을 읽을 때 사용할 스키마(dataset_id)
+    # stream: true면 표 형태의 결과를 NDJSON으로 스트리밍, job: true면 백그라운드 작업으로 실행(/jobs/{job_id})
+    # profile: true면 요청 1개를 프로파일링(관리자만, 응답의 Profile-Id 헤더 => /profiles/{profile_id})
+    common_params = [] if "item" not in func_params else [
+        inspect.Parameter(
+            name,
+            inspect.Parameter.KEYWORD_ONLY,
+            default    = Query(default, max_length=50),
+            annotation = Optional[str],
+        )
+        for name, default in [("dataset_id", None), ("schema_id", None), ("stream", "false"), ("job", "false"), ("profile", "false")] if name not in func_params
+    ]
+
+    async def wrapper(*args, user_id: Optional[str] = Header(None), token: Optional[str] = Header(None), admin_key: Optional[str] = Header(None), **kwargs):
+        for p in common_params: kwargs.pop(p.name, None)
+        # 관리자 키를 직접 확인하는 기능(/profiles/{profile_id})
+        if "admin_key" in func_params: kwargs["admin_key"] = admin_key
+
         try:
             # 토큰을 검증하여 유효한 토큰인지 확인
             # JWT 토큰 인증되지 않으면 기능 작동 X (정상적인 사용자가 아닌 것으로 간주)
@@ -64,27 +485,21 @@ def check_error(func):
             return {"result":False, "token_state":False, "message":str(e)}
 
         name = func.__name__
-        start = datetime.datetime.now(tz=datetime.timezone.utc)
-        try:
-            tf, return_value = await func(*args, **kwargs)
-            end = datetime.datetime.now(tz=datetime.timezone.utc)
-            is_worked = 0 if tf else 1
-
-            query = f"""INSERT INTO
-                public.func_log (user_idx, func_code, is_worked, start_time, end_time)
-                VALUES ({user_id},'{name}',{is_worked}, '{start}', '{end}')"""
-            save_log(query)
-            return return_value
-        except:
-            error = traceback.format_exc()
-            end = datetime.datetime.now(tz=datetime.timezone.utc)
-            is_worked = 2
-            # Unexpected error
-            query = f"""INSERT INTO
-                public.func_log (user_idx, func_code, is_worked, error_msg, start_time, end_time)
-                VALUES ({user_id},'{name}',{is_worked}, '{error}', '{start}', '{end}')"""
-            save_log(query)
-            return traceback.format_exc()
+        _func_name.set(name)
+        item = _request(args, kwargs)
+        job = item is not None and boolean(item.query_params.get("job") or "false")
+        if item is not None and boolean(item.query_params.get("profile") or "false"):
+            profiler.authorize(admin_key)
+            if job: raise HTTPException(status_code=400, detail='"profile" can not be used with "job".')
+            async with profiler.start(name) as profile:
+                value = (await _logged(func, user_id, *args, **kwargs))[1]
+            if not isinstance(value, Response): value = JSONResponse(content=value)
+            value.headers["Profile-Id"] = profile.profile_id
+            return value
+        if job:
+            # 백그라운드 작업으로 실행하고 바로 job_id를 리턴(결과는 /jobs/{job_id})
+            return await jobs.submit(item, name, _logged(func, user_id, *args, **kwargs))
+        return (await _logged(func, user_id, *args, **kwargs))[1]
 
     ## FastAPI 에서 데코레이터를 사용할 수 있도록 파라미터 수정
     wrapper.__signature__ = inspect.Signature(
@@ -93,14 +508,16 @@ def check_error(func):
             *inspect.signature(func).parameters.values(),
             # Skip *args and **kwargs from wrapper parameters:
             *filter(
-                lambda p: p.kind not in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD),
+                lambda p: p.kind not in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD) and p.name not in func_params,
                 inspect.signature(wrapper).parameters.values()
             ),
+            *common_params,
         ],
         return_annotation = inspect.signature(func).return_annotation,
     )
 
-    # 나머지 요소를 func으로부터 가져오기
+    # 나머지 요소를 func으로부터 가져오기(원래 함수는 /dataframe/pipeline 에서 직접 호출)
+    wrapper.func = func
     wrapper.__module__ = func.__module__
     wrapper.__doc__  = func.__doc__
     wrapper.__name__ = func.__name__
@@ -0,0 +1,172 @@
+import os, json, time, uuid, asyncio, contextvars
+from fastapi import Request, Response, HTTPException
+from fastapi.responses import JSONResponse
+
+from . import store
+
+# 끝난 작업의 결과를 보관하는 시간(초)
+JOB_TTL = float(os.getenv("JOB_TTL", 3600))
+# 작업 상태와 결과를 저장하는 경로(모든 워커가 공유하므로 다른 워커가 실행 중인 작업도 조회할 수 있다.)
+JOB_DIR = os.path.join(store.DATA_DIR, "jobs")
+
+os.makedirs(JOB_DIR, exist_ok=True)
+
+# 이 워커에서 실행 중인 작업: job_id => _Job(끝나면 삭제)
+_jobs = {}
+
+# 실행 중인 작업(progress()가 진행률을 기록)
+_current = contextvars.ContextVar("job", default=None)
+
+
+def _path(job_id: str, ext: str = ".json") -> str:
+    return os.path.join(JOB_DIR, f"{job_id}{ext}")
+
+
+def _plain(value):
+    # JSON으로 바꿀 수 없는 결과 값
+    if hasattr(value, "item"):
+        try:
+            return value.item()
+        except (TypeError, ValueError):
+            pass
+    return str(value)
+
+
+class _Job:
+    __slots__ = ("job_id", "name", "status", "progress", "created", "finished", "result", "pid", "task")
+
+    def __init__(self, name: str):
+        self.job_id   = uuid.uuid4().hex
+        self.name     = name
+        self.status   = "pending" # pending => running => done / failed / cancelled
+        self.progress = None
+        self.created  = time.time()
+        self.finished = None
+        self.result   = None
+        self.pid      = os.getpid() # 실행하는 워커
+        self.task     = None
+
+    def info(self) -> dict:
+        end = self.finished or time.time()
+        return {
+            "job_id"  : self.job_id,
+            "name"    : self.name,
+            "status"  : self.status,
+            "progress": self.progress,
+            "elapsed" : round(end - self.created, 3),
+        }
+
+    def save(self):
+        """상태를 파일에 기록(결과가 Response면 본문은 {job_id}.body)"""
+        state = {k: getattr(self, k) for k in self.__slots__ if k not in ("result", "task")}
+        if isinstance(self.result, Response):
+            store.write_file(_path(self.job_id, ".body"), self.result.body)
+            state["media_type"] = self.result.media_type
+        elif self.result is not None:
+            # job=true 없이 요청했을 때와 같은 타입으로 돌려주도록 그대로 저장(numpy 스칼라는 파이썬 값, 그 밖에는 문자열)
+            state["result"] = self.result
+        store.write_file(_path(self.job_id), json.dumps(state, default=_plain))
+
+    @classmethod
+    def load(cls, job_id: str):
+        """파일에 기록된 작업(없으면 None)"""
+        try:
+            with open(_path(job_id)) as f:
+                state = json.load(f)
+            if "media_type" in state:
+                with open(_path(job_id, ".body"), "rb") as f:
+                    state["result"] = Response(content=f.read(), media_type=state.pop("media_type"))
+        except (FileNotFoundError, ValueError):
+            return None
+        job = cls.__new__(cls)
+        job.result = job.task = None
+        for k, v in state.items(): setattr(job, k, v)
+        return job
+
+
+def _sweep():
+    # 보관 시간이 지난 결과 삭제(수정 시각이 오래된 파일만 읽어서 끝난 작업인지 확인)
+    now = time.time()
+    for entry in os.scandir(JOB_DIR):
+        job_id, ext = os.path.splitext(entry.name)
+        try:
+            if ext != ".json" or entry.stat().st_mtime + JOB_TTL >= now: continue
+        except FileNotFoundError:
+            continue
+        job = _Job.load(job_id)
+        if job is None or (job.finished or now) + JOB_TTL < now or not store.alive(job.pid):
+            for path in (_path(job_id), _path(job_id, ".body")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError: # 다른 워커가 먼저 삭제
+                    pass
+
+
+def current() -> _Job or None:
+    """실행 중인 작업(?job=true로 실행한 기능 안에서만, 아니면 None)"""
+    return _current.get()
+
+
+def progress(value: float):
+    """작업으로 실행 중인 기능의 진행률(0~1)을 기록(작업이 아니면 무시)"""
+    job = _current.get()
+    if job is None: return
+    job.progress = round(min(max(float(value), 0.0), 1.0), 4)
+    job.save()
+
+
+async def _run(job: _Job, coro):
+    _current.set(job)
+    job.status = "running"
+    job.save()
+    try:
+        ok, job.result = await coro
+        job.status = "done" if ok else "failed"
+    except Exception as e: # HTTPException(없는 dataset_id 등)
+        job.status, job.result = "failed", getattr(e, "detail", None) or str(e)
+    except asyncio.CancelledError: # 서버 종료 등(끝난 작업으로 기록해서 running으로 남지 않도록)
+        job.status, job.result = "cancelled", "the job was cancelled because the server stopped. submit it again."
+        raise
+    finally:
+        job.finished = time.time()
+        if job.status == "done": job.progress = 1.0
+        job.save()
+        _jobs.pop(job.job_id, None)
+
+
+async def submit(item: Request, name: str, coro) -> JSONResponse:
+    """coro((성공 여부, 리턴 값))를 백그라운드 작업으로 실행하고 바로 202 {"job_id", ...}를 리턴
+
+    연결을 유지하지 않기 때문에 프록시 타임아웃(Heroku 30초)보다 오래 걸리는 기능도 실행할 수 있다.
+    결과는 /jobs/{job_id} 에서 확인(끝난 뒤 JOB_TTL초 동안 보관, 어느 워커에서 조회해도 같은 결과)
+    """
+    if (item.query_params.get("stream") or "false").lower() == "true":
+        coro.close()
+        raise HTTPException(status_code=400, detail='"stream" can not be used with "job". use dataset_id to keep large results on the server.')
+    # 응답을 보낸 뒤에는 본문을 읽을 수 없으므로 미리 읽어둔다.(Request가 캐시)
+    await item.body()
+    _sweep()
+    job = _Job(name)
+    job.save()
+    _jobs[job.job_id] = job
+    job.task = asyncio.get_running_loop().create_task(_run(job, coro))
+    return JSONResponse(
+        status_code = 202,
+        content     = job.info(),
+        headers     = {"Location": f"/jobs/{job.job_id}"},
+    )
+
+
+def result(job_id: str) -> tuple:
+    """작업이 끝났으면 (성공 여부, 결과), 실행 중이면 (True, 202 {"job_id", "status", ...})"""
+    _sweep()
+    job = _jobs.get(job_id) or _Job.load(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f'job "{job_id}" does not exist or has expired.')
+    if job.finished is None and not store.alive(job.pid):
+        # 실행하던 워커가 종료된 작업
+        job.status, job.result, job.finished = "failed", "the worker running this job has stopped. submit it again.", time.time()
+        job.save()
+    if job.finished is None:
+        return True, JSONResponse(status_code=202, content=job.info())
+    return job.status == "done", job.result
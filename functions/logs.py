@@ -0,0 +1,268 @@
+"""func_log 기록(요청은 로컬 스풀 파일에 한 줄 추가만 하고, 백그라운드 스레드가 DB에 모아서 INSERT)
+
+- 요청마다 LOG_SPOOL_DIR/{pid}.spool 에 JSON 한 줄을 추가(DB 상태와 관계없이 바로 끝난다.)
+- 백그라운드 스레드가 LOG_FLUSH_INTERVAL초마다 스풀 파일을 {pid}-{시각}.batch 로 바꾼 다음
+  파일 1개를 트랜잭션 1번으로 INSERT하고 삭제(execute_values, 값은 SQL 문자열에 넣지 않고 파라미터로 전달)
+- DB에 연결할 수 없으면 파일을 남겨두고 LOG_RETRY초 뒤에 다시 시도(버리는 기록 없음)
+- INSERT할 수 없는 행(잘못된 값, 없는 user_idx, 없는 컬럼 등)은 {pid}-{시각}.failed 파일로 옮기고 다음 파일을 계속 기록
+  원인을 고친 뒤(컬럼 추가 등) 확장자를 .batch로 바꾸면 다시 기록한다.
+- 종료된 워커가 남긴 .spool, .batch 파일은 다른 워커가 이어서 기록
+- 연결은 워커마다 풀(ThreadedConnectionPool)에서 재사용
+- 백그라운드 스레드는 첫 record() 또는 서버 시작(main.py startup의 start())에서 시작하고,
+  서버를 종료할 때(main.py shutdown의 close()) 남은 기록을 쓴다.(import만 해서는 DB, 스풀 경로를 사용하지 않음)
+- 에러는 logging("functions.logs")으로 파일 1개 또는 연결 실패 1번에 한 줄만 기록
+- INSERT가 끝난 뒤 파일을 삭제하기 전에 프로세스가 종료되면 그 파일은 다시 기록된다.(중복 가능, 누락 없음)
+- LOG_MEMORY=true면 요청의 메모리 사용량(bytes)도 기록. 먼저 컬럼을 추가해야 한다.
+    ALTER TABLE public.func_log
+        ADD COLUMN input_bytes bigint, ADD COLUMN output_bytes bigint,
+        ADD COLUMN response_bytes bigint, ADD COLUMN peak_bytes bigint;
+"""
+import os, json, time, fcntl, logging, datetime, threading
+import psycopg2, psycopg2.pool, psycopg2.extras
+
+from . import store
+
+# 한 번에 INSERT할 최대 행 수(스풀에 이만큼 쌓이면 간격을 기다리지 않고 기록)
+LOG_BATCH          = int(os.getenv("LOG_BATCH", 200))
+# 기록 간격(초)
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 1))
+# 기록하지 못한 행을 보관하는 경로(DATA_DIR이 /dev/shm이면 재부팅하면 사라지므로 디스크 경로 권장)
+LOG_SPOOL_DIR      = os.getenv("LOG_SPOOL_DIR") or os.path.join(store.DATA_DIR, "logs")
+# DB 연결에 실패했을 때 다시 시도할 때까지 기다리는 시간(초)
+LOG_RETRY          = 5
+# DB 연결 제한 시간(초, 종료할 때 남은 기록을 쓰다가 멈추지 않도록)
+LOG_CONNECT_TIMEOUT = 5
+# 입력/결과 DataFrame, 응답, tracemalloc 최대 사용량(functions/metrics.py)을 같이 기록
+LOG_MEMORY         = (os.getenv("LOG_MEMORY") or "false").lower() == "true"
+
+MEMORY_COLUMNS = ("input_bytes", "output_bytes", "response_bytes", "peak_bytes")
+COLUMNS = ("user_idx", "func_code", "is_worked", "error_msg", "start_time", "end_time") + (MEMORY_COLUMNS if LOG_MEMORY else ())
+QUERY   = f"INSERT INTO public.func_log ({', '.join(COLUMNS)}) VALUES %s"
+
+SPOOL_EXT  = ".spool"
+BATCH_EXT  = ".batch"
+FAILED_EXT = ".failed"
+
+logger = logging.getLogger(__name__)
+
+_wake    = threading.Event()
+_flusher = None # (pid, Thread)
+_pool    = None
+_spool   = None # (pid, 이 워커의 스풀 파일)
+_pending = 0    # 이 워커의 현재 스풀 파일에 있는 행 수
+_lock    = threading.Lock() # 스풀 파일 쓰기/교체
+_flush   = threading.Lock() # 풀 생성, batch 파일 기록
+_stats   = {"written": 0, "failed": 0}
+_count   = threading.Lock() # _stats
+
+
+def _add(key: str, n: int):
+    with _count: _stats[key] += n
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # 백그라운드 스레드 + 종료할 때 남은 기록을 쓰는 메인 스레드
+        _pool = psycopg2.pool.ThreadedConnectionPool(
+            0, 2,
+            user     = os.getenv("DB_USER"),
+            password = os.getenv("DB_PW"),
+            host     = os.getenv("DB_HOST"),
+            port     = os.getenv("DB_PORT"),
+            dbname   = os.getenv("DB_NAME"),
+            connect_timeout = LOG_CONNECT_TIMEOUT,
+        )
+    return _pool
+
+
+def _insert(rows: list) -> list:
+    """rows를 트랜잭션 1번으로 INSERT하고 INSERT하지 못한 행을 리턴
+
+    연결 문제(OperationalError, InterfaceError)는 raise
+    그 밖의 DB 에러(숫자가 아닌 user_id, 없는 user_idx, 없는 컬럼 등)는 1행씩 다시 시도해서 실패한 행만 리턴
+    """
+    pool = _get_pool()
+    db = pool.getconn()
+    broken = True
+    failed, error = [], None
+    try:
+        with db.cursor() as cursor:
+            try:
+                psycopg2.extras.execute_values(cursor, QUERY, rows, page_size=LOG_BATCH)
+                db.commit()
+                _add("written", len(rows))
+            except psycopg2.OperationalError:
+                raise
+            except psycopg2.DatabaseError:
+                db.rollback()
+                for row in rows:
+                    try:
+                        psycopg2.extras.execute_values(cursor, QUERY, [row])
+                        db.commit()
+                        _add("written", 1)
+                    except psycopg2.OperationalError:
+                        raise
+                    except psycopg2.DatabaseError as e:
+                        db.rollback()
+                        failed.append(row)
+                        error = error or e
+        broken = False
+    finally:
+        pool.putconn(db, close=broken)
+    if failed:
+        # 실패한 행마다가 아니라 batch 1개에 한 번(첫 번째 에러)
+        _add("failed", len(failed))
+        logger.warning("func_log: %d of %d rows could not be inserted. %s: %s", len(failed), len(rows), type(error).__name__, str(error).strip())
+    return failed
+
+
+def _quarantine(pid: str, rows: list):
+    """INSERT하지 못한 행을 .failed 파일로(다음 파일 기록을 막지 않도록, 확장자를 .batch로 바꾸면 다시 기록)"""
+    path = os.path.join(LOG_SPOOL_DIR, f"{pid}-{time.time_ns()}{FAILED_EXT}")
+    store.write_file(path, "".join(json.dumps(list(row)) + "\n" for row in rows))
+    logger.warning("func_log: %d rows were moved to %s", len(rows), path)
+
+
+def _rotate():
+    """이 워커의 스풀 파일을 batch 파일로 바꿈(다음 기록은 새 스풀 파일에)"""
+    global _spool, _pending
+    with _lock:
+        if _spool is None or _spool[0] != os.getpid(): return
+        _spool[1].close()
+        _spool = None
+        path = os.path.join(LOG_SPOOL_DIR, f"{os.getpid()}{SPOOL_EXT}")
+        os.replace(path, os.path.join(LOG_SPOOL_DIR, f"{os.getpid()}-{time.time_ns()}{BATCH_EXT}"))
+        _pending = 0
+
+
+def _adopt():
+    # 종료된 워커의 스풀 파일을 batch 파일로(다른 워커가 먼저 바꿨으면 무시)
+    for entry in os.scandir(LOG_SPOOL_DIR):
+        pid, ext = os.path.splitext(entry.name)
+        if ext != SPOOL_EXT or store.alive(pid): continue
+        try:
+            os.replace(entry.path, os.path.join(LOG_SPOOL_DIR, f"{pid}-{time.time_ns()}{BATCH_EXT}"))
+        except FileNotFoundError:
+            pass
+
+
+def _replay(path: str):
+    """batch 파일 1개를 INSERT하고 삭제(다른 워커가 기록 중이거나 이미 기록한 파일은 건너뜀)"""
+    try:
+        f = open(path)
+    except FileNotFoundError:
+        return
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        try:
+            # 잠금을 기다리는 동안 다른 워커가 기록하고 삭제한 파일
+            if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino: return
+        except FileNotFoundError:
+            return
+        rows = []
+        for line in f:
+            try:
+                rows.append(tuple(json.loads(line)))
+            except ValueError: # 종료되면서 덜 쓴 마지막 줄
+                pass
+        failed = _insert(rows) if rows else []
+        if failed: _quarantine(os.path.basename(path).split("-")[0], failed)
+        os.remove(path)
+
+
+def flush():
+    """스풀에 있는 기록을 모두 INSERT(DB에 연결할 수 없으면 파일은 남겨두고 raise)"""
+    _rotate()
+    os.makedirs(LOG_SPOOL_DIR, exist_ok=True)
+    with _flush:
+        _adopt()
+        for name in sorted(os.listdir(LOG_SPOOL_DIR)):
+            if not name.endswith(BATCH_EXT): continue
+            path = os.path.join(LOG_SPOOL_DIR, name)
+            try:
+                _replay(path)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                raise
+            except Exception as e:
+                # 기록할 수 없는 파일(행 형식이 다른 파일 등)은 .failed로 옮기고 다음 파일을 기록
+                logger.warning("func_log: %s was moved to %s. %s: %s", name, FAILED_EXT, type(e).__name__, str(e).strip())
+                try:
+                    os.replace(path, path[:-len(BATCH_EXT)] + FAILED_EXT)
+                except FileNotFoundError:
+                    pass
+
+
+def _run():
+    failing = None # 이어지는 같은 에러는 한 번만 기록
+    while True:
+        _wake.wait(LOG_FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+            if failing is not None: logger.info("func_log: flushing works again")
+            failing = None
+        except Exception as e:
+            message = f"{type(e).__name__}: {str(e).strip()}"
+            if message != failing: logger.warning("func_log: rows were kept in %s. %s", LOG_SPOOL_DIR, message)
+            failing = message
+            time.sleep(LOG_RETRY)
+
+
+def start():
+    """백그라운드 기록 스레드 시작(이미 시작했으면 무시). 종료된 워커가 남긴 기록도 요청을 기다리지 않고 기록"""
+    global _flusher
+    # uvicorn --workers는 워커마다 모듈을 다시 읽지만, fork된 프로세스에는 스레드가 없으므로 pid로 확인
+    if _flusher is not None and _flusher[0] == os.getpid(): return
+    os.makedirs(LOG_SPOOL_DIR, exist_ok=True)
+    thread = threading.Thread(target=_run, name="func_log", daemon=True)
+    thread.start()
+    _flusher = (os.getpid(), thread)
+
+
+def _value(value):
+    if isinstance(value, datetime.datetime): return value.isoformat()
+    return value
+
+
+def record(user_idx, func_code: str, is_worked: int, start_time, end_time, error_msg: str = None, memory: dict = None):
+    """func_log 1행을 스풀 파일에 추가(DB에는 백그라운드에서 기록, memory는 LOG_MEMORY=true일 때만)"""
+    global _spool, _pending
+    start()
+    row = (user_idx, func_code, is_worked, error_msg, start_time, end_time)
+    if LOG_MEMORY: row += tuple((memory or {}).get(i) for i in MEMORY_COLUMNS)
+    line = json.dumps([_value(i) for i in row]) + "\n"
+    with _lock:
+        if _spool is None or _spool[0] != os.getpid():
+            _spool = (os.getpid(), open(os.path.join(LOG_SPOOL_DIR, f"{os.getpid()}{SPOOL_EXT}"), "a"))
+        # 워커가 종료돼도 남도록 바로 파일에 쓴다.(fsync는 하지 않음)
+        _spool[1].write(line)
+        _spool[1].flush()
+        _pending += 1
+        if _pending >= LOG_BATCH: _wake.set()
+
+
+def stats() -> dict:
+    """기록한 행 수, .failed 파일로 옮긴 행 수, 이 워커의 스풀에 있는 행 수, 기록을 기다리는 batch 파일 수(모든 워커)"""
+    try:
+        backlog = sum(1 for i in os.listdir(LOG_SPOOL_DIR) if i.endswith(BATCH_EXT))
+    except FileNotFoundError: # 아직 기록한 적 없음
+        backlog = 0
+    with _count:
+        return {**_stats, "queued": _pending, "backlog": backlog}
+
+
+def close():
+    """남은 기록을 쓰고 연결을 닫음(서버 종료, 실패하면 파일이 남아서 다른 워커, 다음 실행에서 기록)"""
+    global _pool
+    if _flusher is None and _pool is None: return # 이 프로세스에서 기록한 적 없음
+    try:
+        flush()
+    except Exception as e:
+        logger.warning("func_log: rows were kept in %s. %s: %s", LOG_SPOOL_DIR, type(e).__name__, str(e).strip())
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
@@ -0,0 +1,161 @@
+import os, time, hashlib, threading, contextvars
+from collections import OrderedDict
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from . import store, timing
+
+# 결과 캐시 전체 크기(bytes, 0이면 사용 안 함), 결과 유효 시간(초)
+MEMO_BUDGET = int(os.getenv("MEMO_BUDGET", 64 * 2**20))
+MEMO_TTL    = float(os.getenv("MEMO_TTL", 600))
+# 이 크기(bytes) 이상인 본문은 이벤트 루프를 막지 않도록 스레드에서 해시
+HASH_THREAD_SIZE = 2**20
+
+# 키 => (결과, bytes, 만료 시각, 입력과 결과의 dataset_id 리스트)
+_cache = OrderedDict()
+_bytes = 0
+_lock  = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+# 실행 중인 기능이 저장소에 등록한 dataset_id(frame_result가 추가)
+_registered = contextvars.ContextVar("registered", default=None)
+
+MISS = object()
+
+
+def registered(dataset_id: str):
+    """캐시할 결과가 dataset_id를 가리킨다는 것을 기록(캐시를 쓸 때 데이터셋이 남아 있는지 확인)"""
+    ids = _registered.get()
+    if ids is not None: ids.append(dataset_id)
+
+
+def _digest(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+async def _key(func, item: Request, kwargs: dict) -> str:
+    """(기능, 파라미터, 입력 데이터) 키. 입력은 dataset_id(변경되지 않음) 또는 본문의 해시"""
+    body   = await item.body()
+    digest = await run_in_threadpool(_digest, body) if len(body) >= HASH_THREAD_SIZE else _digest(body)
+    params = sorted((k, str(v)) for k, v in kwargs.items() if not isinstance(v, Request))
+    # job=true(백그라운드 작업)는 결과가 같으므로 키에서 제외
+    query  = sorted((k, v) for k, v in item.query_params.multi_items() if k not in kwargs and k != "job")
+    return repr((
+        func.__module__, func.__qualname__, params, query,
+        item.headers.get("accept", ""), item.headers.get("content-type", ""), digest,
+    ))
+
+
+class _Body:
+    # Response는 본문과 media_type만 보관했다가 새 Response로 만든다.
+    __slots__ = ("body", "media_type")
+
+    def __init__(self, response: Response):
+        self.body, self.media_type = response.body, response.media_type
+
+
+def _size(value) -> int:
+    if isinstance(value, tuple): return sum(_size(i) for i in value)
+    if isinstance(value, str)  : return len(value)
+    if isinstance(value, _Body): return len(value.body)
+    return 64
+
+
+def _freeze(value):
+    """캐시에 보관할 형태(StreamingResponse가 있으면 MISS, 캐시하지 않음)"""
+    if isinstance(value, tuple):
+        value = tuple(_freeze(i) for i in value)
+        return MISS if MISS in value else value
+    if isinstance(value, StreamingResponse): return MISS
+    if isinstance(value, Response)         : return _Body(value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, tuple): return tuple(_thaw(i) for i in value)
+    if isinstance(value, _Body): return Response(content=value.body, media_type=value.media_type)
+    return value
+
+
+def _evict(key: str, entry):
+    # 그 사이에 다른 요청이 같은 키를 다시 저장했으면 그대로 둔다.
+    global _bytes
+    if _cache.get(key) is entry:
+        del _cache[key]
+        _bytes -= entry[1]
+
+
+def _get(key: str):
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[2] <= time.monotonic():
+            _evict(key, entry)
+            entry = None
+        if entry is None:
+            _stats["misses"] += 1
+            return MISS
+
+    # store.exists()는 파일을 확인하므로 _lock 밖에서(다른 요청의 캐시 조회를 막지 않도록)
+    value, size, expires, ids = entry
+    alive = all(store.exists(i) for i in ids)
+    with _lock:
+        if alive:
+            if _cache.get(key) is entry: _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return value
+        _evict(key, entry)
+        _stats["misses"] += 1
+    return MISS
+
+
+def _put(key: str, value, ids: list):
+    global _bytes
+    size = _size(value) + len(key)
+    if size > MEMO_BUDGET: return
+    with _lock:
+        if key in _cache: _bytes -= _cache.pop(key)[1]
+        _cache[key] = (value, size, time.monotonic() + MEMO_TTL, ids)
+        _bytes += size
+        while _bytes > MEMO_BUDGET:
+            _bytes -= _cache.popitem(last=False)[1][1]
+            _stats["evictions"] += 1
+
+
+async def call(func, run, /, *args, **kwargs):
+    """run(func, *args, **kwargs)의 결과를 캐시해서 리턴
+    ```
+    같은 입력(dataset_id 또는 본문)과 같은 파라미터로 다시 호출하면 실행하지 않고 이전 결과를 리턴
+    (False, 메시지)를 리턴한 경우, StreamingResponse는 캐시하지 않는다.
+    Request를 받지 않는 기능(dataset 삭제 등)은 캐시하지 않는다.
+    ```
+    """
+    item = next((v for v in [*args, *kwargs.values()] if isinstance(v, Request)), None)
+    if item is None or MEMO_BUDGET <= 0:
+        return await run(func, *args, **kwargs)
+
+    with timing.span("cache"):
+        key   = await _key(func, item, kwargs)
+        value = _get(key)
+    if value is not MISS: return _thaw(value)
+
+    # 입력 데이터셋(dataset_id, left_id, schema_id 등)이 삭제되면 캐시도 사용하지 않는다.
+    params = {**item.query_params, **{k: v for k, v in kwargs.items() if isinstance(v, str)}}
+    ids    = [v for k, v in params.items() if k.endswith("_id") and k != "upload_id" and v]
+    token = _registered.set(ids)
+    try:
+        result = await run(func, *args, **kwargs)
+    finally:
+        _registered.reset(token)
+
+    frozen = _freeze(result)
+    failed = isinstance(result, tuple) and len(result) == 2 and result[0] is False
+    if not failed and frozen is not MISS:
+        _put(key, frozen, ids)
+    return result
+
+
+def stats() -> dict:
+    """캐시 적중/실패/삭제 횟수와 크기"""
+    with _lock:
+        return {**_stats, "entries": len(_cache), "bytes": _bytes, "budget": MEMO_BUDGET}
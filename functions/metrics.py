@@ -0,0 +1,309 @@
+"""기능별 요청 수, 처리 시간/요청·응답 크기 히스토그램, 실행 중인 요청 수를 Prometheus 형식으로(/metrics)
+
+check_error(_logged)가 func_log에 기록할 때 같이 집계한다.
+요청마다 입력/결과 DataFrame의 메모리(object 컬럼은 앞 행들로 추정한 deep 크기)와 tracemalloc 최대 사용량(TRACEMALLOC=true)도 집계한다.
+워커마다 백그라운드 스레드가 METRICS_INTERVAL초마다(바뀐 것이 있으면) DATA_DIR/metrics/{pid}.json에 기록하고
+/metrics는 실행 중인 모든 워커의 파일을 합쳐서 응답한다.(어느 워커가 응답해도 같은 값)
+종료된 워커의 counter, histogram은 DATA_DIR/metrics/exited.json에 더해 두기 때문에 워커가 바뀌어도 합계가 줄어들지 않는다.
+(마지막 기록 이후 METRICS_INTERVAL초 동안의 요청은 빠질 수 있다.)
+"""
+import os, json, time, threading, tracemalloc, contextvars
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from . import store, memo, jobs, admission, logs
+
+# 파일에 기록하는 간격(초)
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", 1))
+METRICS_DIR      = os.path.join(store.DATA_DIR, "metrics")
+# 종료된 워커의 누적 값
+EXITED_FILE      = os.path.join(METRICS_DIR, "exited.json")
+
+# 처리 시간(초), 요청/응답 크기(bytes) 히스토그램의 구간(마지막은 +Inf)
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+SIZE_BUCKETS    = [2**i for i in range(10, 31, 2)] # 1KB ~ 1GB
+
+# func_log의 is_worked
+STATUS = {0: "ok", 1: "failed", 2: "error", 3: "cancelled"}
+
+# 워커 상태 지표(워커별 값의 합계, counter는 종료된 워커의 값도 포함)
+WORKER_METRICS = {
+    "memo"     : {"hits": "counter", "misses": "counter", "evictions": "counter", "entries": "gauge", "bytes": "gauge", "budget": "gauge"},
+    "admission": {"admitted": "counter", "queued": "counter", "rejected": "counter", "reserved": "gauge", "budget": "gauge"},
+    "logs"     : {"written": "counter", "failed": "counter", "queued": "gauge", "backlog": "gauge"},
+    "memory"   : {"datasets": "gauge", "bytes": "gauge", "budget": "gauge"},
+}
+
+# 요청마다 tracemalloc 최대 사용량을 기록(모든 할당을 추적하므로 느려진다. 메모리 크기를 정할 때만 사용)
+TRACEMALLOC     = (os.getenv("TRACEMALLOC") or "false").lower() == "true"
+# object 컬럼(문자열 등)의 deep 메모리를 추정할 때 사용할 행 수(deep 계산은 값마다 getsizeof라서 요청마다 전체를 계산하면 느림)
+FRAME_SAMPLE_ROWS = 1000
+
+os.makedirs(METRICS_DIR, exist_ok=True)
+if TRACEMALLOC and not tracemalloc.is_tracing(): tracemalloc.start()
+
+_lock    = threading.Lock()
+_funcs   = {} # 기능 이름 => {"requests": {is_worked: 횟수}, "latency", "request_bytes", "response_bytes": 히스토그램, "in_flight"}
+_dirty   = False
+_saver   = None # (pid, Thread)
+
+# 처리 중인 요청의 {"input_bytes", "output_bytes", "peak_bytes"}(연산 스레드에도 같은 dict가 전달된다.)
+_usage   = contextvars.ContextVar("usage", default=None)
+_tracing = 0 # tracemalloc으로 측정 중인 요청 수
+
+
+def _histogram(buckets: list) -> dict:
+    return {"buckets": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+
+
+def _observe(hist: dict, buckets: list, value: float):
+    i = next((n for n, b in enumerate(buckets) if value <= b), len(buckets))
+    hist["buckets"][i] += 1
+    hist["sum"]   += value
+    hist["count"] += 1
+
+
+def _func(name: str) -> dict:
+    if name not in _funcs:
+        _funcs[name] = {
+            "requests"      : {},
+            "latency"       : _histogram(LATENCY_BUCKETS),
+            "request_bytes" : _histogram(SIZE_BUCKETS),
+            "response_bytes": _histogram(SIZE_BUCKETS),
+            "input_bytes"   : _histogram(SIZE_BUCKETS),
+            "output_bytes"  : _histogram(SIZE_BUCKETS),
+            "peak_bytes"    : _histogram(SIZE_BUCKETS),
+            "in_flight"     : 0,
+        }
+    return _funcs[name]
+
+
+def _run():
+    global _dirty
+    while True:
+        time.sleep(METRICS_INTERVAL)
+        if not _dirty: continue
+        _dirty = False
+        try:
+            _save()
+        except Exception as e:
+            print(f"metrics: {type(e).__name__}: {e}")
+
+
+def _start():
+    global _saver
+    # fork된 워커에는 스레드가 없으므로 pid로 확인(functions/logs.py와 같음)
+    if _saver is not None and _saver[0] == os.getpid(): return
+    thread = threading.Thread(target=_run, name="metrics", daemon=True)
+    thread.start()
+    _saver = (os.getpid(), thread)
+
+
+def frame_bytes(df) -> int:
+    """DataFrame의 메모리(bytes, 인덱스와 object 컬럼의 문자열 포함)
+
+    숫자 컬럼과 인덱스는 배열 크기 그대로, object 값의 크기는 앞 FRAME_SAMPLE_ROWS 행의 평균으로 추정
+    (admission._row_bytes와 같은 방식, 행이 그보다 적으면 정확한 값)
+    """
+    nbytes = int(df.memory_usage(index=True, deep=False).sum())
+    if not len(df): return nbytes
+    sample = df.head(FRAME_SAMPLE_ROWS)
+    extra  = (sample.memory_usage(index=True, deep=True) - sample.memory_usage(index=True, deep=False)).sum()
+    return nbytes + int(extra / len(sample) * len(df))
+
+
+def frame(kind: str, df):
+    """요청의 입력(kind="input") 또는 결과("output") DataFrame 메모리를 더함(요청 밖이면 무시)"""
+    usage = _usage.get()
+    if usage is None: return
+    key = f"{kind}_bytes"
+    usage[key] = (usage[key] or 0) + frame_bytes(df)
+
+
+def begin(name: str) -> dict:
+    """요청 시작(실행 중인 요청 수 + 1). end()에 넘길 메모리 사용량 dict를 리턴"""
+    global _dirty, _tracing
+    _start()
+    with _lock:
+        _func(name)["in_flight"] += 1
+        _dirty = True
+        usage = {"input_bytes": None, "output_bytes": None, "peak_bytes": None, "_base": None}
+        if TRACEMALLOC:
+            # 다른 요청이 없을 때만 최대값을 초기화(동시에 실행 중인 요청이 있으면 그 요청의 할당도 포함)
+            if _tracing == 0:
+                if hasattr(tracemalloc, "reset_peak"): tracemalloc.reset_peak()
+                else                                 : tracemalloc.clear_traces() # python 3.8
+            _tracing += 1
+            usage["_base"] = tracemalloc.get_traced_memory()[0]
+    _usage.set(usage)
+    return usage
+
+
+def end(name: str, is_worked: int, seconds: float, request_bytes: int or None, response_bytes: int or None, usage: dict) -> dict:
+    """요청 종료(실행 중인 요청 수 - 1, 상태별 횟수, 처리 시간, 요청/응답 크기(모르면 None), 메모리 사용량)
+
+    func_log에 같이 기록할 {"input_bytes", "output_bytes", "response_bytes", "peak_bytes"}를 리턴
+    """
+    global _dirty, _tracing
+    with _lock:
+        if usage["_base"] is not None:
+            usage["peak_bytes"] = max(0, tracemalloc.get_traced_memory()[1] - usage["_base"])
+            _tracing -= 1
+        f = _func(name)
+        f["in_flight"] -= 1
+        f["requests"][str(is_worked)] = f["requests"].get(str(is_worked), 0) + 1
+        _observe(f["latency"], LATENCY_BUCKETS, seconds)
+        if request_bytes  is not None: _observe(f["request_bytes"],  SIZE_BUCKETS, request_bytes)
+        if response_bytes is not None: _observe(f["response_bytes"], SIZE_BUCKETS, response_bytes)
+        for k in ("input_bytes", "output_bytes", "peak_bytes"):
+            if usage[k] is not None: _observe(f[k], SIZE_BUCKETS, usage[k])
+        _dirty = True
+    return {"input_bytes": usage["input_bytes"], "output_bytes": usage["output_bytes"], "response_bytes": response_bytes, "peak_bytes": usage["peak_bytes"]}
+
+
+def _save():
+    """이 워커의 집계와 상태(memo, admission, logs, 작업, 메모리 계층)를 파일에 기록"""
+    with _lock:
+        funcs = json.dumps(_funcs)
+    state = {
+        "funcs"    : json.loads(funcs),
+        "memo"     : memo.stats(),
+        "admission": admission.stats(),
+        "logs"     : logs.stats(),
+        "jobs"     : len(jobs._jobs),
+        "memory"   : store.stats()["memory"],
+    }
+    store.write_file(os.path.join(METRICS_DIR, f"{os.getpid()}.json"), json.dumps(state))
+
+
+def _exited() -> dict:
+    """종료된 워커들의 누적 값(없으면 빈 값)"""
+    try:
+        with open(EXITED_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"funcs": {}, **{group: {} for group in WORKER_METRICS}}
+
+
+def _fold(path: str):
+    """종료된 워커의 counter, histogram을 EXITED_FILE에 더하고 워커의 파일 삭제"""
+    # 여러 워커가 같은 파일을 두 번 더하지 않도록 잠그고 다시 읽는다.
+    with store._exclusive():
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError: # 다른 워커가 먼저 더함
+            return
+        except ValueError:
+            state = {}
+        exited = _exited()
+        for name, f in state.get("funcs", {}).items():
+            f["in_flight"] = 0
+            if name in exited["funcs"]: _add(exited["funcs"][name], f)
+            else                      : exited["funcs"][name] = f
+        for group, kinds in WORKER_METRICS.items():
+            for k, kind in kinds.items():
+                if kind == "counter": exited[group][k] = exited[group].get(k, 0) + state.get(group, {}).get(k, 0)
+        store.write_file(EXITED_FILE, json.dumps(exited))
+        store._remove(path)
+
+
+def _load() -> list:
+    """실행 중인 모든 워커의 기록(종료된 워커의 파일은 EXITED_FILE에 더하고 삭제)"""
+    states = []
+    for entry in os.scandir(METRICS_DIR):
+        pid, ext = os.path.splitext(entry.name)
+        if ext != ".json" or entry.path == EXITED_FILE: continue
+        if not store.alive(pid):
+            _fold(entry.path)
+            continue
+        try:
+            with open(entry.path) as f:
+                states.append(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+    return states
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_histogram(lines: list, metric: str, name: str, buckets: list, hist: dict):
+    total = 0
+    for le, n in zip([*buckets, "+Inf"], hist["buckets"]):
+        total += n
+        lines.append(f'{metric}_bucket{{func="{name}",le="{le}"}} {total}')
+    lines.append(f'{metric}_sum{{func="{name}"}} {hist["sum"]}')
+    lines.append(f'{metric}_count{{func="{name}"}} {hist["count"]}')
+
+
+def _add(total: dict, f: dict):
+    for k, v in f["requests"].items(): total["requests"][k] = total["requests"].get(k, 0) + v
+    for k in ("latency", "request_bytes", "response_bytes", "input_bytes", "output_bytes", "peak_bytes"):
+        total[k]["buckets"] = [a + b for a, b in zip(total[k]["buckets"], f[k]["buckets"])]
+        total[k]["sum"]    += f[k]["sum"]
+        total[k]["count"]  += f[k]["count"]
+    total["in_flight"] += f["in_flight"]
+
+
+def render() -> str:
+    """모든 워커의 집계를 합친 Prometheus text format(0.0.4)"""
+    _save()
+    states = _load()
+    exited = _exited()
+
+    funcs = {}
+    for state in [*states, exited]:
+        for name, f in state["funcs"].items():
+            if name in funcs: _add(funcs[name], f)
+            else            : funcs[name] = f
+
+    lines = []
+    def metric(name: str, kind: str, help: str):
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    metric("mlfuncs_requests_total", "counter", "Requests by function and func_log is_worked(0 ok, 1 failed, 2 error, 3 cancelled)")
+    for name, f in sorted(funcs.items()):
+        for k, v in sorted(f["requests"].items()):
+            lines.append(f'mlfuncs_requests_total{{func="{_label(name)}",is_worked="{k}",status="{STATUS.get(int(k), k)}"}} {v}')
+    metric("mlfuncs_in_flight", "gauge", "Requests currently running")
+    for name, f in sorted(funcs.items()):
+        lines.append(f'mlfuncs_in_flight{{func="{_label(name)}"}} {f["in_flight"]}')
+    for key, buckets, help in [
+        ("latency",        LATENCY_BUCKETS, "Request latency in seconds"),
+        ("request_bytes",  SIZE_BUCKETS,    "Request body size in bytes"),
+        ("response_bytes", SIZE_BUCKETS,    "Response body size in bytes(streamed responses are not counted)"),
+        ("input_bytes",    SIZE_BUCKETS,    "Memory of input DataFrames in bytes(memory_usage deep)"),
+        ("output_bytes",   SIZE_BUCKETS,    "Memory of result DataFrames in bytes(memory_usage deep)"),
+        ("peak_bytes",     SIZE_BUCKETS,    "tracemalloc peak during the request in bytes(TRACEMALLOC=true, includes concurrent requests)"),
+    ]:
+        name = "mlfuncs_latency_seconds" if key == "latency" else f"mlfuncs_{key}"
+        metric(name, "histogram", help)
+        for func, f in sorted(funcs.items()):
+            _write_histogram(lines, name, _label(func), buckets, f[key])
+
+    # 워커 상태(워커별 값의 합계, exited에는 counter만 있음)
+    for group, kinds in WORKER_METRICS.items():
+        for k, kind in kinds.items():
+            name = f"mlfuncs_{group}_{k}" + ("_total" if kind == "counter" else "")
+            metric(name, kind, f"{group} {k}, sum over workers")
+            lines.append(f"{name} {sum(s[group].get(k, 0) for s in [*states, exited])}")
+    metric("mlfuncs_jobs_running", "gauge", "Background jobs running, sum over workers")
+    lines.append(f"mlfuncs_jobs_running {sum(s['jobs'] for s in states)}")
+    metric("mlfuncs_workers", "gauge", "Running workers that have served requests")
+    lines.append(f"mlfuncs_workers {len(states)}")
+
+    # 디스크 계층(모든 워커가 공유)
+    disk = store.stats()["disk"]
+    for k, v in disk.items():
+        metric(f"mlfuncs_disk_{k}", "gauge", f"disk tier {k}, shared by workers")
+        lines.append(f"mlfuncs_disk_{k} {v}")
+    return "\n".join(lines) + "\n"
+
+
+async def get_metrics() -> PlainTextResponse:
+    """Prometheus가 수집하는 지표(토큰 없이 접근, 모든 워커의 합계)"""
+    # 파일 기록/읽기, 데이터셋 파일 크기 확인이 이벤트 루프를 막지 않도록 스레드에서
+    return PlainTextResponse(await run_in_threadpool(render), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,168 @@
+from typing import Optional
+from fastapi import Request, Query, HTTPException
+import json, inspect
+import pandas as pd
+
+from .internal_func import (
+    boolean,
+    check_error,
+    read_df,
+    stored,
+    frame_result,
+    FrameItem,
+)
+from . import plan, cancel
+from .eda import (
+    head,
+    tail,
+    dtype,
+    isna,
+    corr,
+    describe,
+    col_condition,
+    loc,
+    iloc,
+)
+from .processing import (
+    transpose,
+    groupby,
+    drop,
+    dropna,
+    rename,
+    sort_values,
+    merge,
+    concat,
+    set_column,
+    astype,
+)
+
+# 파이프라인에서 사용할 수 있는 기능(결과가 DataFrame 1개인 기능, 아닌 경우는 실행할 때 400)
+OPERATIONS = {
+    func.__name__: func.func
+    for func in [
+        head, tail, dtype, isna, corr, describe, col_condition, loc, iloc,
+        transpose, groupby, drop, dropna, rename, sort_values, merge, concat, set_column, astype,
+    ]
+}
+# 오른쪽 입력이 필요한 기능(params의 right_id로 서버의 데이터셋 지정)
+BINARY = ["merge", "concat"]
+
+
+def _param(value) -> Optional[str]:
+    # 쿼리 파라미터와 같은 형식(문자열)으로 변환. 리스트는 쉼표로 구분
+    if value is None              : return None
+    if isinstance(value, bool)    : return str(value).lower()
+    if isinstance(value, list)    : return ",".join(str(i) for i in value)
+    return str(value)
+
+
+def _kwargs(op: str, params: dict) -> dict:
+    """기능 함수의 파라미터에 맞게 params를 변환(없는 파라미터는 Query의 기본값)"""
+    kwargs = {}
+    for name, p in inspect.signature(OPERATIONS[op]).parameters.items():
+        if name == "item": continue
+        if name in params:
+            kwargs[name] = _param(params[name])
+            continue
+        default = getattr(p.default, "default", p.default) # Query(...)
+        if default in (inspect.Parameter.empty, Ellipsis):
+            raise ValueError(f'"{name}" is required.')
+        kwargs[name] = default
+    unknown = [i for i in params if i not in kwargs]
+    if unknown:
+        raise ValueError(f"unknown parameters: {unknown}.")
+    return kwargs
+
+
+async def _execute(df, steps: list, rights: dict) -> tuple:
+    for step in steps:
+        # 중단된 요청(제한 시간 초과 등)은 단계 사이에서 멈춘다.
+        cancel.checkpoint()
+        frames = {}
+        if "right_id" in step:
+            tf, frames["right"] = await _execute(rights[step["right_id"]], step["right"], rights)
+            if not tf: return False, frames["right"]
+        func = OPERATIONS.get(step["op"]) or plan.INTERNAL[step["op"]]
+        tf, df = await func(FrameItem(df, **frames), **step["kwargs"])
+        if not tf: return False, f'steps[{step["index"]}] ({step["op"]}): {df}'
+        # 다음 기능의 입력, 결과로 쓸 수 없는 값(corr에 col1, col2를 모두 지정한 경우의 숫자 등)
+        if not isinstance(df, pd.DataFrame):
+            raise HTTPException(status_code=400, detail=f'steps[{step["index"]}] ({step["op"]}): the result is {type(df).__name__}, not a DataFrame. it can not be used in a pipeline.')
+    return True, df
+
+
+@check_error
+async def pipeline(
+    item   : Request,
+    steps  : str = Query(..., max_length=5000),
+    *,
+    lazy   : Optional[str] = Query("false", max_length=50),
+    explain: Optional[str] = Query("false", max_length=50),
+) -> tuple:
+    """여러 기능을 순서대로 적용하고 마지막 결과만 리턴하는 함수
+    ```
+    입력 DataFrame을 한 번만 읽고, 중간 결과는 직렬화하지 않고 다음 기능에 바로 넘긴다.
+    사용할 수 있는 기능: head, tail, dtype, isna, corr, describe, col_condition, loc, iloc,
+                         transpose, groupby, drop, dropna, rename, sort_values, merge, concat, set_column, astype
+    각 기능의 파라미터는 /dataframe/{기능} 의 쿼리 파라미터와 동일
+    merge, concat은 params의 right_id(서버의 dataset_id)가 오른쪽 DataFrame
+    결과가 DataFrame이 아닌 단계(col1, col2를 모두 지정한 corr 등)가 있으면 400
+
+    lazy=true 이면 실행 전에 계획을 최적화한다.(functions/plan.py)
+    col_condition을 merge/concat 아래(입력 쪽)로 옮기고, 사용하지 않는 컬럼은 입력을 읽은 직후에 버리고,
+    연속된 rename/astype은 하나로 합친다. merge 결과에서 필터링한 경우 결과의 인덱스와 행 순서는 달라질 수 있다.
+    ```
+    Args:
+    ```
+    item    (Request, required): JSON, 입력 DataFrame(dataset_id를 사용하면 생략)
+    steps   (str,     required): JSON, [{"op": 기능명, "params": {파라미터: 값}}, ...]
+                                 예) [{"op": "merge", "params": {"right_id": "...", "on": "a"}}, {"op": "col_condition", "params": {"col": "b", "cond1": "gr", "value1": 0}}]
+    *
+    lazy    (str,     optional): Default "false", true면 계획을 최적화해서 실행
+    explain (str,     optional): Default "false", true면 실행하지 않고 (최적화된) 실행 계획을 리턴
+    ```
+    Returns:
+    ```
+    str: JSON, 마지막 기능의 결과(dataset_id를 사용하면 {"dataset_id", "shape", "columns"})
+    ```
+    """
+    lazy = boolean(lazy or "false")
+    if lazy is None: return False, '"lazy" should be bool, "true" or "false"'
+    explain = boolean(explain or "false")
+    if explain is None: return False, '"explain" should be bool, "true" or "false"'
+
+    try:
+        steps = json.loads(steps)
+    except json.JSONDecodeError as e:
+        return False, f'"steps" should be JSON. {e}'
+    if not isinstance(steps, list) or not steps:
+        return False, f'"steps" should be a list of {{"op", "params"}}.'
+
+    calls, rights = [], {}
+    for i, step in enumerate(steps):
+        op = step.get("op") if isinstance(step, dict) else None
+        if op not in OPERATIONS:
+            return False, f'steps[{i}]: "op" should be in {list(OPERATIONS)}, current {op}'
+        params = dict(step.get("params") or {})
+        right_id = params.pop("right_id", None)
+        if op in BINARY and not right_id:
+            return False, f'steps[{i}] ({op}): "right_id" is required.'
+        try:
+            calls.append({"op": op, "kwargs": _kwargs(op, params), "index": i})
+        except ValueError as e:
+            return False, f"steps[{i}] ({op}): {e}"
+        if op in BINARY:
+            calls[-1].update(right_id=right_id, right=[])
+            rights[right_id] = await stored(right_id)
+            if rights[right_id] is None:
+                raise HTTPException(status_code=404, detail=f'dataset "{right_id}" does not exist. upload it again.')
+
+    df = await read_df(item)
+    if lazy:
+        calls = plan.optimize(calls, list(df.columns), {k: list(v.columns) for k, v in rights.items()})
+    if explain:
+        return True, json.dumps(plan.explain(calls), default=str)
+
+    tf, df = await _execute(df, calls, rights)
+    if not tf: return False, df
+    return True, frame_result(item, df)
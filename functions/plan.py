@@ -0,0 +1,338 @@
+"""/dataframe/pipeline?lazy=true 에서 사용하는 실행 계획 최적화
+
+step은 {"op", "kwargs", "index"} 딕셔너리(index: steps에서의 원래 위치, 최적화로 추가된 step은 None)
+merge, concat은 오른쪽 입력 {"right_id", "right": 오른쪽 입력에 먼저 적용할 step 리스트}를 추가로 가진다.
+
+- 필터 내리기   : col_condition을 결과가 같은 범위에서 최대한 앞으로(merge/concat 아래 양쪽 입력까지) 옮긴다.
+- 컬럼 가지치기 : 뒤에서 사용하지 않는 컬럼을 입력을 읽은 직후에 버린다.(loc, drop이 버리는 컬럼 등)
+- 합치기        : 연속된 rename, astype, 컬럼 선택을 하나로 합친다.(단계마다 DataFrame을 복사하지 않음)
+"""
+from typing import Optional
+
+from .internal_func import boolean, read_df, frame_result, select_columns, with_columns
+
+ASTYPES = ["int", "float", "category", "object"]
+
+
+## 최적화로 추가되는 내부 기능(입력 검증은 계획 단계에서 끝남)
+async def _project(item, cols: list) -> tuple:
+    return True, frame_result(item, select_columns(await read_df(item), cols))
+
+
+async def _rename(item, mapper: dict) -> tuple:
+    return True, frame_result(item, (await read_df(item)).rename(columns=mapper, copy=False))
+
+
+async def _astype(item, dtypes: dict) -> tuple:
+    df = await read_df(item)
+    return True, frame_result(item, with_columns(df, {col: df[col].astype(dtype) for col, dtype in dtypes.items()}))
+
+
+INTERNAL = {"_project": _project, "_rename": _rename, "_astype": _astype}
+
+
+def _split(x) -> list:
+    return [] if x is None else [i.strip() for i in str(x).split(",") if i.strip() != ""]
+
+
+def _empty(x) -> bool:
+    return x is None or x == ""
+
+
+def _int(x, default=None):
+    try   : return int(x)
+    except: return default
+
+
+def _rename_map(kwargs: dict) -> Optional[dict]:
+    keys, values = _split(kwargs["keys"]), _split(kwargs["values"])
+    if len(keys) != len(values) or (kwargs.get("errors") or "ignore").lower() not in ["raise", "ignore"]: return None
+    return dict(zip(keys, values))
+
+
+def _merge_keys(kwargs: dict, left: list, right: list) -> Optional[list]:
+    """merge의 조인 컬럼(on 또는 공통 컬럼). left_on/right_on, 인덱스 조인, cross는 None"""
+    if not _empty(kwargs.get("left_on")) or not _empty(kwargs.get("right_on")): return None
+    if boolean(str(kwargs.get("left_index") or "false")) or boolean(str(kwargs.get("right_index") or "false")): return None
+    if (kwargs.get("how") or "inner") == "cross": return None
+    keys = _split(kwargs.get("on")) or [c for c in left if c in right]
+    if not keys or any(c not in left or c not in right for c in keys): return None
+    return keys
+
+
+def _merge_sources(kwargs: dict, left: list, right: list) -> Optional[dict]:
+    """merge 결과 컬럼 => (입력, 원래 컬럼). 입력은 "left", "right", "key"(양쪽 조인 컬럼)"""
+    keys = _merge_keys(kwargs, left, right)
+    if keys is None: return None
+    left_suf  = kwargs.get("left_suf")  or "_x"
+    right_suf = kwargs.get("right_suf") or "_y"
+    sources = {}
+    for c in left:
+        if   c in keys : sources[c] = ("key", c)
+        elif c in right: sources[f"{c}{left_suf}"] = ("left", c)
+        else           : sources[c] = ("left", c)
+    for c in right:
+        if   c in keys: continue
+        elif c in left: sources[f"{c}{right_suf}"] = ("right", c)
+        else          : sources[c] = ("right", c)
+    if boolean(str(kwargs.get("indicator") or "false")): sources["_merge"] = (None, None)
+    return sources
+
+
+def _concat_rows(kwargs: dict) -> bool:
+    # 행 방향이고 keys(MultiIndex)를 쓰지 않는 concat
+    return _int(kwargs.get("axis"), -1) == 0 and _empty(kwargs.get("keys"))
+
+
+def _output(step: dict, cols: Optional[list], rights: dict) -> Optional[list]:
+    """step을 적용한 결과의 컬럼(알 수 없으면 None)"""
+    op, kw = step["op"], step["kwargs"]
+    if cols is None: return None
+    if op in ["col_condition", "head", "tail", "astype", "_astype"]: return cols
+    if op == "sort_values": return cols if _int(kw.get("axis"), -1) == 0 else None # axis=1은 컬럼 순서가 바뀜
+    if op == "dropna": return cols if _int(kw.get("axis"), -1) == 0 else None
+    if op == "_project": return list(kw["cols"])
+    if op in ["rename", "_rename"]:
+        mapper = kw["mapper"] if op == "_rename" else _rename_map(kw)
+        return None if mapper is None else [mapper.get(c, c) for c in cols]
+    if op == "drop":
+        if _int(kw.get("axis"), -1) == 0: return cols
+        if _int(kw.get("axis"), -1) == 1: return [c for c in cols if c not in _split(kw["labels"])]
+        return None
+    if op in ["loc", "iloc"]:
+        if not (_empty(kw.get("col_from")) and _empty(kw.get("col_to"))): return None
+        if _empty(kw.get("cols")): return cols
+        return _split(kw["cols"]) if op == "loc" and set(_split(kw["cols"])) <= set(cols) else None
+    if op == "set_column":
+        return cols if kw["col"] in cols else cols + [kw["col"]]
+    if op in ["merge", "concat"]:
+        right = _trace(step["right"], rights.get(step["right_id"]), rights)[-1]
+        if right is None: return None
+        if op == "concat":
+            if not _concat_rows(kw): return None
+            if (kw.get("join") or "outer") == "inner": return [c for c in cols if c in right]
+            return cols + [c for c in right if c not in cols] if not boolean(str(kw.get("sort") or "false")) else None
+        sources = _merge_sources(kw, cols, right)
+        return None if sources is None else list(sources)
+    return None
+
+
+def _trace(steps: list, cols: Optional[list], rights: dict) -> list:
+    """각 step 앞의 컬럼 리스트(마지막은 전체 결과의 컬럼)"""
+    trace = [cols]
+    for step in steps:
+        trace.append(_output(step, trace[-1], rights))
+    return trace
+
+
+def _step(op: str, kwargs: dict, index=None) -> dict:
+    return {"op": op, "kwargs": kwargs, "index": index}
+
+
+## 1. 필터 내리기
+def _label_free(steps: list) -> bool:
+    # 인덱스 라벨을 사용하는 step이 없는지(merge, ignore_index concat 아래로 필터를 옮기면 인덱스가 달라짐)
+    for step in steps:
+        kw = step["kwargs"]
+        if step["op"] == "loc" and not all(_empty(kw.get(i)) for i in ["idx", "idx_from", "idx_to"]): return False
+        if step["op"] == "drop" and _int(kw.get("axis"), -1) != 1: return False
+    return True
+
+
+def _swap_filter(f: dict, p: dict, before: list) -> Optional[dict]:
+    """필터 f를 p 앞으로 옮길 수 있으면 옮긴 필터(컬럼명이 바뀔 수 있음), 아니면 None"""
+    op, kw, col = p["op"], p["kwargs"], f["kwargs"]["col"]
+    if op in ["rename", "_rename"]:
+        mapper  = kw["mapper"] if op == "_rename" else _rename_map(kw)
+        if mapper is None: return None
+        sources = [c for c in before if mapper.get(c, c) == col]
+        if len(sources) != 1: return None
+        return {**f, "kwargs": {**f["kwargs"], "col": sources[0]}}
+    if col not in before: return None
+    # axis=1은 by 행의 값으로 컬럼을 정렬하므로 먼저 행을 거르면 결과가 달라진다.
+    if op == "sort_values" and (_int(kw.get("axis"), -1) != 0 or boolean(str(kw.get("ig_idx") or "false"))): return None
+    if op in ["col_condition", "sort_values", "_project"]           : return f
+    if op == "dropna" and _int(kw.get("axis"), -1) == 0             : return f
+    if op == "drop"   and _int(kw.get("axis"), -1) == 1             : return f
+    if op == "loc"    and all(_empty(kw.get(i)) for i in ["idx", "idx_from", "idx_to"]): return f
+    if op == "astype" and kw["col"] != col                          : return f
+    if op == "_astype" and col not in kw["dtypes"]                  : return f
+    if op == "set_column" and kw["col"] != col                      : return f
+    return None
+
+
+def _push_filters(steps: list, cols: Optional[list], rights: dict) -> list:
+    steps = list(steps)
+    i = 0
+    while i < len(steps):
+        if steps[i]["op"] != "col_condition":
+            i += 1
+            continue
+        j = i
+        while j > 0:
+            trace  = _trace(steps, cols, rights)
+            f, p   = steps[j], steps[j - 1]
+            before = trace[j - 1]
+            if before is None: break
+
+            if p["op"] in ["merge", "concat"]:
+                right = _trace(p["right"], rights.get(p["right_id"]), rights)[-1]
+                if right is None or not _label_free(steps[j - 1:]): break
+                # 결과를 검사하는 옵션은 필터 전 데이터로 검사해야 하므로 옮기지 않는다.
+                if not _empty(p["kwargs"].get("validate")) or boolean(str(p["kwargs"].get("veri_integ") or "false")): break
+                col = f["kwargs"]["col"]
+                if p["op"] == "merge":
+                    sources = _merge_sources(p["kwargs"], before, right)
+                    how     = p["kwargs"].get("how") or "inner"
+                    side, source = (sources or {}).get(col, (None, None))
+                    if   side == "key"   and how == "inner"         : sides = ["left", "right"]
+                    elif side == "key"   and how == "left"          : sides = ["left"]
+                    elif side == "left"  and how in ["inner", "left"] : sides = ["left"]
+                    elif side == "right" and how in ["inner", "right"]: sides = ["right"]
+                    else: break
+                else:
+                    if not _concat_rows(p["kwargs"]) or col not in before or col not in right: break
+                    sides, source = ["left", "right"], col
+                moved = {**f, "kwargs": {**f["kwargs"], "col": source}}
+                if "right" in sides:
+                    steps[j - 1] = p = {**p, "right": p["right"] + [moved]}
+                if "left" in sides:
+                    steps[j - 1], steps[j] = moved, p
+                    j -= 1
+                    continue
+                del steps[j]
+                i -= 1
+                break
+
+            moved = _swap_filter(f, p, before)
+            if moved is None: break
+            steps[j - 1], steps[j] = moved, p
+            j -= 1
+        i += 1
+    return steps
+
+
+## 2. 컬럼 가지치기
+def _required(step: dict, req: Optional[set], before: Optional[list]) -> Optional[set]:
+    """step 결과에서 req 컬럼이 필요할 때 step 입력에서 필요한 컬럼(None: 전체)"""
+    op, kw = step["op"], step["kwargs"]
+    if before is None: return None
+    if op == "_project": return set(kw["cols"])
+    if op in ["loc", "iloc"]:
+        if not (_empty(kw.get("col_from")) and _empty(kw.get("col_to"))): return None
+        if _empty(kw.get("cols")): return req
+        return set(_split(kw["cols"])) if op == "loc" else None
+    if op in ["head", "tail"]   : return req
+    if op == "drop" and _int(kw.get("axis"), -1) == 0: return req
+    if req is None              : return None
+    if op == "col_condition"    : return req | {kw["col"]}
+    if op == "sort_values"      : return req | set(_split(kw["by"])) if _int(kw.get("axis"), -1) == 0 else None
+    if op == "astype"           : return req | {kw["col"]}
+    if op == "_astype"          : return req | set(kw["dtypes"])
+    if op == "drop" and _int(kw.get("axis"), -1) == 1: return req | set(_split(kw["labels"]))
+    if op == "dropna":
+        if _int(kw.get("axis"), -1) != 0 or _empty(kw.get("subset")): return None
+        return req | set(_split(kw["subset"]))
+    if op in ["rename", "_rename"]:
+        mapper = kw["mapper"] if op == "_rename" else _rename_map(kw)
+        return None if mapper is None else {c for c in before if mapper.get(c, c) in req}
+    if op == "set_column":
+        if not (_empty(kw.get("col_from")) and _empty(kw.get("col_to"))): return None
+        used = set(_split(kw.get("cols_ops"))[0::2]) if not _empty(kw.get("cols_ops")) else set(_split(kw.get("cols")))
+        # 기존 컬럼을 바꾸는 경우 컬럼 순서가 유지되도록 남겨둔다.
+        return req | (used & set(before)) | ({kw["col"]} & set(before))
+    return None
+
+
+def _prune(steps: list, cols: Optional[list], rights: dict, req: Optional[set] = None) -> list:
+    """뒤에서부터 필요한 컬럼을 계산해서 입력 바로 뒤에 _project 추가(merge/concat의 오른쪽 입력도 동일)"""
+    steps = list(steps)
+    trace = _trace(steps, cols, rights)
+    for j in range(len(steps) - 1, -1, -1):
+        step, before = steps[j], trace[j]
+        if step["op"] in ["merge", "concat"]:
+            right = _trace(step["right"], rights.get(step["right_id"]), rights)[-1]
+            req_left = req_right = None
+            if req is not None and before is not None and right is not None:
+                if step["op"] == "merge":
+                    sources = _merge_sources(step["kwargs"], before, right)
+                    if sources is not None:
+                        keys      = set(_merge_keys(step["kwargs"], before, right))
+                        req_left  = keys | {c for n, (s, c) in sources.items() if n in req and s == "left"}
+                        req_right = keys | {c for n, (s, c) in sources.items() if n in req and s == "right"}
+                        # 접미사가 붙는 컬럼은 양쪽에 모두 남겨야 이름이 유지된다.
+                        both      = (req_left | req_right) & set(before) & set(right)
+                        req_left, req_right = req_left | both, req_right | both
+                elif _concat_rows(step["kwargs"]):
+                    req_left, req_right = req & set(before), req & set(right)
+            steps[j] = {**step, "right": _prune(step["right"], rights.get(step["right_id"]), rights, req_right)}
+            req = req_left
+        else:
+            req = _required(step, req, before)
+
+    if req is not None and cols is not None:
+        project = [c for c in cols if c in req]
+        if len(project) < len(cols): steps.insert(0, _step("_project", {"cols": project}))
+    return steps
+
+
+## 3. 합치기
+def _fuse(steps: list, cols: Optional[list], rights: dict) -> list:
+    fused = []
+    for step in steps:
+        if step["op"] in ["merge", "concat"]:
+            step = {**step, "right": _fuse(step["right"], rights.get(step["right_id"]), rights)}
+        before = _trace(fused, cols, rights)[-1]
+        prev   = fused[-1] if fused else None
+        op, kw = step["op"], step["kwargs"]
+
+        # drop(axis=1) => 컬럼 선택
+        if op == "drop" and _int(kw.get("axis"), -1) == 1 and before is not None and set(_split(kw["labels"])) <= set(before):
+            step = _step("_project", {"cols": [c for c in before if c not in _split(kw["labels"])]}, step["index"])
+            op, kw = step["op"], step["kwargs"]
+
+        if op == "_project" and prev and prev["op"] == "_project" and set(kw["cols"]) <= set(prev["kwargs"]["cols"]):
+            fused[-1] = {**step, "index": prev["index"]}
+            continue
+
+        if op == "rename" and before is not None and prev and prev["op"] in ["rename", "_rename"]:
+            first = prev["kwargs"]["mapper"] if prev["op"] == "_rename" else _rename_map(prev["kwargs"])
+            then  = _rename_map(kw)
+            raise_ = "raise" in [(i.get("errors") or "ignore").lower() for i in [kw, prev["kwargs"]]]
+            prior  = _trace(fused[:-1], cols, rights)[-1]
+            if first is not None and then is not None and not raise_ and prior is not None:
+                names = {c: then.get(first.get(c, c), first.get(c, c)) for c in prior}
+                fused[-1] = _step("_rename", {"mapper": {c: n for c, n in names.items() if c != n}}, prev["index"])
+                continue
+
+        if op == "astype" and kw["dtype"] in ASTYPES and before is not None and kw["col"] in before \
+           and prev and prev["op"] in ["astype", "_astype"]:
+            dtypes = prev["kwargs"]["dtypes"] if prev["op"] == "_astype" else {prev["kwargs"]["col"]: prev["kwargs"]["dtype"]}
+            prior  = _trace(fused[:-1], cols, rights)[-1]
+            if kw["col"] not in dtypes and all(d in ASTYPES for d in dtypes.values()) and prior is not None and set(dtypes) <= set(prior):
+                fused[-1] = _step("_astype", {"dtypes": {**dtypes, kw["col"]: kw["dtype"]}}, prev["index"])
+                continue
+
+        fused.append(step)
+    return fused
+
+
+def optimize(steps: list, cols: list, rights: dict) -> list:
+    """steps의 실행 계획을 최적화(cols: 입력 컬럼, rights: right_id => 오른쪽 입력 컬럼)"""
+    steps = _push_filters(steps, cols, rights)
+    steps = _fuse(steps, cols, rights)
+    steps = _prune(steps, cols, rights)
+    return _fuse(steps, cols, rights)
+
+
+def explain(steps: list) -> list:
+    """실행 계획을 JSON으로 보여주기 위한 형태로 변환"""
+    return [
+        {
+            "op"    : step["op"],
+            "params": step["kwargs"],
+            "step"  : step["index"],
+            **({"right_id": step["right_id"], "right": explain(step["right"])} if "right_id" in step else {}),
+        }
+        for step in steps
+    ]
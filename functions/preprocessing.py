@@ -9,7 +9,9 @@ from sklearn.model_selection import train_test_split as tts
 from .internal_func import (
     boolean,
     isint,
-    check_error
+    check_error,
+    read_df,
+    frame_result,
 )
 
 
@@ -34,7 +36,7 @@ async def feature_target_split(
     str: JSON, {"X":feature_df, "y":target_df}
     ```
     """
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
     dfcols = set(df.columns)
     try:    cols = [i.strip() for i in cols.split(",") if i.strip() != ""]
@@ -45,8 +47,8 @@ async def feature_target_split(
     X = df.drop(cols, axis=1)
 
     return True, json.dumps( {
-        "X": X.to_json(orient="records"),
-        "y": y.to_json(orient="records"),
+        "X": frame_result(item, X, negotiate=False),
+        "y": frame_result(item, y, negotiate=False),
     } )
 
 
@@ -75,6 +77,8 @@ async def train_test_split(
     ```
     item         (Request, required): JSON, {"X":X_dataframe, "y":y_dataframe}
     *,
+    X_id         (str,     optional): Default = None,   item["X"] 대신 사용할 서버의 dataset_id(쿼리 파라미터)
+    y_id         (str,     optional): Default = None,   item["y"] 대신 사용할 서버의 dataset_id(쿼리 파라미터)
     test_size    (str,     optional): Default = None,   0~1 사이의 소수. 테스트 셋의 비율
     train_size   (str,     optional): Default = None,   0~1 사이의 소수. 트레인 셋의 비율
     random_state (str,     optional): Default = None,   아무 정수. 랜덤 시드
@@ -85,10 +89,10 @@ async def train_test_split(
     ```
     str: JSON,
     {
-        "X_train": X_train.to_json(orient="records"),
-        "X_test" : X_test .to_json(orient="records"),
-        "y_train": y_train.to_json(orient="records"),
-        "y_test" : y_test .to_json(orient="records"),
+        "X_train": frame_result(item, X_train, negotiate=False),
+        "X_test" : frame_result(item, X_test, negotiate=False),
+        "y_train": frame_result(item, y_train, negotiate=False),
+        "y_test" : frame_result(item, y_test, negotiate=False),
     }
     ```
     """
@@ -101,10 +105,8 @@ async def train_test_split(
     valid_size   = None    if valid_size   == "" else valid_size
     # v_train_size = None    if v_train_size == "" else v_train_size
 
-    item = await item.json()
-
-    X = pd.read_json(item["X"])
-    y = pd.read_json(item["y"])
+    X = await read_df(item, "X")
+    y = await read_df(item, "y")
 
     ## test_size:    0 < test_size < 1 인 float
     if test_size is not None:
@@ -174,12 +176,12 @@ async def train_test_split(
             stratify     = y_train if stratify else None,
         )
         return True, json.dumps( {
-            "X_train": X_train.to_json(orient="records"),
-            "X_valid": X_valid.to_json(orient="records"),
-            "X_test" : X_test.to_json(orient="records"),
-            "y_train": y_train.to_json(orient="records"),
-            "y_valid": y_valid.to_json(orient="records"),
-            "y_test" : y_test.to_json(orient="records"),
+            "X_train": frame_result(item, X_train, negotiate=False),
+            "X_valid": frame_result(item, X_valid, negotiate=False),
+            "X_test" : frame_result(item, X_test, negotiate=False),
+            "y_train": frame_result(item, y_train, negotiate=False),
+            "y_valid": frame_result(item, y_valid, negotiate=False),
+            "y_test" : frame_result(item, y_test, negotiate=False),
         } )
 
     # 시계열 기준일 경우
@@ -187,8 +189,8 @@ async def train_test_split(
     # stratify = None
 
     return True, json.dumps( {
-        "X_train": X_train.to_json(orient="records"),
-        "X_test" : X_test.to_json(orient="records"),
-        "y_train": y_train.to_json(orient="records"),
-        "y_test" : y_test.to_json(orient="records"),
+        "X_train": frame_result(item, X_train, negotiate=False),
+        "X_test" : frame_result(item, X_test, negotiate=False),
+        "y_train": frame_result(item, y_train, negotiate=False),
+        "y_test" : frame_result(item, y_test, negotiate=False),
     } )
\ No newline at end of file
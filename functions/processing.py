@@ -9,8 +9,13 @@ from .internal_func import (
     FUNCTIONS,
     boolean,
     isint,
-    check_error
+    check_error,
+    read_df,
+    frame_result,
+    select_columns,
+    with_columns,
 )
+from . import chunked, admission
 
 # def split(x) -> bool or None:
 #     try   : return [i.strip() for i in x.split(",") if i.strip() != ""]
@@ -18,7 +23,9 @@ from .internal_func import (
 
 @check_error
 async def transpose(item: Request) -> tuple:
-    return True, pd.read_json(await item.json()).transpose().to_json(orient="records")
+    df = await read_df(item)
+    with admission.reserve("transpose", admission.transpose_bytes(df)):
+        return True, frame_result(item, df.transpose())
 
 
 @check_error
@@ -74,14 +81,17 @@ async def groupby(
     if not func in FUNCTIONS:
         return False, f'"{func}" is invalid function. "func" should be in {FUNCTIONS}'
     
-    df = pd.read_json(await item.json())
+    # 디스크에만 있는 큰 데이터셋은 메모리에 올리지 않고 청크 단위로 집계(functions/chunked.py)
+    table = chunked.source(item)
+    df    = None if table is not None else await read_df(item)
+    dfcols = table.column_names if table is not None else df.columns
 
     ## by
     try:
         # if by is None:
         #     return False, '"by" is a required parameter.'
         by = [i.strip() for i in by.split(",") if i.strip() != ""]
-        error_list = [i for i in by if i not in df.columns]
+        error_list = [i for i in by if i not in dfcols]
         if error_list:
             return False, f'"by" should be string array(column names) divied by ","\nlist not in DataFrame columns: {error_list}'
     except:
@@ -120,6 +130,10 @@ async def groupby(
     dropna = boolean(dropna)
     if dropna is None: return False, '"dropna" should be bool, "true" or "false"'
 
+    if table is not None:
+        if axis == 0 and as_index and chunked.supported(table, by, observed):
+            return True, frame_result(item, chunked.groupby(table, by, func, sort=sort, observed=observed, dropna=dropna))
+        df = await read_df(item)
 
     # pd.DataFrame.groupby
     df_group = df.groupby(
@@ -133,7 +147,8 @@ async def groupby(
         dropna     = dropna
     )
     
-    return True, FUNCTIONS[func](df_group)().reset_index().to_json(orient="records")
+    with admission.reserve("groupby", admission.groupby_bytes(df, by)):
+        return True, frame_result(item, FUNCTIONS[func](df_group)().reset_index())
 
 
 @check_error
@@ -177,7 +192,7 @@ async def drop(
     if errors not in ["raise", "ignore"]:
         return False, f'"errors" should be "raise" or "ignore". current errors = {errors}'
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
     ## axis
     try:
@@ -208,7 +223,12 @@ async def drop(
     except:
         return False, '"labels" should be string array(column names) divied by ","'
     
-    return True, df.drop(
+    if axis and df.columns.is_unique:
+        # 남은 컬럼은 복사하지 않는다.(저장소에서 입력과 컬럼 배열 공유)
+        labels = set(labels)
+        return True, frame_result(item, select_columns(df, [i for i in df.columns if i not in labels]))
+
+    return True, frame_result(item, df.drop(
         labels = labels,
         axis   = axis,
         errors = errors,
@@ -216,7 +236,7 @@ async def drop(
         # columns=None,
         # level=None,
         # inplace=False,
-    ).to_json(orient="records")
+    ))
 
 
 @check_error
@@ -273,7 +293,7 @@ async def dropna(
         except:
             return False, f'"thresh" should be positive integer. current thresh = {thresh}'
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
     ## subset => dropna를 하면서 삭제하고 싶은 컬럼을 적으면 된다.
     # column label or sequence of labels, optional
@@ -288,13 +308,13 @@ async def dropna(
         except:
             return False, f'"subset" should be string array(column names) divied by ",". current subset = {subset}'
 
-    return True, df.dropna(
+    return True, frame_result(item, df.dropna(
         axis    = axis,
         how     = how,
         thresh  = thresh,
         subset  = subset,
         # inplace = False,
-    ).to_json(orient="records")
+    ))
 
 
 @check_error
@@ -322,7 +342,7 @@ async def rename(
     keys   (str,     required): "keys" should be string array(column names) divied by ","
     values (str,     required): "values" should be string array(new column names) divied by ","
     *
-    copy   (str,     optional): Default "true",   ??? "Also copy underlying data"
+    copy   (str,     optional): Default "true",   true면 데이터도 복사(false면 입력과 컬럼 배열 공유)
     errors (str,     optional): Default "ignore", "raise" 일 경우 keys에 없는 컬럼명이 있는 경우 에러 발생
     ```
     Returns:
@@ -333,7 +353,7 @@ async def rename(
     copy   = "true"   if copy   == "" else copy
     errors = "ignore" if errors == "" else errors
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
     ## keys
     try:
@@ -365,12 +385,12 @@ async def rename(
     
     mapper = {keys[i]:values[i] for i in range(len(keys))}
     
-    return True, df.rename(
+    return True, frame_result(item, df.rename(
         mapper = mapper,
         axis   = 1,
         copy   = copy,
         errors = errors,
-    ).to_json(orient="records")
+    ))
 
 
 @check_error
@@ -415,7 +435,7 @@ async def sort_values(
     ig_idx = "false"     if ig_idx == "" else ig_idx
     key    = None        if key    == "" else key
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
     ## by
     try:
@@ -459,7 +479,7 @@ async def sort_values(
     # this `key` function should be *vectorized*. It should expect a
     # ``Series`` and return an array-like.
     
-    return True, df.sort_values(
+    return True, frame_result(item, df.sort_values(
         by           = by,
         axis         = axis,
         ascending    = ascd,
@@ -468,7 +488,7 @@ async def sort_values(
         ignore_index = ig_idx,
         key          = key, # 현재 미구현
         # inplace      = inplace,
-    ).to_json(orient="records")
+    ))
 
 
 @check_error
@@ -496,8 +516,10 @@ async def merge(
     ```
     Args:
     ```
-    item        (Request, required): JSON
+    item        (Request, required): JSON, {"left":left_dataframe, "right":right_dataframe}
     *
+    left_id     (str,     optional): Default None,    item["left"] 대신 사용할 서버의 dataset_id(쿼리 파라미터)
+    right_id    (str,     optional): Default None,    item["right"] 대신 사용할 서버의 dataset_id(쿼리 파라미터)
     how         (str,     optional): Default "inner", inner: inner join, outer: outer join
     on          (str,     optional): Default None,    조인할 대상 컬럼(양쪽 DataFrame에 다 있어야 함)
     left_on     (str,     optional): Default None,    조인할 대상 컬럼(왼쪽)
@@ -529,9 +551,8 @@ async def merge(
     indicator   = "false" if indicator   == "" else indicator
     validate    = None    if validate    == "" else validate
 
-    item = await item.json()
-    df_left = pd.read_json(item["left"])
-    df_right = pd.read_json(item["right"])
+    df_left  = await read_df(item, "left")
+    df_right = await read_df(item, "right")
 
     ## how
     if how not in {"left", "right", "outer", "inner", "cross"}:
@@ -606,7 +627,10 @@ async def merge(
         if validate not in {"1:1", "1:m", "m:1", "m:m", "one_to_one", "one_to_many", "many_to_one", "many_to_many"}:
             return False, f'"validate" should be ["1:1", "1:m", "m:1", "m:m", "one_to_one", "one_to_many", "many_to_one", "many_to_many"]. current validate = {validate}'
 
-    return True, df_left.merge(
+    # 결과 행 수를 키 값별 행 수로 미리 계산해서 메모리 예산을 넘으면 실행하지 않는다.(how="cross" 등)
+    cost = admission.merge_bytes(df_left, df_right, how, on=on, left_on=left_on, right_on=right_on, left_index=left_index, right_index=right_index)
+    with admission.reserve("merge", cost):
+        return True, frame_result(item, df_left.merge(
         right        = df_right,
         how          = how,
         on           = on,          #: IndexLabel | None = None,
@@ -619,7 +643,7 @@ async def merge(
         copy         = copy,        #: bool = True,
         indicator    = indicator,   #: bool = False,
         validate     = validate,    #: str | None = None,
-    ).to_json(orient="records")
+        ))
 
 
 @check_error
@@ -642,8 +666,10 @@ async def concat(
     ```
     Args:
     ```
-    item       (Request, required): JSON
+    item       (Request, required): JSON, {"left":left_dataframe, "right":right_dataframe}
     *
+    left_id    (str,     optional): Default None,    item["left"] 대신 사용할 서버의 dataset_id(쿼리 파라미터)
+    right_id   (str,     optional): Default None,    item["right"] 대신 사용할 서버의 dataset_id(쿼리 파라미터)
     axis       (str,     optional): Default 0,       row(0), column(1)
     join       (str,     optional): Default "outer", "inner", "outer"
     ig_idx     (str,     optional): Default "false", true: 인덱스를 새로 붙인다. false: 인덱스를 바꾸지 않고 합친다.
@@ -669,9 +695,8 @@ async def concat(
     sort       = "false" if sort       == "" else sort
     copy       = "true"  if copy       == "" else copy
 
-    item = await item.json()
-    df_left = pd.read_json(item["left"])
-    df_right = pd.read_json(item["right"])
+    df_left  = await read_df(item, "left")
+    df_right = await read_df(item, "right")
 
     if type(df_left) == type(df_right) == pd.DataFrame:
         objs = [df_left, df_right]
@@ -734,7 +759,8 @@ async def concat(
     copy = boolean(copy)
     if copy is None: return False, '"copy" should be bool, "true" or "false"'
 
-    return True, pd.concat(
+    with admission.reserve("concat", admission.concat_bytes(df_left, df_right, axis, join)):
+        return True, frame_result(item, pd.concat(
         objs             = objs,       #: Iterable[NDFrame] | Mapping[Hashable, NDFrame],
         axis             = axis,       #: Axis = 0,
         join             = join,       #: str = "outer",
@@ -745,7 +771,7 @@ async def concat(
         verify_integrity = veri_integ, #: bool = False,
         sort             = sort,       #: bool = False,
         copy             = copy,       #: bool = True,
-    ).to_json(orient="records")
+        ))
 
 
 @check_error
@@ -805,7 +831,7 @@ async def set_column(
     func     = None if func     == "" else func
     cols_ops = None if cols_ops == "" else cols_ops
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
     dfcols = set(df.columns)
     # left: df[col], right: some function
     # df[col] =
@@ -845,7 +871,7 @@ async def set_column(
                     cur = operators[cur](left, right)
                 deq.append(cur)
 
-        df[col] = deq.pop()
+        value = deq.pop()
 
     else:
         ## func
@@ -881,9 +907,10 @@ async def set_column(
 
 
         df_func = df[cols] if cols else df[:,col_from:col_to]
-        df[col] = FUNCTIONS[func](df_func)(axis=1)
+        value = FUNCTIONS[func](df_func)(axis=1)
 
-    return True, df.to_json(orient="records")
+    # 바뀌지 않은 컬럼은 입력과 공유
+    return True, frame_result(item, with_columns(df, {col: value}))
 
 
 @check_error
@@ -905,8 +932,7 @@ async def astype(item: Request, col:str, dtype:str) -> tuple:
     """
     if dtype not in ["int", "float", "category", "object"]:
         return False, f"{dtype}: 올바르지 않은 데이터 타입"
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
     if col not in set(df.columns):
         return False, f"{col}: 존재하지 않는 컬럼"
-    df[col] = df[col].astype(dtype)
-    return True, df.to_json(orient="records")
+    return True, frame_result(item, with_columns(df, {col: df[col].astype(dtype)}))
@@ -0,0 +1,114 @@
+"""요청 1개의 프로파일(?profile=true, 관리자만)
+
+연산 스레드의 호출 스택을 PROFILE_INTERVAL초마다 샘플링해서 folded stack 형식
+(한 줄에 "바깥;...;안쪽 샘플 수")으로 DATA_DIR/profiles/{profile_id}.folded 에 저장한다.
+/profiles/{profile_id}에서 내려받아 flamegraph.pl, speedscope 등으로 볼 수 있다.
+실제 데이터셋으로 실행한 요청을 그대로 프로파일링하므로 결과 캐시는 사용하지 않는다.
+"""
+import os, sys, time, uuid, hmac, threading, collections, contextvars
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from . import store
+
+# 관리자 키(요청 헤더 admin-key와 같아야 profile=true 사용 가능, 없으면 프로파일링 사용 안 함)
+ADMIN_KEY        = os.getenv("ADMIN_KEY")
+# 샘플링 간격(초)
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.005))
+# 보관 시간(초)
+PROFILE_TTL      = float(os.getenv("PROFILE_TTL", 86400))
+PROFILE_DIR      = os.path.join(store.DATA_DIR, "profiles")
+
+# 프로파일링 중인 요청의 _Profile(compute()가 연산 스레드를 등록)
+_current = contextvars.ContextVar("profile", default=None)
+
+
+def authorize(admin_key: str or None):
+    """관리자 키 확인(아니면 403)"""
+    if not ADMIN_KEY or not admin_key or not hmac.compare_digest(admin_key, ADMIN_KEY):
+        raise HTTPException(status_code=403, detail='"profile" is only available to administrators. send the "admin-key" header.')
+
+
+def _path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(";", ":").replace(" ", "_")
+
+
+class _Profile:
+    """샘플링 스레드(연산 스레드가 실행 중인 동안만 스택을 기록)"""
+    def __init__(self, name: str):
+        self.profile_id = uuid.uuid4().hex
+        self.name    = name
+        self.tasks   = []   # internal_func._Task(thread: 실행 중인 스레드 id)
+        self.samples = collections.Counter()
+        self.stopped = threading.Event()
+        self.thread  = threading.Thread(target=self._run, name="profile", daemon=True)
+
+    def watch(self, task):
+        """샘플링할 연산(compute()의 _Task)"""
+        self.tasks.append(task)
+
+    def _run(self):
+        while not self.stopped.wait(PROFILE_INTERVAL):
+            frames = sys._current_frames()
+            for task in self.tasks:
+                frame = frames.get(task.thread) if task.thread is not None else None
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame))
+                    frame = frame.f_back
+                if stack: self.samples[";".join([self.name, *reversed(stack)])] += 1
+
+    async def __aenter__(self):
+        self.thread.start()
+        self._token = _current.set(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        _current.reset(self._token)
+        # 샘플링 스레드 종료를 기다리고 파일에 쓰는 동안 이벤트 루프를 막지 않도록 스레드에서
+        await run_in_threadpool(self._finish)
+
+    def _finish(self):
+        self.stopped.set()
+        self.thread.join()
+        self.save()
+
+    def save(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        _sweep()
+        store.write_file(_path(self.profile_id), "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common()))
+
+
+def _sweep():
+    # 보관 시간이 지난 프로파일 삭제
+    now = time.time()
+    for entry in os.scandir(PROFILE_DIR):
+        try:
+            if entry.stat().st_mtime + PROFILE_TTL < now: os.remove(entry.path)
+        except FileNotFoundError: # 다른 워커가 먼저 삭제
+            pass
+
+
+def start(name: str) -> _Profile:
+    """async with profiler.start(name): ... 블록의 연산을 프로파일링"""
+    return _Profile(name)
+
+
+def current() -> _Profile or None:
+    """프로파일링 중인 요청의 _Profile(아니면 None)"""
+    return _current.get()
+
+
+def load(profile_id: str) -> str or None:
+    """저장된 folded stack(없으면 None)"""
+    if not profile_id.isalnum(): return None
+    try:
+        with open(_path(profile_id)) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,670 @@
+import os, time, uuid, json, fcntl, hashlib, threading, tempfile, contextlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+# import modin.pandas as pd
+import pyarrow as pa
+
+# 워커 1개의 메모리에 유지할 데이터셋 전체 크기(bytes, 워커마다 따로 적용, 초과하면 가장 오래 사용하지 않은 것부터 메모리에서 내림)
+MEMORY_BUDGET = int(os.getenv("MEMORY_BUDGET", 512 * 2**20))
+# 디스크에 유지할 데이터셋 파일 전체 크기(bytes, 모든 워커 합계, 초과하면 가장 오래 사용하지 않은 것부터 삭제)
+DISK_BUDGET   = int(os.getenv("DISK_BUDGET", 4 * 2**30))
+# 디스크에 저장하는 데이터셋(Arrow IPC 파일 = Feather v2) 경로
+# 여러 워커(uvicorn --workers)가 같은 DATA_DIR을 사용하면 서로 저장한 데이터셋을 memory map으로 공유한다.
+# /dev/shm(tmpfs)을 사용하면 파일이 공유 메모리에 있으므로 디스크 I/O 없이 모든 워커가 같은 페이지를 읽는다.
+DATA_DIR      = os.getenv("DATA_DIR", os.path.join(tempfile.gettempdir(), "ml-funcs"))
+# 다른 워커가 저장 중인 데이터셋을 기다리는 최대 시간(초)
+PENDING_TIMEOUT = float(os.getenv("PENDING_TIMEOUT", 60))
+# 사용한 파일의 수정 시각(mtime)을 갱신하는 최소 간격(초). 모든 워커가 mtime 순서로 오래된 파일부터 삭제
+TOUCH_INTERVAL  = 10
+
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# 메모리 계층: dataset_id => (DataFrame, bytes)(워커마다 따로 유지)
+# 디스크 계층: DATA_DIR/{dataset_id}.arrow(Arrow로 변환할 수 없는 DataFrame은 .pkl), 모든 워커가 공유
+# 등록된 DataFrame은 모두 백그라운드에서 디스크에 저장하고, 저장이 끝날 때까지 _pending에 보관한다.
+# 저장하는 동안은 {dataset_id}.pending 파일로 다른 워커에 알린다.(다른 워커는 파일이 생길 때까지 기다림)
+_memory  = OrderedDict()
+_pending = {}
+_schemas = {} # dataset_id => schema(처음 요청할 때 계산)
+# 버전: dataset_id => {"parent": 입력 dataset_id, "op": 기능명, "columns": [[컬럼명, 부모 컬럼명 또는 None(새 컬럼)], ...]}
+# "columns"가 있는 버전은 부모와 바뀌지 않은 컬럼의 배열을 공유하고 파일에는 새 컬럼만 저장한다.
+_meta     = {}
+_children = {}    # dataset_id => 컬럼을 공유하는 버전의 dataset_id set(버전이 남아 있으면 디스크에서 삭제하지 않음)
+_hidden   = set() # remove() 했지만 버전이 컬럼을 공유하고 있어서 파일을 남겨둔 데이터셋
+# _lock은 메모리의 상태만 바꾸는 짧은 구간에 사용(이벤트 루프에서도 사용하므로 디렉토리 검사, 파일 삭제, 크기 계산은 밖에서)
+_lock    = threading.RLock()
+_writer  = ThreadPoolExecutor(max_workers=1)
+_memory_bytes = 0
+# 디스크 계층을 바꿀 때 다른 워커와 겹치지 않도록 잠그는 파일(fcntl.flock)
+# flock은 같은 프로세스의 스레드끼리는 막지 못하므로 _disk로 워커 안의 스레드를 먼저 막는다.
+_lockfile = open(os.path.join(DATA_DIR, ".lock"), "a")
+_disk     = threading.Lock()
+
+ARROW_EXT, PICKLE_EXT, HIDDEN_EXT, PENDING_EXT = ".arrow", ".pkl", ".hidden", ".pending"
+# 버전 정보를 저장하는 Arrow 스키마 메타데이터 키
+META_KEY = b"ml-funcs"
+
+
+def _path(dataset_id: str, ext: str = ARROW_EXT) -> str:
+    return os.path.join(DATA_DIR, f"{dataset_id}{ext}")
+
+
+def _find(dataset_id: str) -> str or None:
+    for ext in (ARROW_EXT, PICKLE_EXT):
+        path = _path(dataset_id, ext)
+        if os.path.exists(path): return path
+    return None
+
+
+def _open(path: str) -> pa.RecordBatchFileReader:
+    # memory map 으로 열기 때문에 파싱 없이 필요한 부분만 읽는다.
+    return pa.ipc.open_file(pa.memory_map(path))
+
+
+def _read_meta(path: str) -> dict:
+    # Arrow 파일의 버전 정보(pickle, 업로드한 파일은 없음)
+    if not path.endswith(ARROW_EXT): return {}
+    metadata = _open(path).schema.metadata or {}
+    return json.loads(metadata[META_KEY]) if META_KEY in metadata else {}
+
+
+def _link(dataset_id: str, meta: dict):
+    _meta[dataset_id] = meta
+    if "columns" in meta: _children.setdefault(meta["parent"], set()).add(dataset_id)
+
+
+@contextlib.contextmanager
+def _exclusive():
+    """다른 워커와 동시에 디스크 계층을 바꾸지 않도록 잠금
+
+    다른 워커가 잠근 동안 기다리므로 _lock을 잡은 채로 사용하지 않는다.(이벤트 루프가 _lock을 기다리며 멈춤)
+    """
+    with _disk:
+        fcntl.flock(_lockfile, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(_lockfile, fcntl.LOCK_UN)
+
+
+def write_file(path: str, data: str or bytes):
+    """파일을 쓴 다음 이름을 바꾸기 때문에 다른 워커가 덜 쓴 파일을 읽지 않는다."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    with open(tmp, "wb" if isinstance(data, bytes) else "w") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def alive(pid) -> bool:
+    """같은 호스트의 프로세스(워커)가 실행 중인지"""
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError, ValueError):
+        return pid is not None
+    return True
+
+
+def _marker(dataset_id: str) -> dict or None:
+    """다른 워커가 저장 중인 데이터셋의 표시 {"pid", "parent"}(저장하던 워커가 종료됐으면 삭제하고 None)"""
+    path = _path(dataset_id, PENDING_EXT)
+    try:
+        with open(path) as f:
+            marker = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if alive(marker.get("pid")): return marker
+    _remove(path)
+    return None
+
+
+def _refresh() -> tuple:
+    """DATA_DIR에서 다른 워커가 추가/삭제한 데이터셋을 반영하고
+    ([(mtime, dataset_id, bytes), ...], 다른 워커가 저장 중인 버전의 부모 set)를 리턴(_exclusive() 안에서 호출)
+    """
+    files, pins, hidden, metas = [], set(), set(), {}
+    # 디렉토리 검사와 파일 읽기는 _lock 밖에서
+    for entry in os.scandir(DATA_DIR):
+        dataset_id, ext = os.path.splitext(entry.name)
+        if ext in (ARROW_EXT, PICKLE_EXT):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError: # 다른 워커가 방금 삭제한 파일
+                continue
+            files.append((stat.st_mtime, dataset_id, stat.st_size))
+            if dataset_id not in _meta:
+                try:
+                    metas[dataset_id] = _read_meta(entry.path)
+                except (OSError, pa.ArrowInvalid):
+                    metas[dataset_id] = {}
+        elif ext == HIDDEN_EXT:
+            hidden.add(dataset_id)
+        elif ext == PENDING_EXT and dataset_id not in _pending:
+            marker = _marker(dataset_id)
+            if marker and marker.get("parent"): pins.add(marker["parent"])
+    present = {dataset_id for _, dataset_id, _ in files}
+    with _lock:
+        for dataset_id, meta in metas.items():
+            if dataset_id not in _meta: _link(dataset_id, meta)
+        _hidden.clear()
+        _hidden.update(hidden)
+        # 다른 워커가 삭제한 데이터셋(메모리에 남은 것도 삭제)
+        gone = [i for i in _meta if i not in present and i not in _pending]
+    for dataset_id in gone: _drop(dataset_id)
+    return files, pins
+
+
+# 재시작해도 디스크에 남아 있는 데이터셋은 파싱 없이 그대로 사용
+with _exclusive():
+    _refresh()
+
+
+def new_path() -> str:
+    """디스크에 저장할 임시 Arrow 파일 경로(register_file로 등록하기 전까지는 저장소가 관리하지 않음)"""
+    return os.path.join(DATA_DIR, f"{uuid.uuid4().hex}.part")
+
+
+def _own(meta: dict) -> list:
+    # 버전이 부모와 공유하지 않는 컬럼
+    return [col for col, src in meta["columns"] if src is None]
+
+
+def _nbytes(df: pd.DataFrame, meta: dict = {}) -> int:
+    # 버전은 부모와 공유하지 않는 컬럼만 계산
+    if "columns" not in meta: return int(df.memory_usage(deep=True).sum())
+    return int(sum(df[col].memory_usage(deep=True, index=False) for col in _own(meta)))
+
+
+def _cache(dataset_id: str, df: pd.DataFrame, nbytes: int):
+    """메모리 계층에 추가하고 예산을 넘은 만큼 오래된 것부터 내림(_lock 안에서 호출)"""
+    global _memory_bytes
+    if nbytes > MEMORY_BUDGET: return
+    _memory[dataset_id] = (df, nbytes)
+    _memory_bytes += nbytes
+    while _memory_bytes > MEMORY_BUDGET:
+        # 디스크에 파일이 있으므로 메모리에서만 내린다.
+        _memory_bytes -= _memory.popitem(last=False)[1][1]
+
+
+def _enforce(keep: str = None):
+    """DATA_DIR 전체(모든 워커의 파일) 크기가 디스크 예산을 넘은 만큼 mtime이 오래된 파일부터 삭제하고
+    버전이 더 이상 공유하지 않는 remove()된 부모를 삭제(_exclusive() 안에서 호출)
+    """
+    files, pins = _refresh()
+    total = sum(size for _, _, size in files)
+    for _, dataset_id, size in sorted(files):
+        if total <= DISK_BUDGET: break
+        # 컬럼을 공유하는 버전이 남아 있는(저장 중인 것 포함) 데이터셋은 삭제하지 않는다.
+        with _lock:
+            if dataset_id == keep or _children.get(dataset_id) or dataset_id in pins: continue
+        _drop(dataset_id)
+        total -= size
+    _collect(pins)
+
+
+def _collect(pins: set):
+    # 공유하는 버전이 모두 삭제된 remove()된 부모를 삭제(_exclusive() 안에서 호출)
+    while True:
+        with _lock:
+            orphans = [i for i in _hidden if not _children.get(i) and i not in pins]
+        if not orphans: break
+        for dataset_id in orphans: _drop(dataset_id)
+
+
+def _delete(dataset_id: str):
+    for ext in (ARROW_EXT, PICKLE_EXT, HIDDEN_EXT, PENDING_EXT):
+        _remove(_path(dataset_id, ext))
+
+
+def _release(dataset_id: str):
+    """버전과 부모의 컬럼 공유를 끊음(remove()된 부모는 다음 _enforce()에서 삭제, _lock 안에서 호출)"""
+    meta = _meta.get(dataset_id, {})
+    if "columns" not in meta: return
+    _meta[dataset_id] = {k: v for k, v in meta.items() if k != "columns"}
+    parent   = meta["parent"]
+    children = _children.get(parent, set())
+    children.discard(dataset_id)
+    if not children: _children.pop(parent, None)
+
+
+def _forget(dataset_id: str):
+    """메모리, 디스크 모두에서 삭제된 데이터셋의 정보 삭제(파일은 삭제하지 않음, _lock 안에서 호출)"""
+    global _memory_bytes
+    if dataset_id in _memory: _memory_bytes -= _memory.pop(dataset_id)[1]
+    _pending.pop(dataset_id, None)
+    _hidden.discard(dataset_id)
+    _schemas.pop(dataset_id, None)
+    _release(dataset_id)
+    _meta.pop(dataset_id, None)
+
+
+def _drop(dataset_id: str):
+    """데이터셋을 메모리, 디스크에서 모두 삭제(파일 삭제는 _lock 밖에서, _exclusive() 안에서 호출)"""
+    with _lock:
+        _forget(dataset_id)
+    _delete(dataset_id)
+
+
+def _persist(dataset_id: str, df: pd.DataFrame):
+    """DataFrame을 디스크에 저장(Arrow로 변환할 수 없는 컬럼이 있으면 pickle)
+
+    버전은 부모와 공유하지 않는 컬럼만 저장하고(인덱스는 부모의 인덱스) 버전 정보를 스키마 메타데이터에 기록
+    """
+    with _lock:
+        meta = _meta.get(dataset_id, {})
+    try:
+        try:
+            if "columns" in meta: table = pa.Table.from_pandas(pd.DataFrame({col: df[col].array for col in _own(meta)}, copy=False), preserve_index=False)
+            else                : table = pa.Table.from_pandas(df)
+            if meta:
+                table = table.replace_schema_metadata({**(table.schema.metadata or {}), META_KEY: json.dumps(meta).encode()})
+            tmp = _path(dataset_id, ".part")
+            with pa.ipc.new_file(tmp, table.schema) as writer:
+                writer.write_table(table)
+            path = _path(dataset_id)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            tmp = _path(dataset_id, ".part")
+            df.to_pickle(tmp, compression=None)
+            path = _path(dataset_id, PICKLE_EXT)
+            # pickle은 전체 컬럼을 저장하므로 더 이상 부모와 공유하지 않음
+            with _lock:
+                _release(dataset_id)
+        # 다 쓴 다음 이름을 바꾸기 때문에 다른 요청이 덜 쓴 파일을 읽지 않는다.
+        with _exclusive():
+            os.replace(tmp, path)
+            marker = _path(dataset_id, PENDING_EXT)
+            with _lock:
+                removed = _pending.pop(dataset_id, None) is None
+            if removed or not os.path.exists(marker):
+                # 저장하는 동안 (다른 워커에서) remove()된 데이터셋
+                _drop(dataset_id)
+                return
+            os.remove(marker)
+            _enforce(dataset_id)
+    except:
+        with _lock:
+            _pending.pop(dataset_id, None)
+        _remove(_path(dataset_id, PENDING_EXT))
+        raise
+
+
+def _buffer(s: pd.Series) -> tuple or None:
+    # 컬럼 배열의 메모리 위치(같으면 복사하지 않고 공유하는 컬럼)
+    if   isinstance(s.dtype, pd.CategoricalDtype): arr = s.cat.codes.to_numpy()
+    elif isinstance(s.dtype, np.dtype)           : arr = s.to_numpy(copy=False)
+    else                                         : return None
+    i = arr.__array_interface__
+    return i["data"][0], i["shape"], i["strides"], i["typestr"]
+
+
+def _version(df: pd.DataFrame, parent_id: str, op: str or None) -> dict:
+    """파생 DataFrame의 버전 정보. 부모와 인덱스가 같고 컬럼 배열을 공유하면 "columns"를 추가"""
+    meta   = {"parent": parent_id, "op": op}
+    # 메모리에 없는 부모(청크 단위로 읽은 경우 등)는 공유하는 배열이 없다.
+    parent = _peek(parent_id)
+    if parent is None or not len(df): return meta
+    # Arrow 파일에 같은 이름으로 저장할 수 있는 컬럼명만(중복 X, 문자열)
+    for frame in (df, parent):
+        if not frame.columns.is_unique or not all(isinstance(i, str) for i in frame.columns): return meta
+    if df.index.names != parent.index.names or not (df.index is parent.index or df.index.equals(parent.index)): return meta
+
+    buffers = {}
+    for col in parent.columns:
+        key = _buffer(parent[col])
+        if key is not None: buffers.setdefault(key, col)
+    columns = []
+    for col in df.columns:
+        src = buffers.get(_buffer(df[col]))
+        if src is not None and df[col].dtype != parent[src].dtype: src = None
+        columns.append([col, src])
+    if any(src is not None for _, src in columns): meta["columns"] = columns
+    return meta
+
+
+def register(df: pd.DataFrame, parent: str = None, op: str = None) -> str:
+    """DataFrame을 서버 측 저장소에 등록하고 dataset_id를 리턴
+
+    등록된 DataFrame은 변경하지 않는다.(파생 DataFrame은 새 id로 등록)
+    메모리에 유지하면서 백그라운드에서 디스크에 저장하기 때문에
+    메모리에서 내려가거나 서버를 재시작해도 다시 파싱하지 않고 memory map으로 읽는다.
+
+    parent(입력 dataset_id)가 있으면 버전으로 등록(versions()로 이전 버전을 찾을 수 있음)
+    부모의 컬럼 배열을 그대로 사용하는 컬럼은 메모리, 디스크 모두 부모와 공유한다.
+    """
+    dataset_id = uuid.uuid4().hex
+    meta = _version(df, parent, op) if parent else {}
+    with _exclusive():
+        if "columns" in meta and (_is_hidden(parent) or not (parent in _pending or _find(parent))):
+            meta.pop("columns") # 그 사이에 (다른 워커에서) 삭제된 부모
+        # 저장이 끝날 때까지 다른 워커가 기다리고, 공유하는 부모를 삭제하지 않도록 표시
+        write_file(_path(dataset_id, PENDING_EXT), json.dumps({"pid": os.getpid(), "parent": parent if "columns" in meta else None}))
+        with _lock:
+            _link(dataset_id, meta)
+            _pending[dataset_id] = df
+    _writer.submit(_persist, dataset_id, df)
+    # deep 크기 계산(object 컬럼은 행 수에 비례)은 잠금 밖에서
+    nbytes = _nbytes(df, meta)
+    with _lock:
+        # 그 사이에 remove()된 데이터셋은 메모리에 올리지 않는다.
+        if dataset_id in _meta and dataset_id not in _memory: _cache(dataset_id, df, nbytes)
+    return dataset_id
+
+
+def register_file(path: str) -> str:
+    """디스크의 Arrow 파일을 저장소에 등록하고 dataset_id를 리턴(파일은 저장소가 관리)"""
+    dataset_id = uuid.uuid4().hex
+    with _exclusive():
+        os.replace(path, _path(dataset_id))
+        _enforce(dataset_id)
+    return dataset_id
+
+
+def _assemble(parent: pd.DataFrame, own: pd.DataFrame, columns: list) -> pd.DataFrame:
+    # 부모의 컬럼 배열과 인덱스를 복사하지 않고 버전을 만든다.
+    return pd.DataFrame(
+        {col: (own[col] if src is None else parent[src]).array for col, src in columns},
+        index   = parent.index,
+        columns = [col for col, _ in columns],
+        copy    = False,
+    )
+
+
+def _load(path: str) -> tuple:
+    """파일의 (DataFrame, 버전 정보). 버전은 부모를 먼저 읽어서 공유하는 컬럼을 합친다."""
+    if path.endswith(PICKLE_EXT): return pd.read_pickle(path, compression=None), {}
+    table = _open(path).read_all()
+    meta  = json.loads((table.schema.metadata or {}).get(META_KEY, b"{}"))
+    # 결측치 없는 숫자 컬럼은 memory map을 그대로 사용(복사 없음, 읽기 전용)
+    df    = table.to_pandas(split_blocks=True)
+    if "columns" not in meta: return df, meta
+    parent = _fetch(meta["parent"])
+    if parent is None: raise FileNotFoundError(meta["parent"])
+    return _assemble(parent, df, meta["columns"]), meta
+
+
+def _peek(dataset_id: str) -> pd.DataFrame or None:
+    """메모리에 있는 DataFrame(없으면 None, LRU 순서는 바꾸지 않음)"""
+    with _lock:
+        if dataset_id in _memory: return _memory[dataset_id][0]
+        return _pending.get(dataset_id)
+
+
+def _touch(dataset_id: str) -> bool:
+    """디스크에 파일이 있는지 확인하고 TOUCH_INTERVAL초 넘게 지났으면 mtime 갱신(모든 워커가 같은 LRU 순서 사용)"""
+    path = _find(dataset_id)
+    if path is None: return False
+    try:
+        if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL: os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _wait(dataset_id: str) -> str or None:
+    """데이터셋 파일 경로(다른 워커가 저장 중이면 파일이 생길 때까지 최대 PENDING_TIMEOUT초 기다림)"""
+    deadline = time.monotonic() + PENDING_TIMEOUT
+    while True:
+        path = _find(dataset_id)
+        if path is not None or time.monotonic() > deadline: return path
+        # 저장이 끝나면 파일을 먼저 만들고 표시를 지우므로 표시가 없어진 뒤 한 번 더 확인
+        if _marker(dataset_id) is None: return _find(dataset_id)
+        time.sleep(0.05)
+
+
+def saving(dataset_id: str) -> bool:
+    """다른 워커가 dataset_id를 저장하는 중인지(get()은 저장이 끝날 때까지 기다림)"""
+    with _lock:
+        if dataset_id in _pending or dataset_id in _memory: return False
+    return _find(dataset_id) is None and _marker(dataset_id) is not None
+
+
+def _fetch(dataset_id: str) -> pd.DataFrame or None:
+    # remove()된 데이터셋도 읽음(버전이 공유하는 부모)
+    with _lock:
+        if dataset_id in _pending:
+            return _pending[dataset_id]
+        if dataset_id in _memory:
+            if _touch(dataset_id):
+                _memory.move_to_end(dataset_id)
+                return _memory[dataset_id][0]
+            # 다른 워커가 삭제한 데이터셋(파일은 이미 없음)
+            _forget(dataset_id)
+            return None
+
+    path = _wait(dataset_id)
+    if path is None: return None
+    try:
+        df, meta = _load(path)
+    except FileNotFoundError: # 읽기 직전에 디스크 예산 때문에 삭제된 경우
+        return None
+    _touch(dataset_id)
+    with _lock:
+        if dataset_id not in _meta:
+            # 다른 워커가 저장한 파일
+            _link(dataset_id, meta)
+        meta = _meta.get(dataset_id, meta)
+    nbytes = _nbytes(df, meta)
+    with _lock:
+        if dataset_id in _meta and dataset_id not in _memory: _cache(dataset_id, df, nbytes)
+    return df
+
+
+def _is_hidden(dataset_id: str) -> bool:
+    # remove()된 데이터셋(다른 워커에서 remove()한 것 포함)
+    return dataset_id in _hidden or os.path.exists(_path(dataset_id, HIDDEN_EXT))
+
+
+def get(dataset_id: str) -> pd.DataFrame or None:
+    with _lock:
+        if _is_hidden(dataset_id): return None
+    return _fetch(dataset_id)
+
+
+def remove(dataset_id: str) -> bool:
+    """데이터셋 삭제. 컬럼을 공유하는 버전이 남아 있으면 접근만 막고 파일은 버전이 모두 삭제될 때 삭제"""
+    global _memory_bytes
+    with _exclusive():
+        _, pins = _refresh()
+        if _is_hidden(dataset_id): return False
+        found = dataset_id in _pending or _find(dataset_id) is not None or _marker(dataset_id) is not None
+        if not found: return False
+        with _lock:
+            shared = bool(_children.get(dataset_id)) or dataset_id in pins
+        if not shared:
+            # 다른 워커가 저장 중이면 .pending 표시를 지워서 저장이 끝날 때 삭제하도록 한다.
+            _drop(dataset_id)
+            _collect(pins)
+            return True
+        with _lock:
+            _hidden.add(dataset_id)
+            if dataset_id in _memory: _memory_bytes -= _memory.pop(dataset_id)[1]
+            _schemas.pop(dataset_id, None)
+        # 재시작해도, 다른 워커에서도 삭제된 상태 유지
+        open(_path(dataset_id, HIDDEN_EXT), "w").close()
+    return True
+
+
+def exists(dataset_id: str) -> bool:
+    with _lock:
+        if _is_hidden(dataset_id): return False
+        if dataset_id in _pending: return True
+    return _find(dataset_id) is not None or _marker(dataset_id) is not None
+
+
+def _table(dataset_id: str, columns: list = None) -> pa.Table:
+    # Arrow 파일의 컬럼(인덱스 제외). 버전은 부모 파일의 컬럼을 합친다.(memory map, 복사 없음)
+    path = _find(dataset_id)
+    if path is None or not path.endswith(ARROW_EXT): raise FileNotFoundError(dataset_id)
+    table    = _open(path).read_all()
+    metadata = table.schema.metadata or {}
+    meta     = json.loads(metadata.get(META_KEY, b"{}"))
+    if "columns" in meta:
+        mapping = dict(meta["columns"])
+        columns = columns or list(mapping)
+        parent  = _table(meta["parent"], [mapping[i] for i in columns if mapping[i] is not None])
+        return pa.table([table.column(i) if mapping[i] is None else parent.column(mapping[i]) for i in columns], names=columns)
+    index   = [i for i in json.loads(metadata.get(b"pandas", b"{}")).get("index_columns", []) if isinstance(i, str)]
+    columns = columns or [i for i in table.column_names if i not in index]
+    return table.select(columns).replace_schema_metadata(None)
+
+
+def scan(dataset_id: str) -> pa.Table or None:
+    """디스크에만 있는 데이터셋의 Arrow 테이블(memory map, 변환 없음, 인덱스 제외)
+
+    필요한 행만 잘라서 to_pandas() 하면 데이터셋 전체를 메모리에 올리지 않고 처리할 수 있다.(functions/chunked.py)
+    메모리에 있거나 pickle로 저장된 데이터셋은 None(get() 사용)
+    """
+    with _lock:
+        if _is_hidden(dataset_id): return None
+    if _peek(dataset_id) is not None: return None
+    try:
+        return _table(dataset_id)
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+
+
+def _meta_of(dataset_id: str) -> dict:
+    # 버전 정보(다른 프로세스가 저장한 파일은 파일에서 읽음)
+    with _lock:
+        meta = _meta.get(dataset_id)
+    if meta is not None: return meta
+    path = _find(dataset_id)
+    try:
+        return _read_meta(path) if path else {}
+    except (OSError, pa.ArrowInvalid):
+        return {}
+
+
+def versions(dataset_id: str) -> list:
+    """dataset_id부터 원본까지의 버전 [{"dataset_id", "op", "shared"}, ...](삭제된 버전에서 멈춤)
+
+    shared는 부모와 공유하는 컬럼 수(0이면 모든 컬럼을 새로 저장한 버전)
+    """
+    result = []
+    while dataset_id and exists(dataset_id):
+        meta   = _meta_of(dataset_id)
+        shared = sum(src is not None for _, src in meta.get("columns", []))
+        result.append({"dataset_id": dataset_id, "op": meta.get("op"), "shared": shared})
+        dataset_id = meta.get("parent")
+    return result
+
+
+def _ref_path(key: str) -> str:
+    return os.path.join(DATA_DIR, f"{hashlib.sha256(key.encode()).hexdigest()}.ref")
+
+
+def alias(key: str, dataset_id: str):
+    """key(예: 업로드 파일의 해시)로 dataset_id를 다시 찾을 수 있도록 디스크에 기록(재시작해도 유지)"""
+    write_file(_ref_path(key), dataset_id)
+
+
+def lookup(key: str) -> str or None:
+    """alias()로 기록한 dataset_id(데이터셋이 삭제됐으면 None)"""
+    try:
+        with open(_ref_path(key)) as f:
+            dataset_id = f.read()
+    except FileNotFoundError:
+        return None
+    if exists(dataset_id): return dataset_id
+    _remove(_ref_path(key))
+    return None
+
+
+def stats() -> dict:
+    """메모리(이 워커)/디스크(모든 워커) 계층의 데이터셋 수와 크기(bytes)"""
+    files = []
+    for entry in os.scandir(DATA_DIR):
+        if os.path.splitext(entry.name)[1] not in (ARROW_EXT, PICKLE_EXT): continue
+        try:
+            files.append(entry.stat().st_size)
+        except FileNotFoundError:
+            pass
+    with _lock:
+        return {
+            "memory": {"datasets": len(_memory), "bytes": _memory_bytes, "budget": MEMORY_BUDGET},
+            "disk"  : {"datasets": len(files),   "bytes": sum(files),    "budget": DISK_BUDGET},
+        }
+
+
+def _schema_of(df: pd.DataFrame) -> dict:
+    dtypes, datetime, categories = {}, [], {}
+    for col, dtype in df.dtypes.items():
+        col = str(col)
+        if   str(dtype).startswith("datetime64"): datetime.append(col)
+        elif str(dtype) == "category"           : categories[col] = df[col].cat.categories.tolist()
+        else                                    : dtypes[col] = str(dtype)
+    return {"columns": [str(i) for i in df.columns], "dtypes": dtypes, "datetime": datetime, "categories": categories}
+
+
+def _schema_of_file(path: str) -> dict:
+    # 데이터를 변환하지 않고 Arrow 스키마와 배치별 결측치 수만으로 to_pandas() 결과의 dtype을 계산
+    reader = _open(path)
+    schema = _schema_of(reader.schema.empty_table().to_pandas())
+    for j, field in enumerate(reader.schema):
+        if field.name not in schema["dtypes"]: continue # 인덱스 컬럼
+        if pa.types.is_integer(field.type) or pa.types.is_boolean(field.type):
+            if any(reader.get_batch(i).column(j).null_count for i in range(reader.num_record_batches)):
+                schema["dtypes"][field.name] = "float64" if pa.types.is_integer(field.type) else "object"
+    return schema
+
+
+def schema(dataset_id: str) -> dict or None:
+    """데이터셋의 스키마 {"columns", "dtypes", "datetime", "categories"}
+
+    본문으로 데이터를 보낼 때 ?schema_id=dataset_id 를 같이 보내면
+    pandas.read_json의 타입 추론과 날짜 추정을 건너뛰고 이 스키마대로 읽는다.
+    """
+    with _lock:
+        cached = _schemas.get(dataset_id)
+    if cached is not None: return cached
+
+    df = _peek(dataset_id)
+    if df is None and "columns" in _meta_of(dataset_id): df = _fetch(dataset_id)
+    if df is not None:
+        cached = _schema_of(df)
+    else:
+        path = _wait(dataset_id)
+        if path is None: return None
+        cached = _schema_of(_load(path)[0]) if path.endswith(PICKLE_EXT) else _schema_of_file(path)
+    with _lock:
+        _schemas[dataset_id] = cached
+    return cached
+
+
+def handle(dataset_id: str) -> dict or None:
+    """클라이언트에 돌려줄 데이터셋 정보(데이터 본문 대신 사용, 없으면 None)
+
+    디스크에 있는 데이터셋은 파일의 스키마만 읽는다.(다른 워커가 저장 중이면 최대 PENDING_TIMEOUT초 기다리므로 스레드에서 호출)
+    schema는 본문으로 데이터를 보낼 때 schema_id로 다시 사용할 수 있다.
+    """
+    df = _peek(dataset_id)
+    if df is None and "columns" in _meta_of(dataset_id): df = _fetch(dataset_id)
+    if df is None:
+        path = _wait(dataset_id)
+        # 삭제, 디스크 예산 초과로 정리, 저장하던 워커가 종료된 데이터셋
+        if path is None: return None
+        df   = _load(path)[0] if path.endswith(PICKLE_EXT) else None
+    if df is None:
+        reader  = _open(path)
+        # 인덱스 컬럼은 제외(pandas 메타데이터가 있으면 빈 테이블 변환으로 확인)
+        columns = [str(i) for i in reader.schema.empty_table().to_pandas().columns]
+        shape   = [sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches)), len(columns)]
+    else:
+        shape   = list(df.shape)
+        columns = [str(i) for i in df.columns]
+    return {
+        "dataset_id": dataset_id,
+        "shape"     : shape,
+        "columns"   : columns,
+        "schema"    : schema(dataset_id),
+    }
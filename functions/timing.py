@@ -0,0 +1,148 @@
+"""요청 처리 단계별 시간(Server-Timing 헤더, 브라우저 개발자 도구의 Timing 탭에서 확인)
+
+- body     : 요청 본문 수신
+- cache    : 결과 캐시 키 계산(본문 해시, functions/memo.py)
+- queue    : 연산 스레드 풀 대기
+- load     : 저장된 데이터셋 읽기(dataset_id)
+- json     : item.json()
+- parse    : pd.read_json / Arrow 본문 변환
+- compute  : 기능의 연산(다른 단계를 뺀 시간)
+- serialize: to_json / Arrow 직렬화
+- store    : 결과 데이터셋 등록(dataset_id로 받은 경우)
+- log      : func_log, /metrics 기록
+- total    : 응답 헤더를 보낼 때까지 전체 시간
+
+TRACE_FILE을 지정하면 요청마다 단계별 시간을 JSON 한 줄씩 추가로 기록한다.
+(이벤트 루프는 큐에 넣기만 하고 파일은 백그라운드 스레드가 쓴다.)
+"""
+import os, sys, json, time, queue, datetime, threading, contextlib, contextvars
+import logging, logging.handlers
+from starlette.datastructures import MutableHeaders
+
+# 단계별 시간을 기록할 파일(없으면 헤더만)
+TRACE_FILE = os.getenv("TRACE_FILE")
+
+logger = logging.getLogger(__name__)
+# TRACE_FILE에 한 줄씩 기록하는 logger(다른 로그와 섞이지 않도록 상위 logger로 전달하지 않음)
+_trace_logger = logging.getLogger(f"{__name__}.trace")
+_trace_logger.propagate = False
+_trace_logger.setLevel(logging.INFO)
+
+# 처리 중인 요청의 [(단계, 초), ...](연산 스레드에도 같은 리스트가 전달된다.)
+_spans  = contextvars.ContextVar("spans", default=None)
+_lock   = threading.Lock()
+_writer = None # (pid, QueueListener)
+
+
+def mark() -> int:
+    """지금까지 기록된 단계 수(add의 since)"""
+    spans = _spans.get()
+    return len(spans) if spans is not None else 0
+
+
+def add(name: str, seconds: float, since: int = None):
+    """단계 시간을 기록(since가 있으면 그 뒤에 기록된 단계의 시간을 뺀 시간)"""
+    spans = _spans.get()
+    if spans is None: return
+    if since is not None: seconds -= sum(i[1] for i in spans[since:])
+    spans.append((name, max(seconds, 0.0)))
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """with 블록의 시간을 name 단계로 기록"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - start)
+
+
+def header(spans: list, total: float) -> str:
+    """Server-Timing 헤더 값(같은 단계는 합침, ms)"""
+    durations = {}
+    for name, seconds in spans: durations[name] = durations.get(name, 0.0) + seconds
+    durations["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in durations.items())
+
+
+class _TraceHandler(logging.FileHandler):
+    def emit(self, record):
+        # 파일을 열 때의 에러는 FileHandler가 처리하지 않아서 기록 스레드가 멈춘다.
+        try:
+            super().emit(record)
+        except OSError:
+            self.handleError(record)
+
+    def handleError(self, record):
+        # 기록 스레드에서 발생한 에러(디스크 가득 참 등), 요청은 계속 처리
+        logger.warning("timing: could not write %s. %s", self.baseFilename, sys.exc_info()[1])
+
+
+def _start():
+    """TRACE_FILE 기록 스레드 시작(이미 시작했으면 무시)"""
+    global _writer
+    # fork된 워커에는 스레드가 없으므로 pid로 확인(functions/logs.py와 같음)
+    if _writer is not None and _writer[0] == os.getpid(): return
+    with _lock:
+        if _writer is not None and _writer[0] == os.getpid(): return
+        records  = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(records, _TraceHandler(TRACE_FILE, delay=True))
+        listener.start()
+        _trace_logger.handlers = [logging.handlers.QueueHandler(records)]
+        _writer = (os.getpid(), listener)
+
+
+def close():
+    """큐에 남은 기록을 쓰고 기록 스레드 종료(서버 종료)"""
+    global _writer
+    with _lock:
+        if _writer is None or _writer[0] != os.getpid(): return
+        _writer[1].stop()
+        for handler in _writer[1].handlers: handler.close()
+        _trace_logger.handlers = []
+        _writer = None
+
+
+def _trace(scope, status: int, spans: list, total: float):
+    durations = {}
+    for name, seconds in spans: durations[name] = round(durations.get(name, 0.0) + seconds * 1000, 3)
+    line = json.dumps({
+        "time"  : datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+        "pid"   : os.getpid(),
+        "method": scope["method"],
+        "path"  : scope["path"],
+        "query" : scope.get("query_string", b"").decode("latin-1"),
+        "status": status,
+        "total" : round(total * 1000, 3),
+        "spans" : durations,
+    })
+    _start()
+    _trace_logger.info(line)
+
+
+class ServerTimingMiddleware:
+    """응답에 Server-Timing 헤더 추가(ASGI 미들웨어, 압축 시간도 포함되도록 가장 바깥에 추가)"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        spans = []
+        token = _spans.set(spans)
+        start = time.perf_counter()
+
+        async def timing_send(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - start
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append("Server-Timing", header(spans, total))
+                if TRACE_FILE: _trace(scope, message["status"], spans, total)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timing_send)
+        finally:
+            _spans.reset(token)
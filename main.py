@@ -1,5 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from functions.compression import CompressionMiddleware
+from functions.timing import ServerTimingMiddleware
 
 app = FastAPI()
 
@@ -18,8 +20,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/zstd 요청 본문 해제, Accept-Encoding에 따른 응답 압축
+app.add_middleware(CompressionMiddleware)
+
+# 처리 단계별 시간을 Server-Timing 헤더로(압축 시간도 포함되도록 마지막에 추가 = 가장 바깥)
+app.add_middleware(ServerTimingMiddleware)
+
+# func_log 기록(functions/logs.py): 시작할 때 종료된 워커가 남긴 기록부터 쓰고, 종료할 때 남은 기록을 쓴다.
+from functions import logs
+app.add_event_handler("startup",  logs.start)
+app.add_event_handler("shutdown", logs.close)
+
+# TRACE_FILE에 남은 단계별 시간 기록(functions/timing.py)
+from functions import timing
+app.add_event_handler("shutdown", timing.close)
+
 from functions import (
     create_upload_file,
+    upload_progress,
+
+    get_dataset,
+    delete_dataset,
+    dataset_versions,
+    undo_dataset,
+    get_job,
+    get_profile,
+    get_metrics,
 
     head,
     tail,
@@ -46,6 +72,8 @@ from functions import (
     set_column,
     astype,
 
+    pipeline,
+
     feature_target_split,
     train_test_split,
 )
@@ -58,6 +86,14 @@ from visualization import (
     )
 
 create_upload_file = app.post("/uploadfile")               (create_upload_file)
+upload_progress    = app.get("/uploadfile/progress/{upload_id}")(upload_progress)
+get_dataset        = app.get("/dataset/{dataset_id}")      (get_dataset)
+delete_dataset     = app.delete("/dataset/{dataset_id}")   (delete_dataset)
+dataset_versions   = app.get("/dataset/{dataset_id}/versions")(dataset_versions)
+undo_dataset       = app.post("/dataset/{dataset_id}/undo")(undo_dataset)
+get_job            = app.get("/jobs/{job_id}")             (get_job)
+get_profile        = app.get("/profiles/{profile_id}")     (get_profile)
+get_metrics        = app.get("/metrics")                   (get_metrics)
 head               = app.post("/dataframe/head")           (head)
 tail               = app.post("/dataframe/tail")           (tail)
 shape              = app.post("/dataframe/shape")          (shape)
@@ -84,6 +120,8 @@ concat             = app.post("/dataframe/concat")         (concat)
 set_column         = app.post("/dataframe/set_column")     (set_column)
 astype             = app.post("/dataframe/astype")         (astype)
 
+pipeline           = app.post("/dataframe/pipeline")       (pipeline)
+
 feature_target_split = app.post("/dataframe/feature_target_split")(feature_target_split)
 train_test_split     = app.post("/dataframe/train_test_split")    (train_test_split)
 
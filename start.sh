@@ -1,2 +1,6 @@
 #/bin/sh
-uvicorn main:app --host=0.0.0.0 --port=${PORT:-5000}
+# 워커 수(기본값 CPU 코어 수). 워커들은 DATA_DIR의 데이터셋 파일을 memory map으로 공유하고
+# 워커마다 연산 스레드(COMPUTE_WORKERS)는 코어 수를 워커 수로 나눈 만큼 사용
+# MEMORY_BUDGET, COMPUTE_BUDGET은 워커마다 적용(전체 메모리는 워커 수만큼 곱해서 계산), DISK_BUDGET은 모든 워커 합계
+export WEB_CONCURRENCY=${WEB_CONCURRENCY:-$(nproc)}
+uvicorn main:app --host=0.0.0.0 --port=${PORT:-5000} --workers=${WEB_CONCURRENCY}
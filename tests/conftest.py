@@ -0,0 +1,6 @@
+import os, sys, tempfile
+
+# 서버 설정 없이 functions를 import할 수 있도록(데이터셋, 스풀 파일은 임시 경로에)
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="ml-funcs-test-"))
+os.environ.setdefault("SECRET_KEY", "test-secret-key-for-the-test-suite")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,117 @@
+"""연산 메모리 예산(functions/admission.py): 413/503 응답, 작업의 대기, 예약 반납, merge 결과 행 수 추정"""
+import os, time, threading
+import jwt
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+from functions import admission, jobs, store
+
+H = {"token": jwt.encode({"u": 1}, os.environ["SECRET_KEY"], algorithm="HS256")}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def dataset_id():
+    dataset_id = store.register(pd.DataFrame({"a": np.arange(100), "b": np.arange(100) * 2}))
+    yield dataset_id
+    store.remove(dataset_id)
+
+
+def test_larger_than_budget_is_413(client, dataset_id, monkeypatch):
+    monkeypatch.setattr(admission, "COMPUTE_BUDGET", 100)
+    rejected = admission.stats()["rejected"]
+    r = client.post(f"/dataframe/transpose?dataset_id={dataset_id}", headers=H)
+    assert r.status_code == 413, r.text
+    assert "transpose" in r.json()["detail"]
+    assert admission.stats()["rejected"] == rejected + 1
+
+
+def test_busy_is_503_with_retry_after(client, dataset_id, monkeypatch):
+    monkeypatch.setattr(admission, "COMPUTE_BUDGET", 10 * 2**20)
+    monkeypatch.setattr(admission, "ADMISSION_WAIT", 0.2)
+    with admission.reserve("holder", admission.COMPUTE_BUDGET):
+        r = client.post(f"/dataframe/transpose?dataset_id={dataset_id}", headers=H)
+    assert r.status_code == 503, r.text
+    assert r.headers["retry-after"] == str(admission.RETRY_AFTER)
+    # 반납한 뒤에는 실행된다.
+    r = client.post(f"/dataframe/transpose?dataset_id={dataset_id}", headers=H)
+    assert r.status_code == 200, r.text
+
+
+def test_waits_until_released(monkeypatch):
+    monkeypatch.setattr(admission, "COMPUTE_BUDGET", 1000)
+    monkeypatch.setattr(admission, "ADMISSION_WAIT", 5)
+    admitted = threading.Event()
+
+    def waiter():
+        with admission.reserve("waiter", 600): admitted.set()
+
+    with admission.reserve("holder", 600):
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        assert not admitted.wait(0.2)
+    assert admitted.wait(2)
+    thread.join()
+
+
+def test_job_waits_without_deadline(monkeypatch):
+    monkeypatch.setattr(admission, "COMPUTE_BUDGET", 1000)
+    monkeypatch.setattr(admission, "ADMISSION_WAIT", 0)
+    result = []
+
+    def job():
+        jobs._current.set(jobs._Job("waiter"))
+        try:
+            with admission.reserve("waiter", 600): result.append("admitted")
+        except HTTPException as e:
+            result.append(e.status_code)
+
+    with admission.reserve("holder", 600):
+        thread = threading.Thread(target=job)
+        thread.start()
+        time.sleep(0.7) # ADMISSION_WAIT(0초)보다 오래, 대기 주기(0.5초)보다 오래
+        assert result == []
+    thread.join(2)
+    assert result == ["admitted"]
+
+    # 작업이 아니면 바로 503
+    with admission.reserve("holder", 600):
+        with pytest.raises(HTTPException) as e:
+            with admission.reserve("request", 600): pass
+    assert e.value.status_code == 503
+
+
+def test_reservation_is_released_when_body_raises():
+    before = admission._reserved
+    with pytest.raises(ValueError):
+        with admission.reserve("fails", 1000):
+            assert admission._reserved == before + 1000
+            raise ValueError("boom")
+    assert admission._reserved == before
+
+
+LEFT  = pd.DataFrame({"k": [1, 1, 2, 3, np.nan, 5], "k2": list("aabbcc"), "x": range(6)})
+RIGHT = pd.DataFrame({"k": [1, 2, 2, 4, np.nan, np.nan], "k2": list("abcabc"), "y": range(6)})
+
+
+@pytest.mark.parametrize("how", ["inner", "left", "right", "outer", "cross"])
+@pytest.mark.parametrize("keys", [
+    {"on": "k"},
+    {"on": ["k", "k2"]},
+    {"left_on": "x", "right_on": "y"},
+    {"left_on": ["k2"], "right_on": ["k2"]},
+    {"left_on": "x", "right_index": True},
+    {"left_index": True, "right_index": True},
+    {},  # 같은 이름의 컬럼(k, k2)
+])
+def test_merge_rows(how, keys):
+    if how == "cross": keys = {}
+    assert admission.merge_rows(LEFT, RIGHT, how, **keys) == len(LEFT.merge(RIGHT, how=how, **keys))
@@ -0,0 +1,96 @@
+"""협조적 연산 중단(functions/cancel.py): 중단된 연산이 예산과 저장소 잠금을 남기지 않는지 확인"""
+import asyncio, threading, time
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions import cancel, admission, store
+from functions import internal_func
+
+
+def _unlocked():
+    # 저장소의 워커 잠금, 디스크 잠금을 바로 잡을 수 있는지
+    for lock in (store._lock, store._disk):
+        assert lock.acquire(blocking=False)
+        lock.release()
+
+
+def test_checkpoint_outside_compute():
+    cancel.checkpoint()
+    assert not cancel.aborted()
+
+
+def test_abort_inside_reserve_releases_budget():
+    before = admission._reserved
+    token = cancel.Token()
+    with pytest.raises(cancel.Aborted):
+        with cancel.scope(token):
+            with admission.reserve("test", 1000):
+                assert admission._reserved == before + 1000
+                token.abort()
+                cancel.checkpoint()
+    assert admission._reserved == before
+
+
+def test_abort_while_waiting_for_budget(monkeypatch):
+    monkeypatch.setattr(admission, "COMPUTE_BUDGET", 1000)
+    monkeypatch.setattr(admission, "ADMISSION_WAIT", 30)
+    before = admission._reserved
+    token, errors = cancel.Token(), []
+
+    def waiter():
+        with cancel.scope(token):
+            try:
+                with admission.reserve("waiter", 800): pass
+            except BaseException as e:
+                errors.append(e)
+
+    with admission.reserve("holder", 800):
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.1)
+        token.abort()
+        thread.join(5)
+        assert not thread.is_alive()
+        assert admission._reserved == before + 800
+    assert admission._reserved == before
+    assert len(errors) == 1 and isinstance(errors[0], cancel.Aborted)
+
+
+def test_abort_during_register_keeps_store_consistent():
+    df = pd.DataFrame({"a": np.arange(100), "b": np.arange(100.0)})
+    token = cancel.Token()
+    token.abort()
+    # 저장소 bookkeeping에는 checkpoint가 없으므로 중단된 연산이 등록해도 끝까지 등록된다.
+    with cancel.scope(token):
+        dataset_id = store.register(df)
+    _unlocked()
+    pd.testing.assert_frame_equal(store.get(dataset_id), df)
+    store.remove(dataset_id)
+    _unlocked()
+
+
+def test_timeout_responds_and_thread_stops_at_checkpoint(monkeypatch):
+    monkeypatch.setattr(internal_func, "REQUEST_TIMEOUT", 0.2)
+    before = admission._reserved
+    steps = []
+
+    async def slow():
+        with admission.reserve("slow", 1000):
+            for i in range(20):
+                cancel.checkpoint()
+                steps.append(i)
+                time.sleep(0.05)
+        return True, "done"
+
+    async def main():
+        with pytest.raises(internal_func.Cancelled) as e:
+            await internal_func.compute(slow)
+        return e.value.status_code
+
+    assert asyncio.run(main()) == 504
+    # 스레드는 강제로 멈추지 않고 다음 checkpoint에서 멈춘다.
+    deadline = time.monotonic() + 5
+    while admission._reserved != before and time.monotonic() < deadline: time.sleep(0.02)
+    assert admission._reserved == before
+    assert len(steps) < 20
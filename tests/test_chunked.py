@@ -0,0 +1,89 @@
+"""청크 단위 groupby(functions/chunked.py)와 메모리에서 실행한 groupby의 결과가 같은지 확인"""
+import warnings
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from functions import chunked
+from functions.internal_func import FUNCTIONS
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # 그룹이 여러 청크에 나뉘도록
+    monkeypatch.setattr(chunked, "GROUPBY_CHUNKSIZE", 37)
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        "k1": rng.choice(["a", "b", "c", None], n),
+        "k2": rng.choice([1.0, 2.0, np.nan], n),
+        "i" : rng.integers(-100, 100, n),
+        "f" : rng.normal(size=n),
+        "g" : rng.normal(size=n),
+        "s" : rng.choice(["x", "y"], n),
+    })
+    df.loc[rng.random(n) < 0.1, "f"] = np.nan
+    # 한 행짜리 그룹(std는 NaN)
+    df.loc[n - 1, ["k1", "k2"]] = ["z", 9.0]
+    return df
+
+
+def _expected(df: pd.DataFrame, by: list, func: str, sort: bool, dropna: bool) -> pd.DataFrame:
+    # /dataframe/groupby 가 메모리에서 실행하는 것과 같은 호출
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning) # 숫자가 아닌 컬럼(mean, std, median)
+        return FUNCTIONS[func](df.groupby(by, sort=sort, dropna=dropna))().reset_index()
+
+
+def _check(df: pd.DataFrame, by: list, func: str, sort: bool = True, dropna: bool = True):
+    table  = pa.Table.from_pandas(df, preserve_index=False)
+    result = chunked.groupby(table, by, func, sort=sort, dropna=dropna)
+    # 저장된 데이터셋 전체를 읽었을 때의 DataFrame으로
+    expected = _expected(table.to_pandas(), by, func, sort, dropna)
+    if not sort:
+        # 처음 나온 순서(sort=False)에서 결측치 키 그룹의 위치는 pandas 버전마다 다르다.
+        result   = result.sort_values(by, kind="mergesort").reset_index(drop=True)
+        expected = expected.sort_values(by, kind="mergesort").reset_index(drop=True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize("func", list(FUNCTIONS))
+@pytest.mark.parametrize("dropna", [True, False])
+def test_single_key(df, func, dropna):
+    _check(df, ["k1"], func, dropna=dropna)
+
+
+@pytest.mark.parametrize("func", list(FUNCTIONS))
+@pytest.mark.parametrize("dropna", [True, False])
+def test_multiple_keys(df, func, dropna):
+    _check(df, ["k1", "k2"], func, dropna=dropna)
+
+
+@pytest.mark.parametrize("func", ["mean", "std", "median"])
+def test_unsorted(df, func):
+    _check(df, ["k2"], func, sort=False, dropna=False)
+
+
+def test_many_groups(df):
+    # 그룹 수(nunique)가 청크 크기보다 큰 경우
+    df = df.assign(k=np.arange(len(df)) % 101)
+    for func in ["mean", "std", "median", "count"]:
+        _check(df[["k", "f", "g"]], ["k"], func)
+
+
+def test_nullable_integer(df):
+    # 결측치가 있는 정수 컬럼은 청크에 결측치가 없어도 float으로 집계
+    df = df.assign(n=pd.array(np.where(np.arange(len(df)) == 400, None, np.arange(len(df))), dtype="Int64"))
+    for func in ["sum", "mean", "max"]:
+        _check(df[["k1", "n"]], ["k1"], func)
+
+
+def test_unsupported_function(df):
+    # 청크 결과를 합칠 수 없는 함수(nunique 등)는 잘못된 결과 대신 에러
+    with pytest.raises(ValueError):
+        chunked.groupby(pa.Table.from_pandas(df, preserve_index=False), ["k1"], "nunique")
@@ -0,0 +1,109 @@
+"""요청/응답 본문 압축(functions/compression.py)"""
+import gzip, zlib
+import pytest
+import zstandard
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from functions import compression
+from functions.compression import CompressionMiddleware, accepted_encoding
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware)
+
+
+@app.post("/echo")
+async def echo(item: Request):
+    return Response(content=await item.body(), media_type="application/octet-stream")
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+BODY = b'{"a": [1, 2, 3], "b": "x"}' * 200
+
+
+def _raw_deflate(data: bytes) -> bytes:
+    obj = zlib.compressobj(wbits=-15)
+    return obj.compress(data) + obj.flush()
+
+
+@pytest.mark.parametrize("encoding, compress", [
+    ("gzip",    gzip.compress),
+    ("x-gzip",  gzip.compress),
+    ("deflate", zlib.compress),  # zlib 형식(RFC 1950)
+    ("deflate", _raw_deflate),   # 헤더 없는 raw deflate
+    ("zstd",    lambda data: zstandard.ZstdCompressor().compress(data)),
+])
+def test_request_is_decoded(client, encoding, compress):
+    r = client.post("/echo", data=compress(BODY), headers={"Content-Encoding": encoding, "Accept-Encoding": "identity"})
+    assert r.status_code == 200, r.text
+    assert r.content == BODY
+
+
+def test_unsupported_encoding(client):
+    r = client.post("/echo", data=BODY, headers={"Content-Encoding": "br"})
+    assert r.status_code == 415
+
+
+def test_body_larger_than_limit(client, monkeypatch):
+    monkeypatch.setattr(compression, "MAX_BODY_SIZE", len(BODY) - 1)
+    r = client.post("/echo", data=gzip.compress(BODY), headers={"Content-Encoding": "gzip"})
+    assert r.status_code == 413
+
+
+@pytest.mark.parametrize("encoding, compress", [
+    ("gzip",    gzip.compress),
+    ("deflate", zlib.compress),
+    ("deflate", _raw_deflate),
+    ("zstd",    lambda data: zstandard.ZstdCompressor().compress(data)),
+])
+def test_truncated_body_is_rejected(client, encoding, compress):
+    data = compress(BODY)
+    r = client.post("/echo", data=data[:len(data) // 2], headers={"Content-Encoding": encoding})
+    assert r.status_code == 400
+
+
+def test_corrupt_body_is_rejected(client):
+    r = client.post("/echo", data=b"not gzip at all", headers={"Content-Encoding": "gzip"})
+    assert r.status_code == 400
+
+
+def test_small_response_is_not_compressed(client):
+    body = b"x" * (compression.COMPRESS_MIN_SIZE - 1)
+    r = client.post("/echo", data=body, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.content == body
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip",                 "gzip"),
+    ("zstd, gzip",           "zstd"),
+    ("zstd;q=0.5, gzip",     "gzip"),
+    ("*",                    "zstd"),
+    ("*;q=0, gzip;q=0.1",    "gzip"),
+])
+def test_response_encoding(client, accept, encoding):
+    r = client.post("/echo", data=BODY, headers={"Accept-Encoding": accept}, stream=True)
+    assert r.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in r.headers["vary"]
+    raw = r.raw.read(decode_content=False)
+    assert int(r.headers["content-length"]) == len(raw)
+    # 스트리밍 압축이라 zstd 프레임 헤더에 원래 크기가 없다.
+    decoded = gzip.decompress(raw) if encoding == "gzip" else zstandard.ZstdDecompressor().decompressobj().decompress(raw)
+    assert decoded == BODY
+
+
+@pytest.mark.parametrize("accept", ["", "identity", "gzip;q=0, zstd;q=0", "br"])
+def test_no_acceptable_encoding(client, accept):
+    r = client.post("/echo", data=BODY, headers={"Accept-Encoding": accept})
+    assert "content-encoding" not in r.headers
+    assert r.content == BODY
+
+
+def test_accepted_encoding_prefers_server_order_on_ties():
+    assert accepted_encoding("gzip, zstd") == "zstd"
+    assert accepted_encoding("gzip;q=1, zstd;q=0.9") == "gzip"
+    assert accepted_encoding("gzip;q=bad") is None
@@ -0,0 +1,127 @@
+"""백그라운드 작업(functions/jobs.py): 제출 => 조회 => 결과, stream=true 거절, 중단, 보관 시간이 지난 결과 삭제"""
+import os, json, time, asyncio
+import jwt
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from functions import jobs, store
+
+H = {"token": jwt.encode({"u": 1}, os.environ["SECRET_KEY"], algorithm="HS256")}
+
+
+@pytest.fixture(scope="module")
+def client():
+    # 응답 뒤에도 작업이 실행되도록 이벤트 루프를 유지
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def dataset_id():
+    dataset_id = store.register(pd.DataFrame({"a": [1, 2, 3], "c": [4, 5, 6]}))
+    yield dataset_id
+    store.remove(dataset_id)
+
+
+def _poll(client, location: str):
+    for _ in range(200):
+        r = client.get(location, headers=H)
+        if r.status_code != 202: return r
+        assert r.json()["status"] in ("pending", "running")
+        time.sleep(0.02)
+    raise AssertionError(f"{location} did not finish")
+
+
+def test_submit_poll_result(client, dataset_id):
+    direct = client.post(f"/dataframe/drop?dataset_id={dataset_id}&labels=c&axis=1", headers=H)
+    r = client.post(f"/dataframe/drop?dataset_id={dataset_id}&labels=c&axis=1&job=true", headers=H)
+    assert r.status_code == 202, r.text
+    info = r.json()
+    assert info["name"] == "drop" and info["status"] == "pending"
+    assert r.headers["location"] == f"/jobs/{info['job_id']}"
+
+    r = _poll(client, r.headers["location"])
+    assert r.status_code == 200
+    # job=true 없이 요청했을 때와 같은 형태의 결과
+    result, expected = json.loads(r.json()), json.loads(direct.json())
+    assert result["columns"] == expected["columns"] == ["a"]
+    assert result["shape"] == expected["shape"]
+
+    job = jobs._Job.load(info["job_id"])
+    assert job.status == "done" and job.progress == 1.0 and job.finished is not None
+
+
+def test_failed_job(client, dataset_id):
+    r = client.post(f"/dataframe/drop?dataset_id={dataset_id}&labels=zz&axis=1&job=true", headers=H)
+    r = _poll(client, r.headers["location"])
+    assert "zz" in r.json()
+    assert jobs._Job.load(r.url.rsplit("/", 1)[1]).status == "failed"
+
+
+def test_stream_is_rejected(client, dataset_id):
+    r = client.post(f"/dataframe/drop?dataset_id={dataset_id}&labels=c&axis=1&job=true&stream=true", headers=H)
+    assert r.status_code == 400
+    assert "stream" in r.json()["detail"]
+
+
+def test_unknown_job(client):
+    assert client.get("/jobs/unknown", headers=H).status_code == 404
+
+
+def test_cancelled_job_is_not_left_running():
+    async def main():
+        async def forever():
+            await asyncio.sleep(3600)
+            return True, None
+
+        job = jobs._Job("forever")
+        job.save()
+        jobs._jobs[job.job_id] = job
+        job.task = asyncio.get_running_loop().create_task(jobs._run(job, forever()))
+        await asyncio.sleep(0.01)
+        job.task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await job.task
+        return job.job_id
+
+    job_id = asyncio.run(main())
+    assert job_id not in jobs._jobs
+    job = jobs._Job.load(job_id)
+    assert job.status == "cancelled" and job.finished is not None
+    ok, message = jobs.result(job_id)
+    assert ok is False and "cancelled" in message
+
+
+def _age(job_id: str, seconds: float):
+    then = time.time() - seconds
+    os.utime(jobs._path(job_id), (then, then))
+
+
+def test_sweep_removes_expired_jobs(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_TTL", 60.0)
+    old, recent, running = jobs._Job("old"), jobs._Job("recent"), jobs._Job("running")
+    old.status, old.finished, old.result = "done", time.time() - 120, "x"
+    recent.status, recent.finished = "done", time.time() - 10
+    running.status = "running"
+    for job in (old, recent, running): job.save()
+    store.write_file(jobs._path(old.job_id, ".body"), b"body")
+    for job in (old, running): _age(job.job_id, 120)
+
+    jobs._sweep()
+    assert not os.path.exists(jobs._path(old.job_id))
+    assert not os.path.exists(jobs._path(old.job_id, ".body"))
+    assert jobs._Job.load(recent.job_id) is not None
+    # 실행 중인 워커의 작업은 오래돼도 남긴다.
+    assert jobs._Job.load(running.job_id) is not None
+
+
+def test_sweep_removes_jobs_of_stopped_workers(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_TTL", 60.0)
+    job = jobs._Job("orphan")
+    job.pid = 2**22 + 1 # 없는 프로세스
+    job.save()
+    _age(job.job_id, 120)
+    jobs._sweep()
+    assert jobs._Job.load(job.job_id) is None
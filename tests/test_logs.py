@@ -0,0 +1,126 @@
+"""func_log 스풀(functions/logs.py): DB가 실패했다가 돌아와도 기록이 사라지거나 두 번 기록되지 않는지 확인"""
+import os, json, datetime
+import psycopg2, psycopg2.extras
+import pytest
+
+from functions import logs
+
+
+class FakeDB:
+    """execute_values를 대신 받는 DB(연결 실패, 특정 행 거절, 트랜잭션 흉내)"""
+    def __init__(self):
+        self.rows    = []    # commit된 행
+        self.down    = 0     # 남은 연결 실패 횟수
+        self.poison  = set() # 거절할 func_code
+        self._txn    = []
+
+    # pool
+    def getconn(self):
+        if self.down:
+            self.down -= 1
+            raise psycopg2.OperationalError("could not connect")
+        return self
+
+    def putconn(self, conn, close=False): pass
+
+    # connection
+    def cursor(self): return self
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def commit(self): self.rows, self._txn = self.rows + self._txn, []
+    def rollback(self): self._txn = []
+
+    def execute_values(self, cursor, query, rows, page_size=None):
+        for row in rows:
+            if row[1] in self.poison: raise psycopg2.IntegrityError(f"rejected {row[1]}")
+            self._txn.append(tuple(row))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(logs, "LOG_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(logs, "_get_pool", lambda: fake)
+    monkeypatch.setattr(psycopg2.extras, "execute_values", fake.execute_values)
+    # 백그라운드 스레드 대신 테스트에서 flush() 호출
+    monkeypatch.setattr(logs, "start", lambda: None)
+    monkeypatch.setattr(logs, "_spool", None)
+    monkeypatch.setattr(logs, "_pending", 0)
+    yield fake
+    if logs._spool is not None: logs._spool[1].close()
+
+
+def _record(code: str):
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    logs.record(1, code, 0, now, now)
+
+
+def _files(ext: str) -> list:
+    return [i for i in os.listdir(logs.LOG_SPOOL_DIR) if i.endswith(ext)]
+
+
+def test_rows_survive_connection_failure(db):
+    for i in range(5): _record(f"f{i}")
+    db.down = 1
+    with pytest.raises(psycopg2.OperationalError):
+        logs.flush()
+    assert db.rows == [] and len(_files(logs.BATCH_EXT)) == 1
+    # 실패한 사이에 추가된 기록은 다음 batch 파일로
+    _record("f5")
+    logs.flush()
+    assert sorted(row[1] for row in db.rows) == [f"f{i}" for i in range(6)]
+    assert _files(logs.BATCH_EXT) == [] and _files(logs.SPOOL_EXT) == []
+    # 다시 flush해도 중복 없음
+    logs.flush()
+    assert len(db.rows) == 6
+
+
+def test_poisoned_row_is_quarantined(db):
+    failed = logs.stats()["failed"]
+    for code in ["ok1", "bad", "ok2"]: _record(code)
+    db.poison.add("bad")
+    logs.flush()
+    assert [row[1] for row in db.rows] == ["ok1", "ok2"]
+    assert _files(logs.BATCH_EXT) == []
+    [quarantined] = _files(logs.FAILED_EXT)
+    with open(os.path.join(logs.LOG_SPOOL_DIR, quarantined)) as f:
+        assert [json.loads(line)[1] for line in f] == ["bad"]
+    assert logs.stats()["failed"] == failed + 1
+    # 다음 기록은 막히지 않는다.
+    _record("ok3")
+    logs.flush()
+    assert [row[1] for row in db.rows] == ["ok1", "ok2", "ok3"]
+
+
+def test_quarantined_file_can_be_replayed(db):
+    _record("bad")
+    db.poison.add("bad")
+    logs.flush()
+    [quarantined] = _files(logs.FAILED_EXT)
+    # 원인을 고친 뒤 확장자를 .batch로 바꾸면 다시 기록
+    db.poison.clear()
+    path = os.path.join(logs.LOG_SPOOL_DIR, quarantined)
+    os.replace(path, path[:-len(logs.FAILED_EXT)] + logs.BATCH_EXT)
+    logs.flush()
+    assert [row[1] for row in db.rows] == ["bad"] and _files(logs.FAILED_EXT) == []
+
+
+def test_unreadable_batch_does_not_block_others(db, monkeypatch):
+    # 행 형식이 달라서 INSERT 전에 실패하는 파일
+    with open(os.path.join(logs.LOG_SPOOL_DIR, f"1-1{logs.BATCH_EXT}"), "w") as f: f.write("[1]\n")
+    original = logs._insert
+    monkeypatch.setattr(logs, "_insert", lambda rows: original(rows) if len(rows[0]) > 1 else rows[0][5])
+    _record("ok")
+    logs.flush()
+    assert [row[1] for row in db.rows] == ["ok"]
+    assert _files(logs.FAILED_EXT) == [f"1-1{logs.FAILED_EXT}"]
+
+
+def test_dead_worker_spool_is_adopted(db):
+    # 종료된 워커(없는 pid)가 남긴 스풀 파일
+    row = [1, "old", 0, None, "2026-01-01T00:00:00+00:00", "2026-01-01T00:00:01+00:00"]
+    with open(os.path.join(logs.LOG_SPOOL_DIR, f"999999{logs.SPOOL_EXT}"), "w") as f:
+        f.write(json.dumps(row) + "\n" + '[1, "half')
+    logs.flush()
+    assert [r[1] for r in db.rows] == ["old"]
+    assert os.listdir(logs.LOG_SPOOL_DIR) == []
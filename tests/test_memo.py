@@ -0,0 +1,145 @@
+"""결과 캐시(functions/memo.py): 키, 유효 시간, 크기 제한, 데이터셋 삭제 후 무효화"""
+import os, asyncio
+import jwt
+import pandas as pd
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+import main
+from functions import memo, store
+
+H = {"token": jwt.encode({"u": 1}, os.environ["SECRET_KEY"], algorithm="HS256")}
+
+
+@pytest.fixture(autouse=True)
+def empty(monkeypatch):
+    monkeypatch.setattr(memo, "MEMO_BUDGET", 2**20)
+    monkeypatch.setattr(memo, "MEMO_TTL", 600.0)
+    memo._cache.clear()
+    memo._bytes = 0
+    yield
+    memo._cache.clear()
+    memo._bytes = 0
+
+
+def _request(body: bytes = b"", query: str = "", accept: str = "application/json") -> Request:
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent: return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    headers = [(b"accept", accept.encode()), (b"content-type", b"application/json")]
+    return Request({
+        "type": "http", "method": "POST", "path": "/f", "headers": headers,
+        "query_string": query.encode(),
+    }, receive)
+
+
+def func(item: Request, **kwargs):
+    return "result"
+
+
+class Counter:
+    """memo.call에 넘기는 run(실행 횟수를 센다)"""
+    def __init__(self, result="result"):
+        self.calls, self.result = 0, result
+
+    async def __call__(self, func, *args, **kwargs):
+        self.calls += 1
+        return self.result
+
+
+def _call(run, item: Request, **kwargs):
+    return asyncio.run(memo.call(func, run, item, **kwargs))
+
+
+def test_same_input_is_a_hit():
+    run = Counter()
+    assert _call(run, _request(b'{"a": 1}', "x=1")) == "result"
+    assert _call(run, _request(b'{"a": 1}', "x=1")) == "result"
+    assert run.calls == 1
+
+
+def test_job_is_not_part_of_the_key():
+    run = Counter()
+    _call(run, _request(b"{}", "x=1"))
+    _call(run, _request(b"{}", "x=1&job=true"))
+    assert run.calls == 1
+
+
+@pytest.mark.parametrize("other", [
+    {"body": b'{"a": 2}'},
+    {"query": "x=2"},
+    {"accept": "text/csv"},
+])
+def test_different_input_is_a_miss(other):
+    run  = Counter()
+    base = {"body": b'{"a": 1}', "query": "x=1", "accept": "application/json"}
+    _call(run, _request(**base))
+    _call(run, _request(**{**base, **other}))
+    assert run.calls == 2
+
+
+def test_failures_are_not_cached():
+    run = Counter((False, "bad input"))
+    _call(run, _request(b"{}"))
+    _call(run, _request(b"{}"))
+    assert run.calls == 2
+
+
+def test_expired_entry_is_a_miss(monkeypatch):
+    run = Counter()
+    monkeypatch.setattr(memo, "MEMO_TTL", -1.0)
+    _call(run, _request(b"{}"))
+    _call(run, _request(b"{}"))
+    assert run.calls == 2
+    # 만료된 결과는 지우고 새 결과로 바꾼다.
+    assert len(memo._cache) == 1 and memo._bytes == next(iter(memo._cache.values()))[1]
+
+
+def test_budget_evicts_least_recently_used(monkeypatch):
+    run  = Counter("x" * 400)
+    key  = lambda i: asyncio.run(memo._key(func, _request(str(i).encode()), {}))
+    size = len("x" * 400) + len(key(0))
+    monkeypatch.setattr(memo, "MEMO_BUDGET", 2 * size)
+
+    _call(run, _request(b"0"))
+    _call(run, _request(b"1"))
+    _call(run, _request(b"0"))  # 0을 최근 사용으로
+    _call(run, _request(b"2"))  # 1이 삭제된다.
+    assert run.calls == 3
+    assert list(memo._cache) == [key(0), key(2)]
+    assert memo._bytes == 2 * size <= memo.MEMO_BUDGET
+
+    # 예산보다 큰 결과는 저장하지 않는다.
+    _call(Counter("x" * 3 * size), _request(b"3"))
+    assert list(memo._cache) == [key(0), key(2)]
+
+
+def test_exists_runs_outside_the_lock(monkeypatch):
+    dataset_id = store.register(pd.DataFrame({"a": [1]}))
+    held = []
+    monkeypatch.setattr(store, "exists", lambda i: held.append(memo._lock.locked()) or True)
+    run = Counter()
+    _call(run, _request(b"{}"), dataset_id=dataset_id)
+    _call(run, _request(b"{}"), dataset_id=dataset_id)
+    assert run.calls == 1 and held == [False]
+    store.remove(dataset_id)
+
+
+def test_deleted_dataset_invalidates_entry():
+    client     = TestClient(main.app)
+    dataset_id = store.register(pd.DataFrame({"a": [1, 2, 3]}))
+    run = Counter()
+    _call(run, _request(b""), dataset_id=dataset_id)
+    _call(run, _request(b""), dataset_id=dataset_id)
+    assert run.calls == 1
+
+    r = client.delete(f"/dataset/{dataset_id}", headers=H)
+    assert r.status_code == 200, r.text
+    _call(run, _request(b""), dataset_id=dataset_id)
+    assert run.calls == 2
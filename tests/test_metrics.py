@@ -0,0 +1,123 @@
+"""/metrics(functions/metrics.py): Prometheus text format, 워커 합계, 종료된 워커의 누적 값"""
+import os, re, json
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from functions import metrics
+
+DEAD_PID = 2**22 + 1 # pid_max(2**22)보다 커서 실행 중일 수 없는 pid
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{([a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*",?)*\})? (-?[0-9.e+-]+|\+Inf|NaN)$')
+
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    """METRICS_DIR을 비우고 이 워커의 집계도 비운 상태"""
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "EXITED_FILE", str(tmp_path / "exited.json"))
+    monkeypatch.setattr(metrics, "_funcs", {})
+    # 다른 테스트에서 사용한 캐시 적중 횟수가 이 워커의 값에 더해지지 않도록
+    monkeypatch.setattr(metrics.memo, "stats", lambda: {"hits": 0, "misses": 0, "evictions": 0, "entries": 0, "bytes": 0, "budget": 0})
+    return tmp_path
+
+
+def _state(requests: dict, latencies: list, in_flight: int = 0, hits: int = 0, entries: int = 0) -> dict:
+    f = {k: metrics._histogram(metrics.SIZE_BUCKETS) for k in ("request_bytes", "response_bytes", "input_bytes", "output_bytes", "peak_bytes")}
+    f["latency"] = metrics._histogram(metrics.LATENCY_BUCKETS)
+    for value in latencies: metrics._observe(f["latency"], metrics.LATENCY_BUCKETS, value)
+    f["requests"], f["in_flight"] = requests, in_flight
+    return {
+        "funcs"    : {"drop": f},
+        "memo"     : {"hits": hits, "misses": 0, "evictions": 0, "entries": entries, "bytes": 0, "budget": 0},
+        "admission": {}, "logs": {}, "memory": {},
+        "jobs"     : 0,
+    }
+
+
+def _write(workers, pid: int, state: dict):
+    (workers / f"{pid}.json").write_text(json.dumps(state))
+
+
+def _samples(text: str) -> dict:
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#"): continue
+        name, value = line.rsplit(" ", 1)
+        samples[name] = float(value)
+    return samples
+
+
+def test_exposition_format(workers):
+    metrics.end("a\"b\\c\nd", 0, 0.2, 2000, None, metrics.begin("a\"b\\c\nd"))
+    text = metrics.render()
+    assert text.endswith("\n")
+
+    typed = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name not in typed and kind in ("counter", "gauge", "histogram")
+            typed[name] = kind
+            continue
+        if line.startswith("# HELP "): continue
+        assert SAMPLE.match(line), line
+        name = line.split("{")[0].split(" ")[0]
+        base = re.sub(r"_(bucket|sum|count)$", "", name)
+        assert name in typed or typed.get(base) == "histogram", line
+    assert all(name.endswith("_total") for name, kind in typed.items() if kind == "counter")
+
+    # 라벨 값의 ", \, 줄바꿈은 escape
+    assert 'func="a\\"b\\\\c\\nd"' in text
+    samples = _samples(text)
+    label   = 'func="a\\"b\\\\c\\nd"'
+    buckets = [samples[f'mlfuncs_latency_seconds_bucket{{{label},le="{le}"}}'] for le in [*metrics.LATENCY_BUCKETS, "+Inf"]]
+    assert buckets == sorted(buckets) # 누적
+    assert buckets[-1] == samples[f"mlfuncs_latency_seconds_count{{{label}}}"] == 1
+    assert samples[f'mlfuncs_latency_seconds_bucket{{{label},le="0.1"}}'] == 0
+    assert samples[f'mlfuncs_latency_seconds_bucket{{{label},le="0.25"}}'] == 1
+
+
+def test_get_metrics_route(workers):
+    r = TestClient(main.app).get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "mlfuncs_workers 1" in r.text
+
+
+def test_sums_over_workers(workers):
+    _write(workers, os.getppid(), _state({"0": 3, "1": 1}, [0.01, 0.2, 3, 100], in_flight=2, hits=5, entries=4))
+    samples = _samples(metrics.render())
+    # 이 워커(아직 요청 없음)와 부모 프로세스
+    assert samples["mlfuncs_workers"] == 2
+    assert samples['mlfuncs_requests_total{func="drop",is_worked="0",status="ok"}'] == 3
+    assert samples['mlfuncs_requests_total{func="drop",is_worked="1",status="failed"}'] == 1
+    assert samples['mlfuncs_latency_seconds_bucket{func="drop",le="+Inf"}'] == 4
+    assert samples['mlfuncs_in_flight{func="drop"}'] == 2
+    assert samples["mlfuncs_memo_hits_total"] == 5
+    assert samples["mlfuncs_memo_entries"] == 4
+
+
+def test_exited_worker_is_folded(workers):
+    _write(workers, os.getppid(), _state({"0": 3}, [0.01, 0.01, 0.01], in_flight=1, hits=5, entries=4))
+    _write(workers, DEAD_PID,     _state({"0": 2}, [1, 1], in_flight=1, hits=7, entries=9))
+    first = _samples(metrics.render())
+    assert not (workers / f"{DEAD_PID}.json").exists()
+    assert first["mlfuncs_workers"] == 2
+    assert first['mlfuncs_requests_total{func="drop",is_worked="0",status="ok"}'] == 5
+    assert first['mlfuncs_latency_seconds_count{func="drop"}'] == 5
+    assert first["mlfuncs_memo_hits_total"] == 12
+    # gauge는 실행 중인 워커의 값만
+    assert first['mlfuncs_in_flight{func="drop"}'] == 1
+    assert first["mlfuncs_memo_entries"] == 4
+
+    # 다시 읽어도 counter가 줄거나 두 번 더해지지 않는다.
+    second = _samples(metrics.render())
+    for name, value in first.items():
+        if "_total" in name or "_bucket" in name or "_count" in name: assert second[name] == value, name
+
+    # 다른 워커가 또 종료돼도 이전 값에 더해진다.
+    _write(workers, DEAD_PID, _state({"0": 1}, [1], hits=1))
+    third = _samples(metrics.render())
+    assert third['mlfuncs_requests_total{func="drop",is_worked="0",status="ok"}'] == 6
+    assert third["mlfuncs_memo_hits_total"] == 13
@@ -0,0 +1,104 @@
+"""lazy=true(functions/plan.py)로 최적화한 계획과 그대로 실행한 결과가 같은지 확인"""
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions import plan
+from functions.pipeline import _kwargs, _execute
+
+
+def _calls(steps: list) -> list:
+    calls = []
+    for i, step in enumerate(steps):
+        params = dict(step.get("params") or {})
+        right_id = params.pop("right_id", None)
+        calls.append({"op": step["op"], "kwargs": _kwargs(step["op"], params), "index": i})
+        if right_id: calls[-1].update(right_id=right_id, right=[])
+    return calls
+
+
+def _run(df: pd.DataFrame, steps: list, rights: dict, lazy: bool) -> pd.DataFrame:
+    calls = _calls(steps)
+    if lazy: calls = plan.optimize(calls, list(df.columns), {k: list(v.columns) for k, v in rights.items()})
+    tf, result = asyncio.run(_execute(df, calls, rights))
+    assert tf, result
+    return result
+
+
+def _same(df: pd.DataFrame, steps: list, rights: dict = {}, ordered: bool = True):
+    naive, lazy = _run(df, steps, rights, False), _run(df, steps, rights, True)
+    if not ordered:
+        # merge 아래로 필터를 옮기면 인덱스와 행 순서가 달라질 수 있다.(pipeline 문서)
+        naive = naive.sort_values(list(naive.columns)).reset_index(drop=True)
+        lazy  = lazy.sort_values(list(lazy.columns)).reset_index(drop=True)
+    pd.testing.assert_frame_equal(naive, lazy)
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "a": rng.integers(0, 10, 200),
+        "b": rng.normal(size=200),
+        "c": rng.choice(["x", "y", "z"], 200),
+        "d": rng.normal(size=200),
+    })
+
+
+@pytest.fixture
+def right():
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({"a": np.arange(10), "b": rng.normal(size=10), "e": rng.normal(size=10)})
+
+
+GT0 = {"op": "col_condition", "params": {"col": "b", "cond1": "gr", "value1": 0}}
+
+
+@pytest.mark.parametrize("steps", [
+    [{"op": "sort_values", "params": {"by": "d"}}, GT0],
+    [{"op": "sort_values", "params": {"by": "d", "ig_idx": True}}, GT0],
+    [{"op": "tail", "params": {"line": 150}}, {"op": "drop", "params": {"labels": "c", "axis": 1}}, GT0],
+    [{"op": "rename", "params": {"keys": "b", "values": "bb"}}, {"op": "col_condition", "params": {"col": "bb", "cond1": "le", "value1": 0}}],
+    [{"op": "rename", "params": {"keys": "a", "values": "x"}}, {"op": "rename", "params": {"keys": "x,b", "values": "y,z"}}],
+    [{"op": "astype", "params": {"col": "a", "dtype": "float"}}, {"op": "astype", "params": {"col": "c", "dtype": "category"}}, GT0],
+    [{"op": "loc", "params": {"cols": "a,b"}}, GT0, {"op": "head", "params": {"line": 7}}],
+    [{"op": "set_column", "params": {"col": "f", "cols_ops": "b,+,d"}}, GT0, {"op": "drop", "params": {"labels": "a", "axis": 1}}],
+])
+def test_optimized_plan_matches_naive(df, steps):
+    _same(df, steps)
+
+
+def test_filter_is_not_pushed_past_column_sort():
+    # axis=1은 by 행의 값으로 컬럼을 정렬한다. 필터를 먼저 적용하면 by 행이 사라지거나 컬럼 순서가 달라진다.
+    df = pd.DataFrame({"p": [3.0, -1.0, 2.0], "q": [1.0, -2.0, 5.0], "r": [2.0, 4.0, -3.0]}, index=["p", "q", "r"])
+    steps = [{"op": "sort_values", "params": {"by": "p", "axis": 1}}, {"op": "col_condition", "params": {"col": "q", "cond1": "gr", "value1": 0}}]
+    calls = plan.optimize(_calls(steps), list(df.columns), {})
+    assert [c["op"] for c in calls] == ["sort_values", "col_condition"]
+    _same(df, steps)
+
+
+def test_filter_is_pushed_past_row_sort(df):
+    calls = plan.optimize(_calls([{"op": "sort_values", "params": {"by": "d"}}, GT0]), list(df.columns), {})
+    assert [c["op"] for c in calls] == ["col_condition", "sort_values"]
+
+
+@pytest.mark.parametrize("how", ["inner", "left", "right", "outer"])
+def test_merge_pushdown_matches_naive(df, right, how):
+    steps = [
+        {"op": "merge", "params": {"right_id": "r", "on": "a", "how": how}},
+        {"op": "col_condition", "params": {"col": "b_x", "cond1": "gr", "value1": 0}},
+        {"op": "col_condition", "params": {"col": "e", "cond1": "le", "value1": 0.5}},
+        {"op": "col_condition", "params": {"col": "a", "cond1": "le", "value1": 6}},
+        {"op": "loc", "params": {"cols": "a,b_x,e"}},
+    ]
+    _same(df, steps, {"r": right}, ordered=False)
+
+
+def test_concat_pushdown_matches_naive(df, right):
+    steps = [
+        {"op": "concat", "params": {"right_id": "r", "axis": 0}},
+        {"op": "col_condition", "params": {"col": "b", "cond1": "gr", "value1": 0}},
+        {"op": "drop", "params": {"labels": "d", "axis": 1}},
+    ]
+    _same(df, steps, {"r": right})
@@ -0,0 +1,98 @@
+"""요청 프로파일(functions/profiler.py): 관리자 키 확인, ?profile=true, /profiles/{profile_id} 내려받기"""
+import os
+import jwt
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+from functions import profiler, store
+
+H = {"token": jwt.encode({"u": 1}, os.environ["SECRET_KEY"], algorithm="HS256")}
+KEY = "test-admin-key"
+
+
+@pytest.fixture
+def admin(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "ADMIN_KEY", KEY)
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path / "profiles"))
+    return {**H, "admin-key": KEY}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def dataset_id():
+    dataset_id = store.register(pd.DataFrame({"a": np.arange(1000), "b": np.arange(1000) % 7}))
+    yield dataset_id
+    store.remove(dataset_id)
+
+
+@pytest.mark.parametrize("configured, sent", [
+    (None, None),
+    (None, KEY),       # ADMIN_KEY가 없으면 아무도 사용할 수 없다.
+    (KEY,  None),
+    (KEY,  "wrong"),
+    (KEY,  ""),
+])
+def test_authorize_rejects(monkeypatch, configured, sent):
+    monkeypatch.setattr(profiler, "ADMIN_KEY", configured)
+    with pytest.raises(HTTPException) as e:
+        profiler.authorize(sent)
+    assert e.value.status_code == 403
+
+
+def test_authorize_accepts(monkeypatch):
+    monkeypatch.setattr(profiler, "ADMIN_KEY", KEY)
+    profiler.authorize(KEY)
+
+
+def test_profile_and_download(client, admin, dataset_id):
+    assert not os.path.exists(profiler.PROFILE_DIR) # 처음 저장할 때 만든다.
+    r = client.post(f"/dataframe/groupby?dataset_id={dataset_id}&by=b&func=sum&profile=true", headers=admin)
+    assert r.status_code == 200, r.text
+    profile_id = r.headers["profile-id"]
+
+    r = client.get(f"/profiles/{profile_id}", headers=admin)
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("text/plain")
+    assert r.headers["content-disposition"] == f'attachment; filename="{profile_id}.folded"'
+    for line in r.text.splitlines():
+        stack, n = line.rsplit(" ", 1)
+        assert stack.startswith("groupby;") and int(n) > 0
+
+
+def test_profile_requires_admin_key(client, admin, dataset_id):
+    r = client.post(f"/dataframe/groupby?dataset_id={dataset_id}&by=b&func=sum&profile=true", headers=H)
+    assert r.status_code == 403
+    r = client.post(f"/dataframe/groupby?dataset_id={dataset_id}&by=b&func=sum&profile=true&job=true", headers=admin)
+    assert r.status_code == 400
+
+
+def test_download_requires_admin_key(client, admin):
+    profile = profiler.start("test")
+    profile.save()
+    assert client.get(f"/profiles/{profile.profile_id}", headers=H).status_code == 403
+    assert client.get(f"/profiles/{profile.profile_id}", headers={**H, "admin-key": "wrong"}).status_code == 403
+    assert client.get(f"/profiles/{profile.profile_id}", headers=admin).status_code == 200
+
+
+@pytest.mark.parametrize("profile_id", ["0" * 32, "..%2Fjobs", "a.b"])
+def test_download_unknown_profile(client, admin, profile_id):
+    assert client.get(f"/profiles/{profile_id}", headers=admin).status_code == 404
+
+
+def test_sweep_removes_expired_profiles(admin, monkeypatch):
+    old, new = profiler.start("old"), profiler.start("new")
+    old.save()
+    then = os.path.getmtime(profiler._path(old.profile_id)) - 100
+    os.utime(profiler._path(old.profile_id), (then, then))
+    monkeypatch.setattr(profiler, "PROFILE_TTL", 50)
+    new.save()
+    assert profiler.load(old.profile_id) is None
+    assert profiler.load(new.profile_id) == ""
@@ -0,0 +1,42 @@
+"""처리 단계별 시간(functions/timing.py): Server-Timing 헤더, TRACE_FILE 기록"""
+import json, logging
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from functions import timing
+
+
+@pytest.fixture
+def trace(tmp_path, monkeypatch):
+    path = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(timing, "TRACE_FILE", str(path))
+    yield path
+    timing.close()
+
+
+def test_server_timing_header():
+    r = TestClient(main.app).get("/metrics")
+    assert r.status_code == 200
+    names = [i.split(";")[0].strip() for i in r.headers["server-timing"].split(",")]
+    assert names[-1] == "total"
+
+
+def test_trace_file(trace):
+    client = TestClient(main.app)
+    for _ in range(3): client.get("/metrics?x=1")
+    # 기록 스레드가 큐에 남은 기록을 쓰고 종료
+    timing.close()
+    lines = [json.loads(i) for i in trace.read_text().splitlines()]
+    assert len(lines) == 3
+    assert {i["path"] for i in lines} == {"/metrics"}
+    assert lines[0]["query"] == "x=1" and lines[0]["status"] == 200 and lines[0]["total"] >= 0
+
+
+def test_trace_write_error_is_logged(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(timing, "TRACE_FILE", str(tmp_path / "missing" / "trace.jsonl"))
+    with caplog.at_level(logging.WARNING, logger="functions.timing"):
+        r = TestClient(main.app).get("/metrics")
+        timing.close()
+    assert r.status_code == 200
+    assert any("could not write" in i.getMessage() for i in caplog.records)
@@ -0,0 +1,65 @@
+"""파생 데이터셋 버전(functions/store.py): 바뀌지 않은 컬럼은 부모의 배열을 공유하고, 자식을 바꿔도 부모는 그대로인지 확인"""
+import os, json
+import jwt
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from functions import store
+
+H = {"token": jwt.encode({"u": 1}, os.environ["SECRET_KEY"], algorithm="HS256")}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def parent(client):
+    df = pd.DataFrame({"a": np.arange(50), "b": np.arange(50.0) / 2, "c": np.arange(50) % 3})
+    dataset_id = store.register(df)
+    yield dataset_id, df.copy()
+    store.remove(dataset_id)
+
+
+def _derive(client, path: str) -> str:
+    r = client.post(path, headers=H)
+    assert r.status_code == 200, r.text
+    return json.loads(r.json())["dataset_id"]
+
+
+def _shares(child: pd.DataFrame, parent: pd.DataFrame, col: str) -> bool:
+    return np.shares_memory(child[col].to_numpy(), parent[col].to_numpy())
+
+
+@pytest.mark.parametrize("path, changed", [
+    ("/dataframe/drop?labels=c&axis=1",           []),
+    ("/dataframe/set_column?col=d&cols_ops=a,*,2", ["d"]),
+    ("/dataframe/astype?col=c&dtype=float",        ["c"]),
+])
+def test_version_shares_unchanged_columns(client, parent, path, changed):
+    parent_id, original = parent
+    child_id = _derive(client, f"{path}&dataset_id={parent_id}")
+    child, base = store.get(child_id), store.get(parent_id)
+    for col in child.columns:
+        if col in changed: assert col not in base.columns or not _shares(child, base, col)
+        else             : assert _shares(child, base, col), col
+    assert store.versions(child_id)[0]["shared"] == len([c for c in child.columns if c not in changed])
+    pd.testing.assert_frame_equal(store.get(parent_id), original)
+
+
+def test_changing_child_keeps_parent(client, parent):
+    parent_id, original = parent
+    child_id = _derive(client, f"/dataframe/drop?labels=c&axis=1&dataset_id={parent_id}")
+    # 공유하는 컬럼을 다시 계산하거나 타입을 바꾼 손자 버전
+    _derive(client, f"/dataframe/set_column?col=a&cols_ops=a,*,10&dataset_id={child_id}")
+    _derive(client, f"/dataframe/astype?col=b&dtype=int&dataset_id={child_id}")
+    _derive(client, f"/dataframe/rename?keys=a&values=x&copy=false&dataset_id={child_id}")
+    # 메모리의 자식 DataFrame에서 컬럼을 바꿔도(다른 배열로 교체) 부모는 그대로
+    child = store.get(child_id).copy(deep=False)
+    child["a"] = -1
+    pd.testing.assert_frame_equal(store.get(parent_id), original)
+    pd.testing.assert_frame_equal(store.get(child_id), original.drop(columns="c"))
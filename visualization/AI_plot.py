@@ -13,19 +13,22 @@ from bokeh.resources import CDN
 from fastapi.templating import Jinja2Templates
 import re
 
+from functions.internal_func import read_df, offload
 
 
 templates = Jinja2Templates(directory="visualization/templates")
 
 
 
+@offload
 async def box_plot(
     item : Request,                                         #data
     cols : Optional[str] = Query(None, max_length = 30),    #출력하고자하는 특성들(string)
     tools : Optional[str] = Query("pan,wheel_zoom,box_zoom,save,reset,help", max_length= 20),      #...
     background_fill_color : Optional[str] = Query("#efefef", max_length= 16),
     fill_color1 : Optional[str] = Query("#E08E79", max_length= 16), #상자의 q2 ~ q3까지의 색깔 지정
-    fill_color2 : Optional[str] = Query("#3B8686", max_length= 16) #상자의 q1 ~ q2까지의 색깔 지정
+    fill_color2 : Optional[str] = Query("#3B8686", max_length= 16), #상자의 q1 ~ q2까지의 색깔 지정
+    dataset_id : Optional[str] = Query(None, max_length = 50), #본문 대신 사용할 서버의 데이터셋(read_df에서 읽음)
     ):
 
     #테스트 셋
@@ -37,7 +40,7 @@ async def box_plot(
     fill_color1 if fill_color1.startswith("#") else fill_color1.replace("%23", "#")
     fill_color2 if fill_color2.startswith("#") else fill_color2.replace("%23", "#")
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
     # , " "를 구분자로 사용하여 분리하는 정규식을 차후 적용
     cols = list(re.split('[,]',cols))
 
@@ -107,16 +110,18 @@ async def box_plot(
     return json.dumps(json_item(plot), ensure_ascii=False)
 
 
+@offload
 async def hist_plot(
     item : Request,                                         #data
     col : Optional[str] = Query(None, max_length = 30),
-    tools : Optional[str] = Query("pan,wheel_zoom,box_zoom,save,reset,help", max_length= 20)
+    tools : Optional[str] = Query("pan,wheel_zoom,box_zoom,save,reset,help", max_length= 20),
+    dataset_id : Optional[str] = Query(None, max_length = 50),
 ):
     '''
     주의사항 : 결측치가 있는 경우 오류 발생
     '''
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
     #출력하고자하는 특성이 데이터프레임내에 존재하는지 확인
     if not col in df.columns:
@@ -145,6 +150,7 @@ async def hist_plot(
     return json.dumps(json_item(plot), ensure_ascii=False)
 
 
+@offload
 async def count_plot(
     item : Request,                                         #data
     col : Optional[str] = Query(None, max_length = 30),
@@ -152,9 +158,10 @@ async def count_plot(
     height : Optional[str] = Query("250", max_length = 5),
     width : Optional[str] = Query("0.9", max_length = 5),
     tools : Optional[str] = Query("pan,wheel_zoom,box_zoom,save,reset,help", max_length= 20),
+    dataset_id : Optional[str] = Query(None, max_length = 50),
 ):
 
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
 
     #출력하고자하는 특성이 데이터프레임내에 존재하는지 확인
@@ -188,15 +195,17 @@ async def count_plot(
 
 
 
+@offload
 async def scatter_plot(
     item : Request,
     x_col : Optional[str] = Query(None, max_length = 30),
     y_col : Optional[str] = Query(None, max_length = 30),
     tools : Optional[str] = Query("pan,wheel_zoom,box_zoom,save,reset,help", max_length= 20),
+    dataset_id : Optional[str] = Query(None, max_length = 50),
     ):
 
     #json -> dataframe
-    df = pd.read_json(await item.json())
+    df = await read_df(item)
 
     # x_col이라는 특성이 존재하는지 확인
     if not x_col in df.columns: